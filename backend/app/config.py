@@ -13,6 +13,59 @@ class Settings(BaseSettings):
     ORACLE_POOL_MIN: int | None = int(os.getenv("ORACLE_POOL_MIN", "1"))
     ORACLE_POOL_MAX: int | None = int(os.getenv("ORACLE_POOL_MAX", "4"))
     ORACLE_POOL_INCREMENT: int | None = int(os.getenv("ORACLE_POOL_INCREMENT", "1"))
+    # Statements cached per connection so repeated INSERTs skip re-parsing
+    ORACLE_STMT_CACHE_SIZE: int = int(os.getenv("ORACLE_STMT_CACHE_SIZE", "40"))
+    # Store each distinct json_data once in weather_payload, referenced by SHA-256
+    # (needs database/migrations/003_payload_dedup_*.sql)
+    DB_PAYLOAD_DEDUP: bool = os.getenv("DB_PAYLOAD_DEDUP", "false").lower() in ("1", "true", "yes")
+    # Pool acquire behaviour: timedwait | wait | nowait | forceget; timedwait gives up after
+    # ORACLE_POOL_WAIT_TIMEOUT_MS instead of queueing threads forever
+    ORACLE_POOL_GETMODE: str = os.getenv("ORACLE_POOL_GETMODE", "timedwait")
+    ORACLE_POOL_WAIT_TIMEOUT_MS: int = int(os.getenv("ORACLE_POOL_WAIT_TIMEOUT_MS", "5000"))
+    # Ping connections idle for longer than this (seconds) before handing them out; -1 disables
+    ORACLE_POOL_PING_INTERVAL: int = int(os.getenv("ORACLE_POOL_PING_INTERVAL", "60"))
+
+    # Write-behind persistence of API responses (see app/services/db_writer.py)
+    DB_WRITE_BEHIND: bool = os.getenv("DB_WRITE_BEHIND", "true").lower() in ("1", "true", "yes")
+    DB_WRITE_BATCH_SIZE: int = int(os.getenv("DB_WRITE_BATCH_SIZE", "100"))
+    DB_WRITE_FLUSH_INTERVAL: float = float(os.getenv("DB_WRITE_FLUSH_INTERVAL", "1.0"))
+    DB_WRITE_QUEUE_MAX: int = int(os.getenv("DB_WRITE_QUEUE_MAX", "10000"))
+    # block | drop | spill
+    DB_WRITE_BACKPRESSURE: str = os.getenv("DB_WRITE_BACKPRESSURE", "block")
+    DB_WRITE_BLOCK_TIMEOUT: float = float(os.getenv("DB_WRITE_BLOCK_TIMEOUT", "1.0"))
+    DB_WRITE_SPILL_PATH: str = os.getenv("DB_WRITE_SPILL_PATH", os.path.join("logs", "db_spill.jsonl"))
+    # a failed batch is retried this many times, the first retry after DB_WRITE_RETRY_BACKOFF seconds (doubling)
+    DB_WRITE_RETRIES: int = int(os.getenv("DB_WRITE_RETRIES", "3"))
+    DB_WRITE_RETRY_BACKOFF: float = float(os.getenv("DB_WRITE_RETRY_BACKOFF", "0.5"))
+
+    # Streaming /db/export: rows fetched per round trip, CLOB read size (characters), output flush size (bytes)
+    EXPORT_ARRAYSIZE: int = int(os.getenv("EXPORT_ARRAYSIZE", "1000"))
+    EXPORT_PREFETCH_ROWS: int = int(os.getenv("EXPORT_PREFETCH_ROWS", "1000"))
+    EXPORT_LOB_CHUNK_SIZE: int = int(os.getenv("EXPORT_LOB_CHUNK_SIZE", "65536"))
+    EXPORT_BUFFER_BYTES: int = int(os.getenv("EXPORT_BUFFER_BYTES", "65536"))
+
+    # GET /db/aggregates over weather_observation: sql (GROUP BY pushdown) | numpy (needs numpy);
+    # rows per fetch, and a short-lived in-process cache of results
+    AGGREGATE_ENGINE: str = os.getenv("AGGREGATE_ENGINE", "sql")
+    AGGREGATE_CHUNK_ROWS: int = int(os.getenv("AGGREGATE_CHUNK_ROWS", "10000"))
+    AGGREGATE_CACHE_TTL: int = int(os.getenv("AGGREGATE_CACHE_TTL", "60"))
+    AGGREGATE_CACHE_MAX_ENTRIES: int = int(os.getenv("AGGREGATE_CACHE_MAX_ENTRIES", "256"))
+
+    # Retention (python -m app.jobs.retention): partitions older than RETENTION_DAYS are written
+    # to Parquet under ARCHIVE_DIR (needs pyarrow) and dropped; rows per fetch / row group
+    RETENTION_DAYS: int = int(os.getenv("RETENTION_DAYS", "90"))
+    ARCHIVE_ENABLED: bool = os.getenv("ARCHIVE_ENABLED", "true").lower() in ("1", "true", "yes")
+    ARCHIVE_DIR: str = os.getenv("ARCHIVE_DIR", "archive")
+    ARCHIVE_CHUNK_ROWS: int = int(os.getenv("ARCHIVE_CHUNK_ROWS", "5000"))
+    ARCHIVE_COMPRESSION: str = os.getenv("ARCHIVE_COMPRESSION", "zstd")
+
+    # Background health monitor (see app/services/health_service.py); /health serves its snapshot
+    HEALTH_CHECK_INTERVAL: float = float(os.getenv("HEALTH_CHECK_INTERVAL", "5"))
+    HEALTH_DB_TIMEOUT: float = float(os.getenv("HEALTH_DB_TIMEOUT", "2"))
+    HEALTH_UPSTREAM_CHECK: bool = os.getenv("HEALTH_UPSTREAM_CHECK", "true").lower() in ("1", "true", "yes")
+    HEALTH_UPSTREAM_TIMEOUT: float = float(os.getenv("HEALTH_UPSTREAM_TIMEOUT", "2"))
+    # /health/ready fails when the last completed check is older than this (seconds)
+    HEALTH_MAX_AGE: float = float(os.getenv("HEALTH_MAX_AGE", "30"))
 
     WEATHER_API_KEY: str | None = os.getenv("WEATHER_API_KEY")
     WEATHER_BASE_URL: str = os.getenv("WEATHER_BASE_URL", "https://api.weatherapi.com/v1")
@@ -20,10 +73,138 @@ class Settings(BaseSettings):
     # Tune these if needed
     REQUEST_TIMEOUT: int = int(os.getenv("REQUEST_TIMEOUT", "10"))
 
+    # POST /weather/batch limits; WeatherAPI bulk requests (paid plans) for `current` misses
+    BATCH_MAX_ITEMS: int = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+    BATCH_CONCURRENCY: int = int(os.getenv("BATCH_CONCURRENCY", "20"))
+    WEATHER_BULK_ENABLED: bool = os.getenv("WEATHER_BULK_ENABLED", "false").lower() in ("1", "true", "yes")
+    WEATHER_BULK_SIZE: int = int(os.getenv("WEATHER_BULK_SIZE", "50"))
+
+    # Async upstream client (shared httpx.AsyncClient) pool and retry settings
+    UPSTREAM_POOL_SIZE: int = int(os.getenv("UPSTREAM_POOL_SIZE", "200"))
+    UPSTREAM_KEEPALIVE: int = int(os.getenv("UPSTREAM_KEEPALIVE", "50"))
+    UPSTREAM_KEEPALIVE_EXPIRY: float = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30"))
+    UPSTREAM_MAX_PER_HOST: int = int(os.getenv("UPSTREAM_MAX_PER_HOST", "100"))
+    UPSTREAM_HTTP2: bool = os.getenv("UPSTREAM_HTTP2", "true").lower() in ("1", "true", "yes")
+    UPSTREAM_RETRIES: int = int(os.getenv("UPSTREAM_RETRIES", "2"))
+    UPSTREAM_BACKOFF_FACTOR: float = float(os.getenv("UPSTREAM_BACKOFF_FACTOR", "0.5"))
+
+    # Per-API circuit breaker (see app/utils/resilience.py): opens when, over CIRCUIT_WINDOW seconds
+    # and at least CIRCUIT_MIN_CALLS calls, the failure rate or the share of calls slower than
+    # CIRCUIT_SLOW_CALL_MS crosses its threshold; probes again after CIRCUIT_OPEN_SECONDS
+    CIRCUIT_BREAKER_ENABLED: bool = os.getenv("CIRCUIT_BREAKER_ENABLED", "true").lower() in ("1", "true", "yes")
+    CIRCUIT_WINDOW: float = float(os.getenv("CIRCUIT_WINDOW", "30"))
+    CIRCUIT_MIN_CALLS: int = int(os.getenv("CIRCUIT_MIN_CALLS", "20"))
+    CIRCUIT_ERROR_RATE: float = float(os.getenv("CIRCUIT_ERROR_RATE", "0.5"))
+    CIRCUIT_SLOW_CALL_MS: float = float(os.getenv("CIRCUIT_SLOW_CALL_MS", "5000"))
+    CIRCUIT_SLOW_RATE: float = float(os.getenv("CIRCUIT_SLOW_RATE", "0.8"))
+    CIRCUIT_OPEN_SECONDS: float = float(os.getenv("CIRCUIT_OPEN_SECONDS", "15"))
+    CIRCUIT_HALF_OPEN_PROBES: int = int(os.getenv("CIRCUIT_HALF_OPEN_PROBES", "3"))
+    # Adaptive (AIMD) limit on outstanding upstream calls; calls slower than
+    # UPSTREAM_LIMIT_LATENCY_MS or failing shrink it by UPSTREAM_LIMIT_BACKOFF
+    UPSTREAM_ADAPTIVE_LIMIT: bool = os.getenv("UPSTREAM_ADAPTIVE_LIMIT", "true").lower() in ("1", "true", "yes")
+    UPSTREAM_LIMIT_INITIAL: int = int(os.getenv("UPSTREAM_LIMIT_INITIAL", "50"))
+    UPSTREAM_LIMIT_MIN: int = int(os.getenv("UPSTREAM_LIMIT_MIN", "5"))
+    UPSTREAM_LIMIT_MAX: int = int(os.getenv("UPSTREAM_LIMIT_MAX", "200"))
+    UPSTREAM_LIMIT_LATENCY_MS: float = float(os.getenv("UPSTREAM_LIMIT_LATENCY_MS", "2000"))
+    UPSTREAM_LIMIT_BACKOFF: float = float(os.getenv("UPSTREAM_LIMIT_BACKOFF", "0.7"))
+
+    # Hedged upstream calls (see app/utils/hedging.py): a call to one of HEDGE_APIS still running after
+    # the HEDGE_PERCENTILE latency of the last HEDGE_WINDOW calls (at least HEDGE_MIN_DELAY_MS, and
+    # once HEDGE_MIN_SAMPLES were seen) is sent again and the first answer wins; HEDGE_BUDGET caps
+    # the extra calls as a fraction of all calls
+    HEDGE_ENABLED: bool = os.getenv("HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+    HEDGE_APIS: str = os.getenv("HEDGE_APIS", "current,forecast")
+    HEDGE_PERCENTILE: float = float(os.getenv("HEDGE_PERCENTILE", "95"))
+    HEDGE_MIN_DELAY_MS: float = float(os.getenv("HEDGE_MIN_DELAY_MS", "50"))
+    HEDGE_MIN_SAMPLES: int = int(os.getenv("HEDGE_MIN_SAMPLES", "50"))
+    HEDGE_WINDOW: int = int(os.getenv("HEDGE_WINDOW", "1000"))
+    HEDGE_BUDGET: float = float(os.getenv("HEDGE_BUDGET", "0.05"))
+
+    # Upstream key pool (see app/utils/rate_limit.py): extra comma-separated keys used alongside
+    # WEATHER_API_KEY. Each key gets a token bucket (RATE_LIMIT_PER_KEY calls/s, bursts of
+    # RATE_LIMIT_BURST; 0 = no limit) and a monthly call quota (0 = unlimited), shared by all
+    # workers through Redis when RATE_LIMIT_SHARED and REDIS_URL are set (RATE_LIMIT_REDIS_TIMEOUT
+    # seconds per Redis call; on errors each process falls back to its own buckets). A call waits up to
+    # RATE_LIMIT_MAX_WAIT seconds for a key before failing with 503; a key answered with 429
+    # rests for the upstream's Retry-After, or RATE_LIMIT_COOLDOWN seconds doubling with each
+    # 429 in a row up to RATE_LIMIT_COOLDOWN_MAX (the last usable key never rests past
+    # RATE_LIMIT_MAX_WAIT)
+    WEATHER_API_KEYS: str = os.getenv("WEATHER_API_KEYS", "")
+    RATE_LIMIT_PER_KEY: float = float(os.getenv("RATE_LIMIT_PER_KEY", "0"))
+    RATE_LIMIT_BURST: float = float(os.getenv("RATE_LIMIT_BURST", "10"))
+    RATE_LIMIT_MONTHLY_QUOTA: int = int(os.getenv("RATE_LIMIT_MONTHLY_QUOTA", "0"))
+    RATE_LIMIT_SHARED: bool = os.getenv("RATE_LIMIT_SHARED", "true").lower() in ("1", "true", "yes")
+    RATE_LIMIT_REDIS_TIMEOUT: float = float(os.getenv("RATE_LIMIT_REDIS_TIMEOUT", "0.25"))
+    RATE_LIMIT_MAX_WAIT: float = float(os.getenv("RATE_LIMIT_MAX_WAIT", "1.0"))
+    RATE_LIMIT_COOLDOWN: float = float(os.getenv("RATE_LIMIT_COOLDOWN", "1"))
+    RATE_LIMIT_COOLDOWN_MAX: float = float(os.getenv("RATE_LIMIT_COOLDOWN_MAX", "60"))
+
+    # Logging (see app/utils/logger.py): json | text lines, written by a background thread from a
+    # bounded queue when LOG_ASYNC is set. LOG_SAMPLE_RATES keeps a fraction of INFO records per
+    # event (e.g. "cache_hit=0.01"); LOG_RATE_LIMIT caps every event at that many records per
+    # second (0 = no cap). app.log is written under LOG_DIR (default: backend/logs, whatever the
+    # working directory)
+    LOG_DIR: str = os.getenv("LOG_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs"))
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")
+    LOG_ASYNC: bool = os.getenv("LOG_ASYNC", "true").lower() in ("1", "true", "yes")
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    LOG_SAMPLE_RATES: str = os.getenv("LOG_SAMPLE_RATES", "cache_hit=0.01")
+    LOG_RATE_LIMIT: int = int(os.getenv("LOG_RATE_LIMIT", "200"))
+
     # Optional Redis cache URL (e.g. redis://localhost:6379/0)
     REDIS_URL: str | None = os.getenv("REDIS_URL")
 
     # Cache TTL seconds used by optional Redis cache
     CACHE_TTL: int = int(os.getenv("CACHE_TTL", "30"))
 
+    # Per-API TTL overrides, e.g. "forecast=300,search=86400" (see app/utils/cache_policy.py)
+    CACHE_TTL_OVERRIDES: str = os.getenv("CACHE_TTL_OVERRIDES", "")
+    # How long an expired entry may still be served while it is refreshed in the background
+    CACHE_STALE_TTL: int = int(os.getenv("CACHE_STALE_TTL", "300"))
+    # Beyond that, entries are kept this much longer as a fallback while the upstream is failing
+    # or its circuit is open (stale-if-error); 0 disables the fallback
+    CACHE_STALE_IF_ERROR_TTL: int = int(os.getenv("CACHE_STALE_IF_ERROR_TTL", "3600"))
+    # Storage TTL for immutable results (e.g. history for past dates)
+    CACHE_IMMUTABLE_TTL: int = int(os.getenv("CACHE_IMMUTABLE_TTL", str(30 * 24 * 3600)))
+    # Probabilistic early refresh (XFetch) aggressiveness; 0 disables it
+    CACHE_EARLY_REFRESH_BETA: float = float(os.getenv("CACHE_EARLY_REFRESH_BETA", "1.0"))
+
+    # Redis value encoding: json | msgpack, compression none | zlib | zstd (see app/utils/cache_codec.py)
+    CACHE_SERIALIZER: str = os.getenv("CACHE_SERIALIZER", "json")
+    CACHE_COMPRESSION: str = os.getenv("CACHE_COMPRESSION", "zlib")
+    CACHE_COMPRESS_MIN_BYTES: int = int(os.getenv("CACHE_COMPRESS_MIN_BYTES", "1024"))
+    CACHE_COMPRESSION_LEVEL: int = int(os.getenv("CACHE_COMPRESSION_LEVEL", "3"))
+
+    # In-process L1 cache in front of Redis (also used on its own when REDIS_URL is unset)
+    LOCAL_CACHE_ENABLED: bool = os.getenv("LOCAL_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    LOCAL_CACHE_MAX_ENTRIES: int = int(os.getenv("LOCAL_CACHE_MAX_ENTRIES", "10000"))
+    LOCAL_CACHE_MAX_BYTES: int = int(os.getenv("LOCAL_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+    # Location canonicalization (see app/utils/locations.py): lat/lon decimals kept in
+    # queries and cache keys (2 ~ 1 km), and aliases learned from search results
+    LOCATION_COORD_PRECISION: int = int(os.getenv("LOCATION_COORD_PRECISION", "2"))
+    LOCATION_ALIASES_ENABLED: bool = os.getenv("LOCATION_ALIASES_ENABLED", "true").lower() in ("1", "true", "yes")
+    LOCATION_ALIAS_MAX: int = int(os.getenv("LOCATION_ALIAS_MAX", "50000"))
+
+    # Pre-warming: track hot cache keys (count-min sketch + top-K) and refresh them shortly
+    # before their fresh TTL ends, within an upstream call budget (see app/services/prewarm_service.py)
+    PREWARM_ENABLED: bool = os.getenv("PREWARM_ENABLED", "false").lower() in ("1", "true", "yes")
+    PREWARM_APIS: str = os.getenv("PREWARM_APIS", "current,forecast")
+    PREWARM_TOP_K: int = int(os.getenv("PREWARM_TOP_K", "500"))
+    PREWARM_MIN_HITS: int = int(os.getenv("PREWARM_MIN_HITS", "3"))
+    PREWARM_INTERVAL: float = float(os.getenv("PREWARM_INTERVAL", "5"))
+    PREWARM_LEAD_TIME: float = float(os.getenv("PREWARM_LEAD_TIME", "15"))
+    PREWARM_BUDGET_PER_MINUTE: int = int(os.getenv("PREWARM_BUDGET_PER_MINUTE", "120"))
+    PREWARM_CONCURRENCY: int = int(os.getenv("PREWARM_CONCURRENCY", "5"))
+    PREWARM_DECAY_INTERVAL: float = float(os.getenv("PREWARM_DECAY_INTERVAL", "600"))
+
+    # Coalesce identical concurrent upstream calls (in-process, optionally across
+    # processes via a Redis lock when REDIS_URL is set)
+    COALESCE_ENABLED: bool = os.getenv("COALESCE_ENABLED", "true").lower() in ("1", "true", "yes")
+    COALESCE_DISTRIBUTED: bool = os.getenv("COALESCE_DISTRIBUTED", "false").lower() in ("1", "true", "yes")
+    COALESCE_LOCK_TTL_MS: int = int(os.getenv("COALESCE_LOCK_TTL_MS", "15000"))
+    COALESCE_WAIT_TIMEOUT: float = float(os.getenv("COALESCE_WAIT_TIMEOUT", "10"))
+    COALESCE_POLL_INTERVAL: float = float(os.getenv("COALESCE_POLL_INTERVAL", "0.05"))
+
 settings = Settings()
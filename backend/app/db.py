@@ -1,71 +1,247 @@
-from typing import Any
-import oracledb
-from app.config import settings
 """Oracle DB helpers.
 
-This module creates a SessionPool on import (when possible) and exposes
-`get_connection()` for callers. Callers must close connections when done.
+A connection pool (`oracledb.create_pool`) is created on first use, with a
+bounded acquire wait (`ORACLE_POOL_GETMODE` / `ORACLE_POOL_WAIT_TIMEOUT_MS`),
+statement caching and pinging of idle connections. Async code reaches it
+through the threadpool (`run_in_threadpool`), so every Oracle session the app
+holds comes from this one pool.
+
+Use `connection()` so connections are always returned to the pool;
+`get_connection()` remains for callers that close connections themselves.
 """
 
-# module-level pool reference
-_pool: oracledb.SessionPool | None = None
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+import oracledb
+from app.config import settings
+from app.utils.logger import logger
+from app.utils.metrics import REGISTRY
 
+_GETMODES = {
+    "wait": oracledb.POOL_GETMODE_WAIT,
+    "nowait": oracledb.POOL_GETMODE_NOWAIT,
+    "forceget": oracledb.POOL_GETMODE_FORCEGET,
+    "timedwait": oracledb.POOL_GETMODE_TIMEDWAIT,
+}
 
-def _init_pool() -> None:
-    global _pool
-    # only initialize pool when credentials present
-    if not settings.ORACLE_USER or not settings.ORACLE_PASSWORD or not settings.ORACLE_DSN:
-        _pool = None
-        return
+# module-level pool references
+_pool: Optional[oracledb.ConnectionPool] = None
+_pool_attempted = False
+_pool_lock = threading.Lock()
 
-    try:
-        _pool = oracledb.SessionPool(
-            user=settings.ORACLE_USER,
-            password=settings.ORACLE_PASSWORD,
-            dsn=settings.ORACLE_DSN,
-            min=settings.ORACLE_POOL_MIN or 1,
-            max=settings.ORACLE_POOL_MAX or 4,
-            increment=settings.ORACLE_POOL_INCREMENT or 1,
-            threaded=True
-        )
-    except Exception:
-        # if pool creation fails, leave pool as None; callers will fall back to connect()
-        _pool = None
+ACQUIRE_LATENCY = REGISTRY.histogram(
+    "weather_db_pool_acquire_seconds",
+    "Time spent waiting for a pooled Oracle connection.",
+    ("pool",),
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+
+class PoolTelemetry:
+    """Acquire counters for one pool: waiters, latency, timeouts."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.acquired = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def begin(self) -> float:
+        with self._lock:
+            self.waiting += 1
+        return time.perf_counter()
 
+    def end(self, start: float, exc: Optional[BaseException] = None) -> None:
+        elapsed = time.perf_counter() - start
+        ACQUIRE_LATENCY.observe(elapsed, self.name)
+        with self._lock:
+            self.waiting -= 1
+            if exc is None:
+                self.acquired += 1
+                self.total_ms += elapsed * 1000
+                self.max_ms = max(self.max_ms, elapsed * 1000)
+            else:
+                self.failed += 1
+                if _is_acquire_timeout(exc):
+                    self.timeouts += 1
 
-# initialize pool at import time
-_init_pool()
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "waiting": self.waiting,
+            "acquired": self.acquired,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "avg_acquire_ms": round(self.total_ms / self.acquired, 2) if self.acquired else 0.0,
+            "max_acquire_ms": round(self.max_ms, 2),
+        }
+
+
+_sync_telemetry = PoolTelemetry("sync")
+
+
+def _is_acquire_timeout(exc: BaseException) -> bool:
+    # DPY-4005 (thin) / ORA-24457 (thick): no connection became available within wait_timeout
+    text = str(exc)
+    return "DPY-4005" in text or "ORA-24457" in text
+
+
+# the connection was lost or could not be made; a retry on a fresh connection may succeed
+_CONNECTION_ERRORS = ("DPY-4011", "DPY-6005", "ORA-03113", "ORA-03114", "ORA-03135", "ORA-12170", "ORA-12514", "ORA-12541")
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    """True for errors worth retrying (lost connection, pool exhausted), False for a bad statement or row."""
+    if isinstance(exc, (ConnectionError, TimeoutError)) or _is_acquire_timeout(exc):
+        return True
+    text = str(exc)
+    return any(code in text for code in _CONNECTION_ERRORS)
+
+
+def _credentials_configured() -> bool:
+    return bool(settings.ORACLE_USER and settings.ORACLE_PASSWORD and settings.ORACLE_DSN)
+
+
+def _pool_params() -> Dict[str, Any]:
+    getmode = settings.ORACLE_POOL_GETMODE.lower()
+    if getmode not in _GETMODES:
+        raise ValueError(f"Invalid ORACLE_POOL_GETMODE: {settings.ORACLE_POOL_GETMODE}")
+    return {
+        "user": settings.ORACLE_USER,
+        "password": settings.ORACLE_PASSWORD,
+        "dsn": settings.ORACLE_DSN,
+        "min": settings.ORACLE_POOL_MIN or 1,
+        "max": settings.ORACLE_POOL_MAX or 4,
+        "increment": settings.ORACLE_POOL_INCREMENT or 1,
+        "getmode": _GETMODES[getmode],
+        "wait_timeout": settings.ORACLE_POOL_WAIT_TIMEOUT_MS,
+        "ping_interval": settings.ORACLE_POOL_PING_INTERVAL,
+        "stmtcachesize": settings.ORACLE_STMT_CACHE_SIZE,
+    }
+
+
+def _get_pool() -> Optional[oracledb.ConnectionPool]:
+    """Create the pool on first use (only when credentials are present)."""
+    global _pool, _pool_attempted
+    if _pool is not None or _pool_attempted:
+        return _pool
+    with _pool_lock:
+        if not _pool_attempted:
+            _pool_attempted = True
+            if _credentials_configured():
+                try:
+                    _pool = oracledb.create_pool(**_pool_params())
+                except Exception as exc:
+                    # leave pool as None; callers fall back to connect()
+                    logger.warning("Could not create Oracle pool, using direct connections: %s", exc)
+                    _pool = None
+    return _pool
 
 
 def get_connection() -> Any:
     """
-    Return a connection from the session pool if available, otherwise a new direct connection.
+    Return a connection from the pool if available, otherwise a new direct connection.
     Caller is responsible for closing the connection (if from pool, call `conn.close()` to return it to pool).
+    Prefer `connection()`, which does that automatically.
     """
-    if _pool is not None:
-        return _pool.acquire()
+    pool = _get_pool()
+    if pool is not None:
+        start = _sync_telemetry.begin()
+        try:
+            conn = pool.acquire()
+        except Exception as exc:
+            _sync_telemetry.end(start, exc)
+            raise
+        _sync_telemetry.end(start)
+        return conn
 
-    if not settings.ORACLE_USER or not settings.ORACLE_PASSWORD or not settings.ORACLE_DSN:
+    if not _credentials_configured():
         raise ValueError("Oracle DB credentials are not configured in environment variables.")
 
     return oracledb.connect(
         user=settings.ORACLE_USER,
         password=settings.ORACLE_PASSWORD,
-        dsn=settings.ORACLE_DSN
+        dsn=settings.ORACLE_DSN,
+        stmtcachesize=settings.ORACLE_STMT_CACHE_SIZE,
     )
 
 
+@contextmanager
+def connection() -> Iterator[Any]:
+    """Yield a connection and always return it to the pool (or close it)."""
+    conn = get_connection()
+    try:
+        yield conn
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def close_pool() -> None:
+    """Close the pool (application shutdown; blocking)."""
+    global _pool, _pool_attempted
+    with _pool_lock:
+        if _pool is not None:
+            try:
+                _pool.close(force=True)
+            except Exception as exc:
+                logger.warning("Failed to close Oracle pool: %s", exc)
+        _pool = None
+        _pool_attempted = False
+
+
+def ping() -> None:
+    """Run `SELECT 1 FROM DUAL` on a pooled connection (blocking)."""
+    with connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT 1 FROM DUAL")
+            cur.fetchone()
+        finally:
+            cur.close()
+
+
+def _live_stats(pool: Any) -> Dict[str, Any]:
+    return {
+        "busy": getattr(pool, "busy", None),
+        "opened": getattr(pool, "opened", None),
+        "max": getattr(pool, "max", settings.ORACLE_POOL_MAX),
+    }
+
+
 def get_pool_info() -> dict:
-    """Return basic information about the connection pool for diagnostics.
+    """Return pool configuration and live utilization for diagnostics.
 
     Does not expose credentials.
     """
     if _pool is None:
         return {"pool_initialized": False}
 
-    return {
+    reference = _pool
+    info: Dict[str, Any] = {
         "pool_initialized": True,
-        "min": getattr(_pool, "min", settings.ORACLE_POOL_MIN),
-        "max": getattr(_pool, "max", settings.ORACLE_POOL_MAX),
-        "increment": getattr(_pool, "increment", settings.ORACLE_POOL_INCREMENT),
+        "min": getattr(reference, "min", settings.ORACLE_POOL_MIN),
+        "max": getattr(reference, "max", settings.ORACLE_POOL_MAX),
+        "increment": getattr(reference, "increment", settings.ORACLE_POOL_INCREMENT),
+        "stmtcachesize": getattr(reference, "stmtcachesize", settings.ORACLE_STMT_CACHE_SIZE),
+        "getmode": settings.ORACLE_POOL_GETMODE,
+        "wait_timeout_ms": getattr(reference, "wait_timeout", settings.ORACLE_POOL_WAIT_TIMEOUT_MS),
+        "ping_interval": getattr(reference, "ping_interval", settings.ORACLE_POOL_PING_INTERVAL),
     }
+    info["sync"] = {**_live_stats(_pool), **_sync_telemetry.stats()}
+    return info
+
+
+def get_pool_stats() -> dict:
+    """Return live utilization per pool ({"sync": {...}}); empty when no pool is open."""
+    stats = {}
+    if _pool is not None:
+        stats["sync"] = {**_live_stats(_pool), "waiting": _sync_telemetry.waiting}
+    return stats
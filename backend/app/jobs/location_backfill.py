@@ -0,0 +1,115 @@
+"""Backfill job: rewrite stored `location` values in their normalized form.
+
+Rows written before locations were normalized (see `db_service.build_record`)
+keep the caller's spelling ("Delhi", " DELHI "), which the normalized filters
+of /db/responses and /db/aggregates no longer match. The job lists the
+distinct spellings, normalizes them with `normalize_location` (the same
+function the writer uses) and rewrites each one in `weather_api_response` and
+`weather_observation` in its own transaction, so it can be stopped and re-run
+at any time.
+
+In `weather_observation` a spelling can collide with a row already stored
+under the normalized name; the row from the newest response is kept, as the
+ETL does.
+
+    python -m app.jobs.location_backfill --dry-run
+"""
+
+import argparse
+import time
+from typing import Any, Dict, List, Tuple
+
+from app.db import connection
+from app.utils.locations import normalize_location
+from app.utils.logger import configure_logging, logger
+
+DISTINCT_LOCATIONS_SQL = "SELECT DISTINCT location FROM weather_api_response WHERE location IS NOT NULL"
+UPDATE_RESPONSES_SQL = "UPDATE weather_api_response SET location = :new WHERE location = :old"
+# newest response wins: drop normalized rows superseded by an old-spelling row, move the
+# old-spelling rows that have no normalized twin left, then drop the rest
+DROP_SUPERSEDED_OBSERVATIONS_SQL = (
+    "DELETE FROM weather_observation o WHERE o.location = :new AND EXISTS ("
+    "SELECT 1 FROM weather_observation x WHERE x.location = :old AND x.kind = o.kind "
+    "AND x.observed_at = o.observed_at AND x.response_id > o.response_id)"
+)
+MOVE_OBSERVATIONS_SQL = (
+    "UPDATE weather_observation o SET location = :new WHERE o.location = :old AND NOT EXISTS ("
+    "SELECT 1 FROM weather_observation n WHERE n.location = :new AND n.kind = o.kind AND n.observed_at = o.observed_at)"
+)
+DROP_DUPLICATE_OBSERVATIONS_SQL = "DELETE FROM weather_observation WHERE location = :old"
+# the placeholder `build_record` stores for requests without a location
+_NO_LOCATION = "N/A"
+# ORA-00942: weather_observation does not exist (migration 005 not installed)
+_NO_TABLE = "ORA-00942"
+
+
+def spellings_to_fix(locations: List[str]) -> List[Tuple[str, str]]:
+    """(stored, normalized) pairs for the stored values that are not normalized."""
+    pairs = []
+    for old in locations:
+        if old == _NO_LOCATION:
+            continue
+        new = normalize_location(old)
+        if new and new != old:
+            pairs.append((old, new))
+    return pairs
+
+
+def _fix_observations(cursor, binds: Dict[str, str]) -> int:
+    cursor.execute(DROP_SUPERSEDED_OBSERVATIONS_SQL, binds)
+    cursor.execute(MOVE_OBSERVATIONS_SQL, binds)
+    moved = cursor.rowcount
+    cursor.execute(DROP_DUPLICATE_OBSERVATIONS_SQL, {"old": binds["old"]})
+    return moved
+
+
+def backfill(dry_run: bool = False, observations: bool = True) -> Dict[str, Any]:
+    """Normalize stored locations; returns counters (spellings, responses and observations rewritten)."""
+    stats: Dict[str, Any] = {"spellings": 0, "responses": 0, "observations": 0}
+    started = time.perf_counter()
+    with connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(DISTINCT_LOCATIONS_SQL)
+            pairs = spellings_to_fix([row[0] for row in cursor.fetchall()])
+            stats["spellings"] = len(pairs)
+            if dry_run:
+                logger.info("Location backfill: %s spellings to normalize: %s", len(pairs), pairs[:20])
+                return stats
+            for old, new in pairs:
+                binds = {"old": old, "new": new}
+                try:
+                    cursor.execute(UPDATE_RESPONSES_SQL, binds)
+                    stats["responses"] += cursor.rowcount
+                    if observations:
+                        try:
+                            stats["observations"] += _fix_observations(cursor, binds)
+                        except Exception as exc:
+                            if _NO_TABLE not in str(exc):
+                                raise
+                            logger.info("weather_observation not installed; only weather_api_response is normalized")
+                            observations = False
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                logger.info("Location backfill: %r -> %r", old, new)
+        finally:
+            cursor.close()
+
+    stats["elapsed_s"] = round(time.perf_counter() - started, 2)
+    logger.info("Location backfill done: %s", stats)
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rewrite stored locations in their normalized form")
+    parser.add_argument("--dry-run", action="store_true", help="only count the spellings that would be rewritten")
+    parser.add_argument("--skip-observations", action="store_true", help="leave weather_observation as it is")
+    args = parser.parse_args()
+    configure_logging()
+    backfill(args.dry_run, not args.skip_observations)
+
+
+if __name__ == "__main__":
+    main()
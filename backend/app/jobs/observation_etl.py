@@ -0,0 +1,179 @@
+"""Incremental ETL: typed `weather_observation` rows from stored `current`/`forecast` responses.
+
+Tails `weather_api_response` by id from the high-water mark kept in
+`etl_watermark` (database/migrations/005_weather_observation_*.sql). Each
+batch parses the payloads once, collects the fields column-wise and writes
+them with one array-bound MERGE; the watermark is advanced in the same
+transaction, so a run can be stopped at any point and re-run without gaps or
+duplicates. Rows newer than `--settle-seconds` are left for the next run: ids
+are assigned at insert time, so a slower concurrent transaction may still
+commit a lower id than one already visible.
+
+    python -m app.jobs.observation_etl --batch-size 500
+"""
+
+import argparse
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.db import connection
+from app.services.query_service import lobs_as_strings, source_table
+from app.utils.logger import configure_logging, logger
+from app.utils.raw_json import json_loads
+
+JOB_NAME = "weather_observation"
+OBSERVATION_APIS = ("current", "forecast")
+_API_BINDS = {f"api{i}": api for i, api in enumerate(OBSERVATION_APIS)}
+# payload field -> weather_observation column (same names in `current` and forecast `hour` entries)
+MEASURES = ("temp_c", "feelslike_c", "humidity", "wind_kph", "wind_degree", "gust_kph", "pressure_mb", "precip_mm", "cloud", "uv")
+OBSERVATION_COLUMNS = ("location", "kind", "observed_at", "response_id", "lat", "lon") + MEASURES + ("condition_code",)
+
+SELECT_WATERMARK_SQL = "SELECT last_id FROM etl_watermark WHERE job_name = :job"
+MERGE_WATERMARK_SQL = (
+    "MERGE INTO etl_watermark w USING (SELECT :job AS job_name FROM dual) s "
+    "ON (w.job_name = s.job_name) "
+    "WHEN MATCHED THEN UPDATE SET w.last_id = :last_id, w.updated_at = CURRENT_TIMESTAMP "
+    "WHEN NOT MATCHED THEN INSERT (job_name, last_id) VALUES (:job, :last_id)"
+)
+_UPDATE_COLUMNS = [c for c in OBSERVATION_COLUMNS if c not in ("location", "kind", "observed_at")]
+MERGE_OBSERVATION_SQL = (
+    "MERGE INTO weather_observation o USING (SELECT "
+    + ", ".join(f":{c} AS {c}" for c in OBSERVATION_COLUMNS)
+    + " FROM dual) s ON (o.location = s.location AND o.kind = s.kind AND o.observed_at = s.observed_at) "
+    "WHEN MATCHED THEN UPDATE SET "
+    + ", ".join(f"o.{c} = s.{c}" for c in _UPDATE_COLUMNS)
+    + " WHERE o.response_id < s.response_id "
+    "WHEN NOT MATCHED THEN INSERT ("
+    + ", ".join(OBSERVATION_COLUMNS)
+    + ") VALUES ("
+    + ", ".join(f"s.{c}" for c in OBSERVATION_COLUMNS)
+    + ")"
+)
+
+
+def _utc(epoch: Any) -> Optional[datetime]:
+    if epoch is None:
+        return None
+    return datetime.fromtimestamp(int(epoch), timezone.utc).replace(tzinfo=None)
+
+
+def _observation(response_id: int, location: str, kind: str, coords: Tuple[Any, Any], block: Dict[str, Any], epoch: Any):
+    observed_at = _utc(epoch)
+    if observed_at is None:
+        return None
+    condition = block.get("condition")
+    return (location, kind, observed_at, response_id, coords[0], coords[1]) + tuple(block.get(m) for m in MEASURES) + (
+        condition.get("code") if isinstance(condition, dict) else None,
+    )
+
+
+def extract_observations(response_id: int, location: str, payload: Any) -> List[Tuple[Any, ...]]:
+    """Observation tuples (in `OBSERVATION_COLUMNS` order) from one current/forecast payload."""
+    if not isinstance(payload, dict) or "error" in payload:
+        return []
+    place = payload.get("location") or {}
+    coords = (place.get("lat"), place.get("lon"))
+    rows = []
+    current = payload.get("current")
+    if isinstance(current, dict):
+        rows.append(_observation(response_id, location, "current", coords, current, current.get("last_updated_epoch")))
+    for day in (payload.get("forecast") or {}).get("forecastday") or []:
+        for hour in day.get("hour") or []:
+            rows.append(_observation(response_id, location, "forecast", coords, hour, hour.get("time_epoch")))
+    return [r for r in rows if r is not None]
+
+
+def to_columns(rows: List[Tuple[Any, ...]]) -> List[Dict[str, Any]]:
+    """Keep the newest row per (location, kind, observed_at) and build the MERGE binds."""
+    latest: Dict[Tuple[Any, ...], Tuple[Any, ...]] = {}
+    for row in rows:
+        key = row[:3]
+        if key not in latest or latest[key][3] < row[3]:
+            latest[key] = row
+    return [dict(zip(OBSERVATION_COLUMNS, row)) for row in latest.values()]
+
+
+def _read_watermark(conn) -> int:
+    cursor = conn.cursor()
+    try:
+        cursor.execute(SELECT_WATERMARK_SQL, {"job": JOB_NAME})
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    return int(row[0]) if row else 0
+
+
+def run_etl(batch_size: int = 500, max_batches: Optional[int] = None, settle_seconds: int = 60) -> Dict[str, Any]:
+    """Process new responses up to the settle horizon; returns counters."""
+    stats = {"responses": 0, "observations": 0, "batches": 0, "skipped": 0}
+    started = time.perf_counter()
+    with connection() as conn:
+        last_id = stats["start_id"] = _read_watermark(conn)
+        # the settle horizon is taken from the database clock, which also stamped request_time
+        select_sql = (
+            f"SELECT id, location, json_data FROM {source_table(conn, True)} "
+            f"WHERE id > :last_id AND api_type IN ({', '.join(':' + b for b in _API_BINDS)}) "
+            "AND request_time < SYSTIMESTAMP - NUMTODSINTERVAL(:settle_s, 'SECOND') "
+            "ORDER BY id FETCH FIRST :batch_rows ROWS ONLY"
+        )
+        while max_batches is None or stats["batches"] < max_batches:
+            read = conn.cursor()
+            try:
+                read.arraysize = batch_size
+                read.outputtypehandler = lobs_as_strings
+                read.execute(select_sql, {"last_id": last_id, "settle_s": settle_seconds, "batch_rows": batch_size, **_API_BINDS})
+                rows = read.fetchall()
+            finally:
+                read.close()
+            if not rows:
+                break
+
+            observations = []
+            for response_id, location, text in rows:
+                try:
+                    payload = json_loads(text) if text else None
+                except ValueError:
+                    payload = None
+                extracted = extract_observations(response_id, location, payload)
+                if not extracted:
+                    stats["skipped"] += 1
+                observations.extend(extracted)
+            binds = to_columns(observations)
+            last_id = rows[-1][0]
+
+            write = conn.cursor()
+            try:
+                if binds:
+                    write.executemany(MERGE_OBSERVATION_SQL, binds)
+                write.execute(MERGE_WATERMARK_SQL, {"job": JOB_NAME, "last_id": last_id})
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                write.close()
+
+            stats["responses"] += len(rows)
+            stats["observations"] += len(binds)
+            stats["batches"] += 1
+            logger.info("Observation ETL: batch %s, %s responses, %s observations (last id %s)", stats["batches"], len(rows), len(binds), last_id)
+
+    stats["last_id"] = last_id
+    stats["elapsed_s"] = round(time.perf_counter() - started, 2)
+    logger.info("Observation ETL done: %s", stats)
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Extract observations from stored current/forecast responses")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--max-batches", type=int, default=None)
+    parser.add_argument("--settle-seconds", type=int, default=60, help="leave responses younger than this for the next run")
+    args = parser.parse_args()
+    configure_logging()
+    run_etl(args.batch_size, args.max_batches, args.settle_seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Backfill job: move inline `json_data` into content-addressed `weather_payload`.
+
+Walks `weather_api_response` by id in batches, stores each distinct payload
+once (see `app.services.payload_store`), points the rows at it via
+`payload_hash` and clears their inline `json_data`. Each batch is one
+transaction and only rows without a `payload_hash` are picked up, so the job
+can be stopped and re-run at any time.
+
+    python -m app.jobs.payload_backfill --batch-size 1000
+"""
+
+import argparse
+import time
+from typing import Any, Dict, Optional
+
+from app.db import connection
+from app.services import payload_store
+from app.services.query_service import lobs_as_strings
+from app.utils.logger import configure_logging, logger
+
+SELECT_BATCH_SQL = (
+    "SELECT id, json_data FROM weather_api_response "
+    "WHERE id > :last_id AND payload_hash IS NULL AND json_data IS NOT NULL "
+    "ORDER BY id FETCH FIRST :batch_rows ROWS ONLY"
+)
+UPDATE_ROW_SQL = "UPDATE weather_api_response SET payload_hash = :phash, json_data = NULL WHERE id = :id"
+
+
+def backfill(batch_size: int = 1000, max_batches: Optional[int] = None, start_id: int = 0) -> Dict[str, Any]:
+    """Dedup existing rows; returns counters (rows converted, payloads written, batches)."""
+    stats = {"rows": 0, "payloads": 0, "batches": 0, "last_id": start_id}
+    started = time.perf_counter()
+    with connection() as conn:
+        while max_batches is None or stats["batches"] < max_batches:
+            read = conn.cursor()
+            try:
+                read.arraysize = batch_size
+                read.outputtypehandler = lobs_as_strings
+                read.execute(SELECT_BATCH_SQL, {"last_id": stats["last_id"], "batch_rows": batch_size})
+                rows = read.fetchall()
+            finally:
+                read.close()
+            if not rows:
+                break
+
+            records = [{"id": row_id, "jsondata": text} for row_id, text in rows]
+            write = conn.cursor()
+            try:
+                written = payload_store.store_payloads(write, records)
+                write.executemany(UPDATE_ROW_SQL, [{"phash": r["phash"], "id": r["id"]} for r in records])
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                write.close()
+
+            stats["rows"] += len(records)
+            stats["payloads"] += written
+            stats["batches"] += 1
+            stats["last_id"] = rows[-1][0]
+            logger.info("Payload backfill: batch %s, %s rows, %s new payloads (last id %s)", stats["batches"], len(records), written, stats["last_id"])
+
+    stats["elapsed_s"] = round(time.perf_counter() - started, 2)
+    logger.info("Payload backfill done: %s", stats)
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Move inline json_data into weather_payload")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--max-batches", type=int, default=None)
+    parser.add_argument("--start-id", type=int, default=0, help="resume after this id")
+    args = parser.parse_args()
+    configure_logging()
+    backfill(args.batch_size, args.max_batches, args.start_id)
+
+
+if __name__ == "__main__":
+    main()
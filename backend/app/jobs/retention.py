@@ -0,0 +1,166 @@
+"""Retention job: archive and drop `weather_api_response` partitions past `RETENTION_DAYS`.
+
+Needs the table partitioned by `request_time`
+(database/migrations/004_partition_by_request_time_oracle.sql). A partition
+expires once its upper bound is older than the cutoff; its rows are written to
+Parquet first (`ARCHIVE_ENABLED`, see `app.services.archive_service`) and the
+partition is dropped only after the archive file is complete. Dropping a whole
+partition is a dictionary operation, unlike a DELETE of the same rows, and
+leaves no fragmented free space behind. Safe to re-run: an interrupted run
+re-archives the partition it did not get to drop.
+
+    python -m app.jobs.retention --days 90 --dry-run
+"""
+
+import argparse
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.db import connection
+from app.services import archive_service
+from app.services.db_service import get_insert_statement
+from app.utils.logger import configure_logging, logger
+
+PARTITIONS_SQL = (
+    "SELECT partition_name, high_value FROM user_tab_partitions "
+    "WHERE table_name = 'WEATHER_API_RESPONSE' ORDER BY partition_position"
+)
+# weather_payload rows no longer referenced by any response (payload dedup, migration 003).
+# EXCLUSIVE mode waits for writers' open transactions (their MERGE holds a row-exclusive
+# table lock until the row INSERT commits) and holds off new ones until the DELETE commits.
+LOCK_PAYLOADS_SQL = "LOCK TABLE weather_payload IN EXCLUSIVE MODE"
+PRUNE_PAYLOADS_SQL = (
+    "DELETE FROM weather_payload p WHERE p.created_at < :cutoff "
+    "AND NOT EXISTS (SELECT 1 FROM weather_api_response r WHERE r.payload_hash = p.payload_hash)"
+)
+_HIGH_VALUE = re.compile(r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})")
+_PARTITION_NAME = re.compile(r"^[A-Z0-9_$#]+$")
+# ORA-14758: the last partition in the range section of an interval table cannot be dropped
+_LAST_RANGE_PARTITION = "ORA-14758"
+
+
+def parse_high_value(high_value: str) -> Optional[datetime]:
+    """Upper bound from a HIGH_VALUE expression such as ``TIMESTAMP' 2024-02-01 00:00:00'``."""
+    match = _HIGH_VALUE.search(high_value or "")
+    return datetime.strptime(match.group(1), "%Y-%m-%d %H:%M:%S") if match else None
+
+
+def list_partitions(conn) -> List[Tuple[str, Optional[datetime], datetime]]:
+    """(name, lower bound, upper bound) for each partition, oldest first; MAXVALUE partitions are skipped."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(PARTITIONS_SQL)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    partitions = []
+    lower = None
+    for name, high_value in rows:
+        upper = parse_high_value(high_value)
+        if upper is None:
+            continue
+        partitions.append((name, lower, upper))
+        lower = upper
+    return partitions
+
+
+def expired_partitions(partitions: List[Tuple[str, Optional[datetime], datetime]], cutoff: datetime):
+    """Partitions whose rows are all older than `cutoff`."""
+    return [p for p in partitions if p[2] <= cutoff]
+
+
+def _drop_partition(conn, name: str) -> str:
+    if not _PARTITION_NAME.match(name):
+        raise ValueError(f"Unexpected partition name: {name!r}")
+    cursor = conn.cursor()
+    try:
+        try:
+            cursor.execute(f'ALTER TABLE weather_api_response DROP PARTITION "{name}" UPDATE GLOBAL INDEXES')
+            return "dropped"
+        except Exception as exc:
+            if _LAST_RANGE_PARTITION not in str(exc):
+                raise
+            # the initial partition of an interval table has to stay; emptying it frees the space
+            cursor.execute(f'ALTER TABLE weather_api_response TRUNCATE PARTITION "{name}" UPDATE GLOBAL INDEXES')
+            return "truncated"
+    finally:
+        cursor.close()
+
+
+def prune_payloads(conn, cutoff: datetime) -> int:
+    """Delete payloads created before `cutoff` that no response references any more.
+
+    Runs under an exclusive lock on `weather_payload`, so a writer cannot
+    reference a payload between the NOT EXISTS check and the DELETE: writers
+    block on their payload MERGE until the prune commits (the write-behind
+    queue absorbs the pause).
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(LOCK_PAYLOADS_SQL)
+        cursor.execute(PRUNE_PAYLOADS_SQL, {"cutoff": cutoff})
+        deleted = cursor.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return deleted
+
+
+def run_retention(
+    days: Optional[int] = None,
+    archive: Optional[bool] = None,
+    dry_run: bool = False,
+    prune: bool = False,
+) -> Dict[str, Any]:
+    """Archive and drop expired partitions; returns a summary of what was done."""
+    days = settings.RETENTION_DAYS if days is None else days
+    archive = settings.ARCHIVE_ENABLED if archive is None else archive
+    cutoff = datetime.now() - timedelta(days=days)
+    summary: Dict[str, Any] = {"cutoff": cutoff.isoformat(), "partitions": [], "archived_rows": 0, "payloads_pruned": 0}
+    started = time.perf_counter()
+
+    with connection() as conn:
+        partitions = list_partitions(conn)
+        if not partitions:
+            logger.warning("weather_api_response is not partitioned; run database/migrations/004_partition_by_request_time_oracle.sql")
+            return summary
+        for name, lower, upper in expired_partitions(partitions, cutoff):
+            entry: Dict[str, Any] = {"partition": name, "from": lower.isoformat() if lower else None, "to": upper.isoformat()}
+            summary["partitions"].append(entry)
+            if dry_run:
+                continue
+            if archive:
+                result = archive_service.archive_range(conn, lower, upper)
+                entry["archive"] = result["path"]
+                entry["rows"] = result["rows"]
+                summary["archived_rows"] += result["rows"]
+            entry["action"] = _drop_partition(conn, name)
+            logger.info("Retention: partition %s (< %s) %s", name, upper, entry["action"])
+
+        if prune and not dry_run and "payload_hash" in get_insert_statement(conn).present:
+            summary["payloads_pruned"] = prune_payloads(conn, cutoff)
+
+    summary["elapsed_s"] = round(time.perf_counter() - started, 2)
+    logger.info("Retention done: %s", summary)
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Archive and drop weather_api_response partitions past the retention period")
+    parser.add_argument("--days", type=int, default=None, help="retention in days (default RETENTION_DAYS)")
+    parser.add_argument("--no-archive", action="store_true", help="drop without writing Parquet archives")
+    parser.add_argument("--dry-run", action="store_true", help="only list the partitions that would be removed")
+    parser.add_argument("--prune-payloads", action="store_true", help="also delete unreferenced weather_payload rows")
+    args = parser.parse_args()
+    configure_logging()
+    run_retention(args.days, False if args.no_archive else None, args.dry_run, args.prune_payloads)
+
+
+if __name__ == "__main__":
+    main()
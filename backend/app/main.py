@@ -1,13 +1,46 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from app.routers.weather_router import router as weather_router
 from app.routers import db_router
-from app.utils.logger import configure_logging, logger
-from app.db import get_pool_info, get_connection
+from app.services import weather_service
+from app.services.db_writer import start_write_queue, stop_write_queue, get_write_queue_stats
+from app.services.db_service import get_insert_statement
+from app.services.health_service import health_monitor
+from app.services.prewarm_service import prewarm_scheduler
+from app.config import settings
+from app.utils.cache import get_cache
+from app.utils.logger import RequestIdMiddleware, configure_logging, get_logging_stats, logger
+from app.utils import metrics
+from app.db import close_pool, get_pool_stats
 
 configure_logging()  # ensure logging configured early
 
-app = FastAPI(title="Weather Backend API", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # introspect weather_api_response once up front (best-effort; retried on first insert)
+    try:
+        await run_in_threadpool(get_insert_statement)
+    except Exception as exc:
+        logger.warning("Could not detect weather_api_response schema at startup: %s", exc)
+    start_write_queue()
+    health_monitor.start()
+    if settings.PREWARM_ENABLED:
+        prewarm_scheduler.start()
+    yield
+    await prewarm_scheduler.stop()
+    await health_monitor.stop()
+    # release pooled upstream connections
+    await weather_service.session.aclose()
+    # flush pending DB writes before the process exits
+    await run_in_threadpool(stop_write_queue)
+    await run_in_threadpool(close_pool)
+
+
+app = FastAPI(title="Weather Backend API", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,6 +49,9 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
+# outermost: the request ID is set before any other middleware logs
+app.add_middleware(RequestIdMiddleware)
 
 app.include_router(weather_router)
 # include db router under /db so /db/test-connection works
@@ -24,35 +60,73 @@ app.include_router(db_router.router, prefix="/db")
 
 @app.get("/health")
 async def health():
-    """Health check with optional DB connectivity and pool information.
+    """Health snapshot: application status, last DB/upstream probe and pool diagnostics.
 
-    Returns basic application status and, if configured, database pool diagnostics.
+    The probes run in the background (see `app/services/health_service.py`);
+    this route only reads the latest snapshot and in-memory counters.
     """
-    status = {"status": "ok"}
+    status = health_monitor.snapshot()
+    status["coalescing"] = weather_service.get_coalescing_stats()
+    status["cache"] = get_cache().stats()
+    status["db_write_queue"] = get_write_queue_stats()
+    status["prewarm"] = prewarm_scheduler.stats()
+    status["upstream"] = weather_service.get_upstream_stats()
+    status["logging"] = get_logging_stats()
+    return status
 
-    # include pool info (may indicate pool not initialized)
-    try:
-        pool_info = get_pool_info()
-        status["db_pool"] = pool_info
-    except Exception as exc:
-        logger.exception("Failed to retrieve pool info: %s", exc)
-        status["db_pool_error"] = str(exc)
 
-    # quick DB connectivity check (best-effort)
-    try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT 1 FROM DUAL")
-        _ = cur.fetchone()
-        cur.close()
-        try:
-            conn.close()
-        except Exception:
-            pass
-        status["db_connected"] = True
-    except Exception as exc:
-        logger.exception("DB connectivity check failed in health: %s", exc)
-        status["db_connected"] = False
-        status["db_error"] = str(exc)
+@app.get("/health/live")
+async def health_live():
+    """Liveness: the process is running and the event loop responds."""
+    return {"status": "alive"}
 
-    return status
+
+@app.get("/health/ready")
+async def health_ready():
+    """Readiness: the last background DB probe succeeded and is recent."""
+    snapshot = health_monitor.snapshot()
+    body = {"ready": health_monitor.ready(), "db_connected": snapshot.get("db_connected"), "age_s": snapshot.get("age_s")}
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+def _cache_samples() -> dict:
+    stats = get_cache().stats()
+    samples = {}
+    if stats["l1"] is not None:
+        samples[("l1", "hit")] = stats["l1"]["hits"]
+        samples[("l1", "miss")] = stats["l1"]["misses"]
+    if stats["l2"]["enabled"]:
+        samples[("l2", "hit")] = stats["l2"]["hits"]
+        samples[("l2", "miss")] = stats["l2"]["misses"]
+        samples[("l2", "error")] = stats["l2"]["errors"]
+    return samples
+
+
+def _pool_samples() -> dict:
+    samples = {}
+    for name, pool in get_pool_stats().items():
+        for state, key in (("busy", "busy"), ("open", "opened"), ("max", "max"), ("waiting", "waiting")):
+            samples[(name, state)] = pool.get(key)
+    return samples
+
+
+def _write_queue_samples() -> dict:
+    stats = get_write_queue_stats()
+    return {(key,): stats.get(key) for key in ("depth", "flushed", "failed", "dropped", "spilled", "corrupt")} if stats.get("running") else {}
+
+
+metrics.REGISTRY.callback("weather_cache_requests_total", "Cache lookups by tier and result.", _cache_samples, ("tier", "result"), kind="counter")
+metrics.REGISTRY.callback("weather_cache_l1_entries", "Entries held in the in-process cache.", lambda: {(): (get_cache().stats()["l1"] or {}).get("entries")})
+metrics.REGISTRY.callback("weather_db_pool_connections", "Oracle pool connections by state (waiting = callers blocked in acquire).", _pool_samples, ("pool", "state"))
+metrics.REGISTRY.callback("weather_db_write_queue", "Write-behind queue depth and record counters.", _write_queue_samples, ("field",))
+metrics.REGISTRY.callback("weather_prewarm", "Cache pre-warming counters.", lambda: {(k,): v for k, v in prewarm_scheduler.stats().items() if not isinstance(v, bool)}, ("field",))
+metrics.REGISTRY.callback("weather_coalescing", "Request coalescing counters.", lambda: {(k,): v for k, v in weather_service.get_coalescing_stats().items()}, ("field",))
+metrics.REGISTRY.callback("weather_upstream_circuit_state", "Upstream circuit breaker state per API (0 closed, 1 half-open, 2 open).", weather_service.get_circuit_states, ("api",))
+metrics.REGISTRY.callback("weather_upstream_concurrency", "Adaptive upstream concurrency limit, calls in flight and rejections.", lambda: {(k,): v for k, v in weather_service.limiter.stats().items()}, ("field",))
+metrics.REGISTRY.callback("weather_upstream_api_keys", "Calls, quota used/remaining and 429s per upstream API key (by key hash).", weather_service.get_key_samples, ("key", "field"))
+metrics.REGISTRY.callback("weather_log_records", "Log pipeline: records queued, dropped on a full queue, sampled out or rate limited.", lambda: {(k,): v for k, v in get_logging_stats().items() if not isinstance(v, bool)}, ("field",))
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Prometheus text exposition of the application metrics."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,7 +1,27 @@
 from pydantic import BaseModel
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 class WeatherResponse(BaseModel):
     location: Optional[Dict[str, Any]] = None
     current: Optional[Dict[str, Any]] = None
     raw: Optional[Dict[str, Any]] = None
+
+
+class BatchItem(BaseModel):
+    api: str
+    q: Optional[str] = None
+    params: Optional[Dict[str, Any]] = None
+
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem]
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    api: str
+    q: Optional[str] = None
+    status: str
+    data: Optional[Any] = None
+    error: Optional[str] = None
+    status_code: Optional[int] = None
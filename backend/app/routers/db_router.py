@@ -1,5 +1,14 @@
-from fastapi import APIRouter, HTTPException
-from app.db import get_connection
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from app.db import ping
+from app.services.aggregate_service import aggregate
+from app.services.export_service import EXPORT_FORMATS, ResponseExport
+from app.services.query_service import MAX_PAGE_SIZE, InvalidQuery, query_responses
+from app.utils.raw_json import RawJSONResponse
 from app.utils.logger import logger
 
 router = APIRouter()
@@ -8,21 +17,80 @@ router = APIRouter()
 @router.get("/test-connection")
 async def test_db():
     """Return a simple DB connectivity check result."""
-    conn = None
     try:
-        conn = get_connection()
-        # simple quick check
-        cur = conn.cursor()
-        cur.execute("SELECT 1 FROM DUAL")
-        _ = cur.fetchone()
-        cur.close()
+        # simple quick check; the connection is always returned to the pool
+        await run_in_threadpool(ping)
         return {"ok": True}
     except Exception as exc:
         logger.exception("DB connectivity check failed: %s", exc)
         raise HTTPException(status_code=500, detail="Database connectivity error")
-    finally:
-        if conn:
-            try:
-                conn.close()
-            except Exception:
-                pass
+
+
+@router.get("/responses")
+async def list_responses(
+    location: Optional[str] = None,
+    api_type: Optional[str] = None,
+    start: Optional[datetime] = Query(None, description="Inclusive lower bound on request_time"),
+    end: Optional[datetime] = Query(None, description="Exclusive upper bound on request_time"),
+    cursor: Optional[str] = Query(None, description="`next_cursor` from the previous page"),
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    include_json: bool = Query(False, description="Also return json_data/params_json (CLOBs)"),
+):
+    """Page through stored API responses, newest first (keyset pagination)."""
+    try:
+        page = await run_in_threadpool(query_responses, location, api_type, start, end, cursor, limit, include_json)
+        return RawJSONResponse(page)
+    except InvalidQuery as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except Exception as exc:
+        logger.exception("Failed to query stored responses: %s", exc)
+        raise HTTPException(status_code=500, detail="Database query error")
+
+
+@router.get("/export")
+async def export_responses(
+    format: str = Query("ndjson", description="ndjson or csv"),
+    location: Optional[str] = None,
+    api_type: Optional[str] = None,
+    start: Optional[datetime] = Query(None, description="Inclusive lower bound on request_time"),
+    end: Optional[datetime] = Query(None, description="Exclusive upper bound on request_time"),
+    include_json: bool = Query(True, description="Include json_data/params_json"),
+    gzip: bool = Query(False, description="Gzip the output on the fly"),
+):
+    """Stream matching stored responses as NDJSON or CSV (oldest first)."""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {sorted(EXPORT_FORMATS)}")
+    export = ResponseExport(format, location, api_type, start, end, include_json=include_json, compress=gzip)
+    try:
+        # run the query before streaming so DB errors still get an error status
+        await run_in_threadpool(export.open)
+    except Exception as exc:
+        logger.exception("Failed to start export: %s", exc)
+        raise HTTPException(status_code=500, detail="Database query error")
+    return StreamingResponse(
+        export,
+        media_type=export.media_type,
+        headers={"Content-Disposition": f'attachment; filename="{export.filename}"'},
+        # releases the connection even if the client disconnects before the stream starts
+        background=BackgroundTask(export.close),
+    )
+
+
+@router.get("/aggregates")
+async def aggregate_observations(
+    metric: str = Query("temp_c", description="Observation column, e.g. temp_c, humidity, wind_kph, pressure_mb"),
+    bucket: str = Query("hour", description="hour or day (UTC)"),
+    location: Optional[str] = None,
+    kind: str = Query("current", description="current or forecast observations"),
+    start: Optional[datetime] = Query(None, description="Inclusive lower bound on observed_at (UTC)"),
+    end: Optional[datetime] = Query(None, description="Exclusive upper bound on observed_at (UTC)"),
+    engine: Optional[str] = Query(None, description="sql (GROUP BY in the database) or numpy; default AGGREGATE_ENGINE"),
+):
+    """Min/max/mean/count of `metric` per location and time bucket (from weather_observation)."""
+    try:
+        return await run_in_threadpool(aggregate, metric, bucket, location, kind, start, end, engine)
+    except InvalidQuery as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except Exception as exc:
+        logger.exception("Failed to aggregate observations: %s", exc)
+        raise HTTPException(status_code=500, detail="Database query error")
@@ -1,14 +1,25 @@
+import math
 from fastapi import APIRouter, HTTPException, Query
 from typing import Optional
-from app.services.weather_service import fetch_api_by_name, WeatherAPIError
-from app.services.db_service import save_api_response
+from app.config import settings
+from app.models.weather_model import BatchRequest, BatchItemResult
+from app.services.weather_service import fetch_api_by_name_raw, fetch_many, UpstreamUnavailable, WeatherAPIError
+from app.services.db_service import build_record, persist_api_response, persist_api_responses
 from app.utils.logger import logger
+from app.utils.raw_json import RawJSONResponse
 
 router = APIRouter(prefix="/weather", tags=["weather"])
 
 
+def _upstream_http_error(exc: WeatherAPIError) -> HTTPException:
+    """502 for a failed upstream call; 503 with Retry-After when it was not attempted (circuit open, limit reached)."""
+    if isinstance(exc, UpstreamUnavailable):
+        return HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))})
+    return HTTPException(status_code=502, detail=str(exc))
+
+
 @router.get("/current")
-def current(location: Optional[str] = Query(None, alias="location")):
+async def current(location: Optional[str] = Query(None, alias="location")):
     """Convenience endpoint for current weather.
 
     Example: `/weather/current?location=Delhi`
@@ -17,45 +28,45 @@ def current(location: Optional[str] = Query(None, alias="location")):
         raise HTTPException(status_code=400, detail="missing 'location' query parameter")
 
     try:
-        data, meta = fetch_api_by_name("current", location)
+        data, meta = await fetch_api_by_name_raw("current", location)
         # try to persist but don't fail the API if DB has problems
         try:
-            save_api_response(location, "current", data, params={"q": location}, response_time_ms=meta.get("duration_ms"), status_code=meta.get("status_code"), request_url=meta.get("request_url"))
+            await persist_api_response(location, "current", data, params={"q": location}, response_time_ms=meta.get("duration_ms"), status_code=meta.get("status_code"), request_url=meta.get("request_url"))
         except Exception as db_exc:
             logger.error("DB save failed for /weather/current: %s", db_exc)
 
-        return {"status": "success", "api": "current", "data": data}
+        return RawJSONResponse({"status": "success", "api": "current", "data": data})
     except WeatherAPIError as e:
         logger.error("WeatherAPIError: %s", e)
-        raise HTTPException(status_code=502, detail=str(e))
+        raise _upstream_http_error(e)
     except Exception as exc:
         logger.exception("Unexpected error in /weather/current: %s", exc)
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 @router.get("/forecast")
-def forecast(q: Optional[str] = Query(None), days: int = Query(1, ge=1, le=10)):
+async def forecast(q: Optional[str] = Query(None), days: int = Query(1, ge=1, le=10)):
     """Convenience endpoint for forecast: `/weather/forecast?q=Delhi&days=3`"""
     if not q:
         raise HTTPException(status_code=400, detail="missing 'q' query parameter")
 
     try:
-        data, meta = fetch_api_by_name("forecast", q, {"days": days})
+        data, meta = await fetch_api_by_name_raw("forecast", q, {"days": days})
         try:
-            save_api_response(q, "forecast", data, params={"q": q, "days": days}, response_time_ms=meta.get("duration_ms"), status_code=meta.get("status_code"), request_url=meta.get("request_url"))
+            await persist_api_response(q, "forecast", data, params={"q": q, "days": days}, response_time_ms=meta.get("duration_ms"), status_code=meta.get("status_code"), request_url=meta.get("request_url"))
         except Exception as db_exc:
             logger.error("DB save failed for /weather/forecast: %s", db_exc)
 
-        return {"status": "success", "api": "forecast", "data": data}
+        return RawJSONResponse({"status": "success", "api": "forecast", "data": data})
     except WeatherAPIError as e:
         logger.error("WeatherAPIError: %s", e)
-        raise HTTPException(status_code=502, detail=str(e))
+        raise _upstream_http_error(e)
     except Exception as exc:
         logger.exception("Unexpected error in /weather/forecast: %s", exc)
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
 @router.get("/history")
-def history(q: Optional[str] = Query(None), dt: Optional[str] = Query(None)):
+async def history(q: Optional[str] = Query(None), dt: Optional[str] = Query(None)):
     """History endpoint: `/weather/history?q=Delhi&dt=YYYY-MM-DD`"""
     if not q:
         raise HTTPException(status_code=400, detail="missing 'q' query parameter")
@@ -70,23 +81,23 @@ def history(q: Optional[str] = Query(None), dt: Optional[str] = Query(None)):
         raise HTTPException(status_code=400, detail="dt must be in YYYY-MM-DD format")
 
     try:
-        data, meta = fetch_api_by_name("history", q, {"dt": dt})
+        data, meta = await fetch_api_by_name_raw("history", q, {"dt": dt})
         try:
-            save_api_response(q, "history", data, params={"q": q, "dt": dt}, response_time_ms=meta.get("duration_ms"), status_code=meta.get("status_code"), request_url=meta.get("request_url"))
+            await persist_api_response(q, "history", data, params={"q": q, "dt": dt}, response_time_ms=meta.get("duration_ms"), status_code=meta.get("status_code"), request_url=meta.get("request_url"))
         except Exception as db_exc:
             logger.error("DB save failed for /weather/history: %s", db_exc)
 
-        return {"status": "success", "api": "history", "data": data}
+        return RawJSONResponse({"status": "success", "api": "history", "data": data})
     except WeatherAPIError as e:
         logger.error("WeatherAPIError: %s", e)
-        raise HTTPException(status_code=502, detail=str(e))
+        raise _upstream_http_error(e)
     except Exception as exc:
         logger.exception("Unexpected error in /weather/history: %s", exc)
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
 @router.get("/marine")
-def marine(q: Optional[str] = Query(None), lat: Optional[float] = Query(None), lon: Optional[float] = Query(None)):
+async def marine(q: Optional[str] = Query(None), lat: Optional[float] = Query(None), lon: Optional[float] = Query(None)):
     """Marine endpoint: `/weather/marine?q=BayArea` or `/weather/marine?lat=12.3&lon=45.6`"""
     if not q and (lat is None or lon is None):
         raise HTTPException(status_code=400, detail="provide 'q' or both 'lat' and 'lon'")
@@ -98,88 +109,88 @@ def marine(q: Optional[str] = Query(None), lat: Optional[float] = Query(None), l
         params["q"] = f"{lat},{lon}"
 
     try:
-        data, meta = fetch_api_by_name("marine", None, params)
+        data, meta = await fetch_api_by_name_raw("marine", None, params)
         try:
-            save_api_response(params.get("q"), "marine", data, params=params, response_time_ms=meta.get("duration_ms"), status_code=meta.get("status_code"), request_url=meta.get("request_url"))
+            await persist_api_response(params.get("q"), "marine", data, params=params, response_time_ms=meta.get("duration_ms"), status_code=meta.get("status_code"), request_url=meta.get("request_url"))
         except Exception as db_exc:
             logger.error("DB save failed for /weather/marine: %s", db_exc)
 
-        return {"status": "success", "api": "marine", "data": data}
+        return RawJSONResponse({"status": "success", "api": "marine", "data": data})
     except WeatherAPIError as e:
         logger.error("WeatherAPIError: %s", e)
-        raise HTTPException(status_code=502, detail=str(e))
+        raise _upstream_http_error(e)
     except Exception as exc:
         logger.exception("Unexpected error in /weather/marine: %s", exc)
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
 @router.get("/search")
-def search(q: Optional[str] = Query(None)):
+async def search(q: Optional[str] = Query(None)):
     """Search/autocomplete endpoint: `/weather/search?q=London`"""
     if not q:
         raise HTTPException(status_code=400, detail="missing 'q' query parameter")
 
     try:
-        data, meta = fetch_api_by_name("search", q)
+        data, meta = await fetch_api_by_name_raw("search", q)
         try:
-            save_api_response(q, "search", data, params={"q": q}, response_time_ms=meta.get("duration_ms"), status_code=meta.get("status_code"), request_url=meta.get("request_url"))
+            await persist_api_response(q, "search", data, params={"q": q}, response_time_ms=meta.get("duration_ms"), status_code=meta.get("status_code"), request_url=meta.get("request_url"))
         except Exception as db_exc:
             logger.error("DB save failed for /weather/search: %s", db_exc)
 
-        return {"status": "success", "api": "search", "data": data}
+        return RawJSONResponse({"status": "success", "api": "search", "data": data})
     except WeatherAPIError as e:
         logger.error("WeatherAPIError: %s", e)
-        raise HTTPException(status_code=502, detail=str(e))
+        raise _upstream_http_error(e)
     except Exception as exc:
         logger.exception("Unexpected error in /weather/search: %s", exc)
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
 @router.get("/ip")
-def ip_lookup(ip: Optional[str] = Query(None)):
+async def ip_lookup(ip: Optional[str] = Query(None)):
     """IP lookup endpoint: `/weather/ip?ip=8.8.8.8` or `/weather/ip?q=8.8.8.8`"""
     if not ip:
         raise HTTPException(status_code=400, detail="missing 'ip' query parameter")
     try:
-        data, meta = fetch_api_by_name("ip", ip)
+        data, meta = await fetch_api_by_name_raw("ip", ip)
         try:
-            save_api_response(ip, "ip", data, params={"q": ip}, response_time_ms=meta.get("duration_ms"), status_code=meta.get("status_code"), request_url=meta.get("request_url"))
+            await persist_api_response(ip, "ip", data, params={"q": ip}, response_time_ms=meta.get("duration_ms"), status_code=meta.get("status_code"), request_url=meta.get("request_url"))
         except Exception as db_exc:
             logger.error("DB save failed for /weather/ip: %s", db_exc)
 
-        return {"status": "success", "api": "ip", "data": data}
+        return RawJSONResponse({"status": "success", "api": "ip", "data": data})
     except WeatherAPIError as e:
         logger.error("WeatherAPIError: %s", e)
-        raise HTTPException(status_code=502, detail=str(e))
+        raise _upstream_http_error(e)
     except Exception as exc:
         logger.exception("Unexpected error in /weather/ip: %s", exc)
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
 @router.get("/timezone")
-def timezone(q: Optional[str] = Query(None), lat: Optional[float] = Query(None), lon: Optional[float] = Query(None)):
+async def timezone(q: Optional[str] = Query(None), lat: Optional[float] = Query(None), lon: Optional[float] = Query(None)):
     """Timezone endpoint: `/weather/timezone?q=New+York` or `/weather/timezone?lat=12.3&lon=45.6`"""
     if not q and (lat is None or lon is None):
         raise HTTPException(status_code=400, detail="provide 'q' or both 'lat' and 'lon'")
     params = {"q": q} if q else {"q": f"{lat},{lon}"}
     try:
-        data, meta = fetch_api_by_name("timezone", None, params)
+        data, meta = await fetch_api_by_name_raw("timezone", None, params)
         try:
-            save_api_response(params.get("q"), "timezone", data, params=params, response_time_ms=meta.get("duration_ms"), status_code=meta.get("status_code"), request_url=meta.get("request_url"))
+            await persist_api_response(params.get("q"), "timezone", data, params=params, response_time_ms=meta.get("duration_ms"), status_code=meta.get("status_code"), request_url=meta.get("request_url"))
         except Exception as db_exc:
             logger.error("DB save failed for /weather/timezone: %s", db_exc)
 
-        return {"status": "success", "api": "timezone", "data": data}
+        return RawJSONResponse({"status": "success", "api": "timezone", "data": data})
     except WeatherAPIError as e:
         logger.error("WeatherAPIError: %s", e)
-        raise HTTPException(status_code=502, detail=str(e))
+        raise _upstream_http_error(e)
     except Exception as exc:
         logger.exception("Unexpected error in /weather/timezone: %s", exc)
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
 @router.get("/astronomy")
-def astronomy(q: Optional[str] = Query(None), dt: Optional[str] = Query(None)):
+async def astronomy(q: Optional[str] = Query(None), dt: Optional[str] = Query(None)):
     """Astronomy endpoint: `/weather/astronomy?q=Delhi&dt=2025-11-30`"""
     if not q:
         raise HTTPException(status_code=400, detail="missing 'q' query parameter")
@@ -187,23 +198,23 @@ def astronomy(q: Optional[str] = Query(None), dt: Optional[str] = Query(None)):
     if dt:
         params["dt"] = dt
     try:
-        data, meta = fetch_api_by_name("astronomy", None, params)
+        data, meta = await fetch_api_by_name_raw("astronomy", None, params)
         try:
-            save_api_response(q, "astronomy", data, params=params, response_time_ms=meta.get("duration_ms"), status_code=meta.get("status_code"), request_url=meta.get("request_url"))
+            await persist_api_response(q, "astronomy", data, params=params, response_time_ms=meta.get("duration_ms"), status_code=meta.get("status_code"), request_url=meta.get("request_url"))
         except Exception as db_exc:
             logger.error("DB save failed for /weather/astronomy: %s", db_exc)
 
-        return {"status": "success", "api": "astronomy", "data": data}
+        return RawJSONResponse({"status": "success", "api": "astronomy", "data": data})
     except WeatherAPIError as e:
         logger.error("WeatherAPIError: %s", e)
-        raise HTTPException(status_code=502, detail=str(e))
+        raise _upstream_http_error(e)
     except Exception as exc:
         logger.exception("Unexpected error in /weather/astronomy: %s", exc)
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
 @router.get("/future")
-def future(q: Optional[str] = Query(None), days: Optional[int] = Query(None)):
+async def future(q: Optional[str] = Query(None), days: Optional[int] = Query(None)):
     """Future endpoint: `/weather/future?q=Delhi&days=7`"""
     if not q:
         raise HTTPException(status_code=400, detail="missing 'q' query parameter")
@@ -211,22 +222,22 @@ def future(q: Optional[str] = Query(None), days: Optional[int] = Query(None)):
     if days is not None:
         params["days"] = days
     try:
-        data, meta = fetch_api_by_name("future", q, params if params else None)
+        data, meta = await fetch_api_by_name_raw("future", q, params if params else None)
         try:
-            save_api_response(q, "future", data, params=params or None, response_time_ms=meta.get("duration_ms"), status_code=meta.get("status_code"), request_url=meta.get("request_url"))
+            await persist_api_response(q, "future", data, params=params or None, response_time_ms=meta.get("duration_ms"), status_code=meta.get("status_code"), request_url=meta.get("request_url"))
         except Exception as db_exc:
             logger.error("DB save failed for /weather/future: %s", db_exc)
 
-        return {"status": "success", "api": "future", "data": data}
+        return RawJSONResponse({"status": "success", "api": "future", "data": data})
     except WeatherAPIError as e:
         logger.error("WeatherAPIError: %s", e)
-        raise HTTPException(status_code=502, detail=str(e))
+        raise _upstream_http_error(e)
     except Exception as exc:
         logger.exception("Unexpected error in /weather/future: %s", exc)
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 @router.get("/api/{api_name}")
-def generic_api(api_name: str, q: Optional[str] = Query(None), days: Optional[int] = Query(None), dt: Optional[str] = Query(None), ip: Optional[str] = Query(None), lat: Optional[float] = Query(None), lon: Optional[float] = Query(None)):
+async def generic_api(api_name: str, q: Optional[str] = Query(None), days: Optional[int] = Query(None), dt: Optional[str] = Query(None), ip: Optional[str] = Query(None), lat: Optional[float] = Query(None), lon: Optional[float] = Query(None)):
     """
     Generic endpoint for weather APIs.
     Examples:
@@ -246,26 +257,28 @@ def generic_api(api_name: str, q: Optional[str] = Query(None), days: Optional[in
         extra["q"] = f"{lat},{lon}"
 
     try:
-        data, meta = fetch_api_by_name(api_name, q, extra if extra else None)
+        data, meta = await fetch_api_by_name_raw(api_name, q, extra if extra else None)
         # persist (best-effort) — don't let DB errors hide API success
         db_saved = True
         db_error = None
         try:
-            save_api_response(q, api_name, data, params=(extra if extra else {"q": q}), response_time_ms=meta.get("duration_ms"), status_code=meta.get("status_code"), request_url=meta.get("request_url"))
+            db_saved = await persist_api_response(q, api_name, data, params=(extra if extra else {"q": q}), response_time_ms=meta.get("duration_ms"), status_code=meta.get("status_code"), request_url=meta.get("request_url"))
         except Exception as db_exc:
             db_saved = False
             db_error = str(db_exc)
             logger.error("DB save failed after successful API call: %s", db_exc)
+        if not db_saved and db_error is None:
+            db_error = "write queue full; record dropped"
 
         resp = {"status": "success", "api": api_name, "data": data}
         if not db_saved:
             resp["db_saved"] = False
             resp["db_error"] = db_error
 
-        return resp
+        return RawJSONResponse(resp)
     except WeatherAPIError as e:
         logger.error("WeatherAPIError: %s", e)
-        raise HTTPException(status_code=502, detail=str(e))
+        raise _upstream_http_error(e)
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
     except HTTPException:
@@ -274,3 +287,52 @@ def generic_api(api_name: str, q: Optional[str] = Query(None), days: Optional[in
     except Exception as exc:
         logger.exception("Unexpected error in generic_api: %s", exc)
         raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@router.post("/batch")
+async def batch(request: BatchRequest):
+    """
+    Resolve many lookups in one call.
+    Body: `{"items": [{"api": "current", "q": "Delhi"}, {"api": "forecast", "q": "Paris", "params": {"days": 3}}]}`
+
+    Each item gets its own result (`status` success/error); one failing item does not fail the batch.
+    """
+    if not request.items:
+        raise HTTPException(status_code=400, detail="'items' must not be empty")
+    if len(request.items) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"at most {settings.BATCH_MAX_ITEMS} items per batch")
+
+    try:
+        outcomes = await fetch_many([(item.api, item.q, item.params) for item in request.items])
+    except Exception as exc:
+        logger.exception("Unexpected error in /weather/batch: %s", exc)
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+    results = []
+    records = []
+    for idx, (item, outcome) in enumerate(zip(request.items, outcomes)):
+        if isinstance(outcome, Exception):
+            if isinstance(outcome, ValueError):
+                status_code = 400
+            elif isinstance(outcome, UpstreamUnavailable):
+                status_code = 503
+            elif isinstance(outcome, WeatherAPIError):
+                status_code = 502
+            else:
+                logger.error("Unexpected error for batch item %s: %s", idx, outcome)
+                status_code = 500
+            results.append(BatchItemResult(index=idx, api=item.api, q=item.q, status="error", error=str(outcome), status_code=status_code))
+            continue
+
+        data, meta = outcome
+        results.append(BatchItemResult(index=idx, api=item.api, q=item.q, status="success", data=data))
+        params = {"q": item.q, **(item.params or {})} if item.q else item.params
+        records.append(build_record(item.q, item.api, data, params=params, response_time_ms=meta.get("duration_ms"), status_code=meta.get("status_code"), request_url=meta.get("request_url")))
+
+    # persist all successful lookups as one batch (best-effort)
+    try:
+        await persist_api_responses(records)
+    except Exception as db_exc:
+        logger.error("DB save failed for /weather/batch: %s", db_exc)
+
+    return RawJSONResponse({"status": "success", "api": "batch", "results": [r.model_dump() for r in results]})
@@ -0,0 +1,172 @@
+"""Time-bucket x location rollups (min/max/mean/count) over `weather_observation`.
+
+Two engines produce the same result:
+
+* ``sql`` pushes the grouping down to the database (``GROUP BY location,
+  TRUNC(observed_at, ...)``), so only one row per group crosses the network.
+* ``numpy`` streams ``(location, observed_at, value)`` in
+  `AGGREGATE_CHUNK_ROWS` chunks into arrays and folds each chunk into the
+  running per-group min/max/sum/count with vectorized ufuncs; for backends
+  without the needed SQL support, or to check the pushdown. Needs `numpy` (in
+  requirements.txt); without it only this engine is unavailable.
+
+Results are kept for `AGGREGATE_CACHE_TTL` seconds in a small in-process LRU
+keyed by the normalized query. The observations come from the ETL job
+(`python -m app.jobs.observation_etl`), which runs on its own schedule, so a
+short TTL does not hide fresher data for long.
+"""
+
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.db import connection
+from app.jobs.observation_etl import MEASURES
+from app.services.query_service import InvalidQuery
+from app.utils.cache import LocalCache
+from app.utils.locations import normalize_location
+from app.utils.logger import logger
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# bucket -> (Oracle TRUNC format, width in seconds)
+BUCKETS = {"hour": ("HH24", 3600), "day": ("DD", 86400)}
+ENGINES = ("sql", "numpy")
+KINDS = ("current", "forecast")
+
+_results = LocalCache(max_entries=settings.AGGREGATE_CACHE_MAX_ENTRIES)
+
+
+def _filters(location: Optional[str], kind: str, start: Optional[datetime], end: Optional[datetime]) -> Tuple[List[str], Dict[str, Any]]:
+    where = ["kind = :kind"]
+    binds: Dict[str, Any] = {"kind": kind}
+    if location is not None:
+        # locations are stored normalized (see db_service.build_record)
+        where.append("location = :loc")
+        binds["loc"] = normalize_location(location)
+    if start is not None:
+        where.append("observed_at >= :start_ts")
+        binds["start_ts"] = start
+    if end is not None:
+        where.append("observed_at < :end_ts")
+        binds["end_ts"] = end
+    return where, binds
+
+
+def _aggregate_sql(conn, metric: str, bucket: str, where: List[str], binds: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # metric and bucket format come from whitelists, never from the request text
+    trunc = f"TRUNC(observed_at, '{BUCKETS[bucket][0]}')"
+    sql = (
+        f"SELECT location, {trunc} AS bucket, MIN({metric}), MAX({metric}), AVG({metric}), COUNT({metric}) "
+        f"FROM weather_observation WHERE {' AND '.join(where)} AND {metric} IS NOT NULL "
+        f"GROUP BY location, {trunc} ORDER BY location, bucket"
+    )
+    cursor = conn.cursor()
+    try:
+        cursor.arraysize = settings.AGGREGATE_CHUNK_ROWS
+        cursor.execute(sql, binds)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    return [_item(loc, ts, lo, hi, mean, n) for loc, ts, lo, hi, mean, n in rows]
+
+
+def _aggregate_numpy(conn, metric: str, bucket: str, where: List[str], binds: Dict[str, Any]) -> List[Dict[str, Any]]:
+    width = BUCKETS[bucket][1]
+    sql = f"SELECT location, observed_at, {metric} FROM weather_observation WHERE {' AND '.join(where)} AND {metric} IS NOT NULL"
+    locations: Dict[str, int] = {}
+    # group key -> [min, max, sum, count]
+    groups: Dict[int, List[float]] = {}
+    cursor = conn.cursor()
+    try:
+        cursor.arraysize = settings.AGGREGATE_CHUNK_ROWS
+        cursor.execute(sql, binds)
+        while True:
+            chunk = cursor.fetchmany()
+            if not chunk:
+                break
+            locs, times, values = zip(*chunk)
+            loc_codes = np.fromiter((locations.setdefault(loc, len(locations)) for loc in locs), dtype=np.int64, count=len(chunk))
+            seconds = np.array(times, dtype="datetime64[s]").astype(np.int64)
+            keys = (loc_codes << 32) | (seconds // width)
+            vals = np.asarray(values, dtype=np.float64)
+
+            unique, inverse = np.unique(keys, return_inverse=True)
+            mins = np.full(len(unique), np.inf)
+            maxs = np.full(len(unique), -np.inf)
+            np.minimum.at(mins, inverse, vals)
+            np.maximum.at(maxs, inverse, vals)
+            sums = np.bincount(inverse, weights=vals, minlength=len(unique))
+            counts = np.bincount(inverse, minlength=len(unique))
+            for key, lo, hi, total, n in zip(unique.tolist(), mins.tolist(), maxs.tolist(), sums.tolist(), counts.tolist()):
+                group = groups.get(key)
+                if group is None:
+                    groups[key] = [lo, hi, total, n]
+                else:
+                    group[0] = min(group[0], lo)
+                    group[1] = max(group[1], hi)
+                    group[2] += total
+                    group[3] += n
+    finally:
+        cursor.close()
+
+    names = {code: loc for loc, code in locations.items()}
+    items = []
+    for key, (lo, hi, total, n) in groups.items():
+        ts = datetime.fromtimestamp((key & 0xFFFFFFFF) * width, timezone.utc).replace(tzinfo=None)
+        items.append(_item(names[key >> 32], ts, lo, hi, total / n, n))
+    items.sort(key=lambda item: (item["location"], item["bucket"]))
+    return items
+
+
+def _item(location: str, bucket: datetime, lo: float, hi: float, mean: float, count: int) -> Dict[str, Any]:
+    return {
+        "location": location,
+        "bucket": bucket.isoformat() if isinstance(bucket, datetime) else bucket,
+        "min": float(lo),
+        "max": float(hi),
+        "mean": round(float(mean), 4),
+        "count": int(count),
+    }
+
+
+def aggregate(
+    metric: str = "temp_c",
+    bucket: str = "hour",
+    location: Optional[str] = None,
+    kind: str = "current",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    engine: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Rollup of `metric` per (location, bucket): {"metric", "bucket", "engine", "cached", "items"}."""
+    engine = engine or settings.AGGREGATE_ENGINE
+    if metric not in MEASURES:
+        raise InvalidQuery(f"metric must be one of {list(MEASURES)}")
+    if bucket not in BUCKETS:
+        raise InvalidQuery(f"bucket must be one of {list(BUCKETS)}")
+    if kind not in KINDS:
+        raise InvalidQuery(f"kind must be one of {list(KINDS)}")
+    if engine not in ENGINES:
+        raise InvalidQuery(f"engine must be one of {list(ENGINES)}")
+    if engine == "numpy" and np is None:
+        raise InvalidQuery("numpy engine is not available (numpy is not installed)")
+
+    where, binds = _filters(location, kind, start, end)
+    cache_key = json.dumps([metric, bucket, binds.get("loc"), kind, start and start.isoformat(), end and end.isoformat(), engine])
+    cached = _results.get(cache_key)
+    if cached is not None:
+        return dict(cached, cached=True)
+
+    with connection() as conn:
+        run = _aggregate_sql if engine == "sql" else _aggregate_numpy
+        items = run(conn, metric, bucket, where, binds)
+    result = {"metric": metric, "bucket": bucket, "engine": engine, "items": items}
+    # rough size: the budget only has to keep a few huge rollups from crowding out the rest
+    _results.set(cache_key, result, settings.AGGREGATE_CACHE_TTL, 128 * (len(items) + 1))
+    logger.debug("Aggregated %s by %s (%s engine): %s groups", metric, bucket, engine, len(items))
+    return dict(result, cached=False)
@@ -0,0 +1,93 @@
+"""Parquet archival of aged `weather_api_response` rows.
+
+`archive_range` copies the rows of a `request_time` range (in practice one
+monthly partition, see `app.jobs.retention`) into a Parquet file under
+`ARCHIVE_DIR`. Rows are fetched `ARCHIVE_CHUNK_ROWS` at a time and each chunk
+is written as its own row group, so memory is bounded by the chunk size rather
+than the partition size. The file is written under a temporary name and only
+renamed into place once complete, so a file that exists is a whole archive.
+
+Needs `pyarrow` (in requirements.txt); it is only imported here, so the API
+starts without it and only archival fails.
+"""
+
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+from app.services.query_service import available_columns, build_filters, lobs_as_strings, source_table
+from app.utils.logger import logger
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+_INT_COLUMNS = ("id", "response_time_ms", "status_code")
+
+
+def _schema(columns: List[str]):
+    types = {"request_time": pa.timestamp("us")}
+    return pa.schema([(c, types.get(c, pa.int64() if c in _INT_COLUMNS else pa.string())) for c in columns])
+
+
+def archive_path(start: Optional[datetime], end: datetime, directory: Optional[str] = None) -> str:
+    """File name for the rows with `start <= request_time < end`."""
+    directory = directory or settings.ARCHIVE_DIR
+    lower = start.strftime("%Y%m%d") if start is not None else "min"
+    return os.path.join(directory, f"weather_api_response_{lower}_{end.strftime('%Y%m%d')}.parquet")
+
+
+def archive_range(conn, start: Optional[datetime], end: datetime, path: Optional[str] = None) -> Dict[str, Any]:
+    """Write rows with `start <= request_time < end` to Parquet; returns {"path", "rows", "bytes"}.
+
+    No file is written when the range is empty (``path`` is then None).
+    """
+    if pq is None:
+        raise RuntimeError("Parquet archival needs pyarrow (pip install pyarrow)")
+    path = path or archive_path(start, end)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    columns = available_columns(conn, include_json=True)
+    where, binds = build_filters(start=start, end=end)
+    sql = f"SELECT {', '.join(columns)} FROM {source_table(conn, True)} WHERE {' AND '.join(where)} ORDER BY request_time, id"
+    schema = _schema(columns)
+
+    tmp_path = path + ".tmp"
+    rows = 0
+    writer = None
+    cursor = conn.cursor()
+    try:
+        cursor.arraysize = settings.ARCHIVE_CHUNK_ROWS
+        cursor.prefetchrows = settings.ARCHIVE_CHUNK_ROWS + 1
+        cursor.outputtypehandler = lobs_as_strings
+        cursor.execute(sql, binds)
+        while True:
+            batch = cursor.fetchmany()
+            if not batch:
+                break
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, schema, compression=settings.ARCHIVE_COMPRESSION)
+            data = {c: [row[i] for row in batch] for i, c in enumerate(columns)}
+            writer.write_table(pa.Table.from_pydict(data, schema=schema))
+            rows += len(batch)
+        if writer is not None:
+            writer.close()
+            writer = None
+            os.replace(tmp_path, path)
+    except Exception:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        cursor.close()
+
+    if not rows:
+        return {"path": None, "rows": 0, "bytes": 0}
+    size = os.path.getsize(path)
+    logger.info("Archived %s weather_api_response rows to %s (%s bytes)", rows, path, size)
+    return {"path": path, "rows": rows, "bytes": size}
@@ -1,82 +1,261 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 import json
-from app.db import get_connection
+import threading
+import time
+import oracledb
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+from app.db import connection
+from app.services import payload_store
+from app.utils.locations import normalize_location
 from app.utils.logger import logger
+from app.utils.metrics import DB_INSERT_LATENCY, DB_INSERT_ROWS
+from app.utils.raw_json import RawPayload
 
 
-def save_api_response(location: Optional[str], api_type: str, payload: Dict[str, Any], params: Optional[Dict[str, Any]] = None, response_time_ms: Optional[int] = None, status_code: Optional[int] = None, request_url: Optional[str] = None) -> None:
+# weather_api_response columns the app can write, mapped to their bind variable names.
+# Older installs may lack the later columns (see database/migrations/).
+_COLUMN_BINDS = {
+    "location": "loc",
+    "api_type": "api",
+    "json_data": "jsondata",
+    "params_json": "params",
+    "response_time_ms": "resp_ms",
+    "status_code": "status",
+    "request_url": "url",
+    "payload_hash": "phash",
+}
+_REQUIRED_COLUMNS = ("location", "api_type", "json_data")
+# bind JSON text as LONG so payloads above 4000 bytes go into the CLOB columns
+_LONG_BINDS = ("jsondata", "params")
+
+
+class InsertStatement:
+    """INSERT for the columns present in the target table, built once and reused.
+
+    With `dedup` the payload goes to `weather_payload` and only its hash is
+    written to the row (`json_data` stays NULL).
     """
-    Save the raw JSON payload into weather_api_response table.
-    The payload is serialized with `json.dumps` to ensure valid JSON storage.
 
-    New columns `params_json` and `response_time_ms` are populated when provided.
+    def __init__(self, columns: List[str], dedup: bool = False):
+        # every writable column the table has (readers use this too)
+        self.present = columns
+        self.dedup = dedup
+        if dedup:
+            columns = [c for c in columns if c != "json_data"]
+        self.columns = columns
+        self.binds = [_COLUMN_BINDS[c] for c in columns]
+        self.sql = (
+            f"INSERT INTO weather_api_response ({', '.join(columns)}) "
+            f"VALUES ({', '.join(':' + b for b in self.binds)})"
+        )
+
+    def params(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        return {b: record.get(b) for b in self.binds}
+
+    def input_sizes(self) -> Dict[str, Any]:
+        return {b: oracledb.DB_TYPE_LONG for b in self.binds if b in _LONG_BINDS}
+
+
+_insert_statement: Optional[InsertStatement] = None
+_schema_lock = threading.Lock()
+
+
+def _detect_insert_statement(conn) -> InsertStatement:
+    cursor = conn.cursor()
+    try:
+        # zero-row select resolves the table exactly like the INSERT does (synonyms, current schema)
+        cursor.execute("SELECT * FROM weather_api_response WHERE 1 = 0")
+        present = {d[0].lower() for d in cursor.description}
+    finally:
+        cursor.close()
+    missing = [c for c in _REQUIRED_COLUMNS if c not in present]
+    if missing:
+        raise RuntimeError(f"weather_api_response is missing required columns: {missing}")
+    columns = [c for c in _COLUMN_BINDS if c in present]
+    skipped = [c for c in _COLUMN_BINDS if c not in present]
+    if skipped:
+        logger.warning("weather_api_response lacks columns %s; they will not be populated (apply database/migrations/)", skipped)
+    dedup = settings.DB_PAYLOAD_DEDUP and "payload_hash" in columns
+    if settings.DB_PAYLOAD_DEDUP and not dedup:
+        logger.warning("DB_PAYLOAD_DEDUP is set but weather_api_response has no payload_hash column; storing payloads inline")
+    return InsertStatement(columns, dedup=dedup)
+
+
+def get_insert_statement(conn=None) -> InsertStatement:
+    """Return the cached INSERT, introspecting the table on first use."""
+    global _insert_statement
+    if _insert_statement is not None:
+        return _insert_statement
+    with _schema_lock:
+        if _insert_statement is None:
+            if conn is not None:
+                _insert_statement = _detect_insert_statement(conn)
+            else:
+                with connection() as own:
+                    _insert_statement = _detect_insert_statement(own)
+            logger.info("Detected weather_api_response columns: %s (payload dedup: %s)", _insert_statement.present, _insert_statement.dedup)
+        return _insert_statement
+
+
+def _forget_schema() -> None:
+    global _insert_statement
+    with _schema_lock:
+        _insert_statement = None
+
+
+def refresh_schema() -> InsertStatement:
+    """Forget the cached INSERT and re-introspect (call after applying a migration)."""
+    _forget_schema()
+    return get_insert_statement()
+
+
+def _is_invalid_identifier(exc: Exception) -> bool:
+    return "ORA-00904" in str(exc)
+
+
+def build_record(location: Optional[str], api_type: str, payload: Any, params: Optional[Dict[str, Any]] = None, response_time_ms: Optional[int] = None, status_code: Optional[int] = None, request_url: Optional[str] = None) -> Dict[str, Any]:
+    """Serialize one API response into the bind variables used by the INSERT statements.
+
+    A `RawPayload` is stored as its upstream text, without re-encoding. The location is
+    stored normalized (one spelling per place), so filters on it match every spelling
+    (older rows: see `app.jobs.location_backfill`).
     """
-    conn = None
-    cursor = None
+    return {
+        "loc": normalize_location(location) or "N/A",
+        "api": api_type,
+        "jsondata": payload.text if isinstance(payload, RawPayload) else json.dumps(payload),
+        "params": json.dumps(params) if params is not None else None,
+        "resp_ms": response_time_ms,
+        "status": status_code,
+        "url": request_url,
+    }
+
+
+def _execute_insert(conn, records: List[Dict[str, Any]]):
+    """Run the cached INSERT for `records`; re-introspect once if a column went missing.
+
+    Returns the cursor and the records the database rejected (see `_run_insert`).
+    """
+    stmt = get_insert_statement(conn)
+    cursor = conn.cursor()
+    mode = "single" if len(records) == 1 else "batch"
+    start = time.perf_counter()
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        json_text = json.dumps(payload)
-        params_text = json.dumps(params) if params is not None else None
         try:
-            cursor.execute(
-                """
-                INSERT INTO weather_api_response (location, api_type, json_data, params_json, response_time_ms, status_code, request_url)
-                VALUES (:loc, :api, :jsondata, :params, :resp_ms, :status, :url)
-                """,
-                {
-                    "loc": location or "N/A",
-                    "api": api_type,
-                    "jsondata": json_text,
-                    "params": params_text,
-                    "resp_ms": response_time_ms,
-                    "status": status_code,
-                    "url": request_url,
-                }
-            )
+            rejected = _run_insert(cursor, stmt, records)
         except Exception as exc:
-            # If the extended columns do not exist in the target DB, fallback to older schemas.
-            logger.warning("Extended insert failed, attempting fallback insert: %s", exc)
-            try:
-                cursor.execute(
-                    """
-                    INSERT INTO weather_api_response (location, api_type, json_data, params_json, response_time_ms)
-                    VALUES (:loc, :api, :jsondata, :params, :resp_ms)
-                    """,
-                    {
-                        "loc": location or "N/A",
-                        "api": api_type,
-                        "jsondata": json_text,
-                        "params": params_text,
-                        "resp_ms": response_time_ms,
-                    }
-                )
-            except Exception:
-                # Last resort: minimal insert
-                logger.warning("Fallback insert failed, attempting minimal insert.")
-                cursor.execute(
-                    """
-                    INSERT INTO weather_api_response (location, api_type, json_data)
-                    VALUES (:loc, :api, :jsondata)
-                    """,
-                    {
-                        "loc": location or "N/A",
-                        "api": api_type,
-                        "jsondata": json_text,
-                    }
-                )
-        conn.commit()
+            if not _is_invalid_identifier(exc):
+                cursor.close()
+                raise
+            logger.warning("Insert hit an unknown column, re-detecting schema: %s", exc)
+            conn.rollback()
+            _forget_schema()
+            rejected = _run_insert(cursor, get_insert_statement(conn), records)
+    except Exception:
+        DB_INSERT_ROWS.inc("error", value=len(records))
+        raise
+    finally:
+        DB_INSERT_LATENCY.observe(time.perf_counter() - start, mode)
+    DB_INSERT_ROWS.inc("ok", value=len(records) - len(rejected))
+    if rejected:
+        DB_INSERT_ROWS.inc("error", value=len(rejected))
+    return cursor, rejected
+
+
+def _run_insert(cursor, stmt: InsertStatement, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Insert `records`; a batch runs with `batcherrors`, so a bad row is returned instead of failing the rest."""
+    if stmt.dedup:
+        payload_store.store_payloads(cursor, records)
+    if len(records) == 1:
+        cursor.execute(stmt.sql, stmt.params(records[0]))
+        return []
+    cursor.setinputsizes(**stmt.input_sizes())
+    cursor.executemany(stmt.sql, [stmt.params(r) for r in records], batcherrors=True)
+    rejected = []
+    for error in cursor.getbatcherrors():
+        record = records[error.offset]
+        logger.error("Rejected %s response for %s: %s", record.get("api"), record.get("loc"), error.message)
+        rejected.append(record)
+    return rejected
+
+
+def _save(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    with connection() as conn:
+        cursor, rejected = _execute_insert(conn, records)
+        try:
+            conn.commit()
+        finally:
+            cursor.close()
+    return rejected
+
+
+def save_api_response(location: Optional[str], api_type: str, payload: Any, params: Optional[Dict[str, Any]] = None, response_time_ms: Optional[int] = None, status_code: Optional[int] = None, request_url: Optional[str] = None) -> None:
+    """
+    Save the raw JSON payload into weather_api_response table.
+    A `RawPayload` is stored as the upstream bytes, as received; any other
+    payload is serialized with `json.dumps` (see `build_record`).
+
+    Only columns present in the target table are written; the table is
+    introspected once and the INSERT reused (see `get_insert_statement`).
+    """
+    record = build_record(location, api_type, payload, params, response_time_ms, status_code, request_url)
+    try:
+        _save([record])
     except Exception as exc:
         logger.exception("Failed to save API response: %s", exc)
         raise
-    finally:
-        if cursor:
-            try:
-                cursor.close()
-            except Exception:
-                pass
-        if conn:
-            try:
-                conn.close()
-            except Exception:
-                pass
+
+
+def save_api_responses(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Insert many records built by `build_record` with one `executemany` and one commit.
+
+    Rows the database rejects (a constraint, a value too large) are logged and
+    returned; the rest of the batch is committed.
+    """
+    if not records:
+        return []
+    try:
+        return _save(records)
+    except Exception as exc:
+        logger.exception("Failed to save %s API responses: %s", len(records), exc)
+        raise
+
+
+async def persist_api_response(location: Optional[str], api_type: str, payload: Any, params: Optional[Dict[str, Any]] = None, response_time_ms: Optional[int] = None, status_code: Optional[int] = None, request_url: Optional[str] = None) -> bool:
+    """Persist an API response off the request path.
+
+    With the write-behind queue running the record is queued and flushed in
+    batches; otherwise it is saved synchronously in the threadpool. Returns
+    False when the queue rejected (dropped) the record.
+    """
+    from app.services.db_writer import get_write_queue
+
+    queue = get_write_queue()
+    if queue is None:
+        await run_in_threadpool(save_api_response, location, api_type, payload, params, response_time_ms, status_code, request_url)
+        return True
+
+    record = build_record(location, api_type, payload, params, response_time_ms, status_code, request_url)
+    if queue.offer(record):
+        return True
+    # queue full: apply the backpressure policy (may block) without stalling the event loop
+    return await run_in_threadpool(queue.put, record)
+
+
+async def persist_api_responses(records: List[Dict[str, Any]]) -> int:
+    """Persist many records built by `build_record` as one batch; returns how many were accepted."""
+    if not records:
+        return 0
+    from app.services.db_writer import get_write_queue
+
+    queue = get_write_queue()
+    if queue is None:
+        rejected = await run_in_threadpool(save_api_responses, records)
+        return len(records) - len(rejected)
+
+    overflow = [r for r in records if not queue.offer(r)]
+    accepted = len(records) - len(overflow)
+    if overflow:
+        accepted += sum(await run_in_threadpool(lambda: [queue.put(r) for r in overflow]))
+    return accepted
@@ -0,0 +1,340 @@
+"""Write-behind persistence for API responses.
+
+Records are accepted into a bounded in-memory queue and flushed by a background
+thread with `executemany` in batches (`DB_WRITE_BATCH_SIZE` rows or every
+`DB_WRITE_FLUSH_INTERVAL` seconds, whichever comes first). When the queue is
+full the `DB_WRITE_BACKPRESSURE` policy applies:
+
+- ``block``: wait up to `DB_WRITE_BLOCK_TIMEOUT` seconds for room, then drop
+- ``drop``: drop the record and count it
+- ``spill``: append the record to a JSON-lines file that is replayed when the
+  queue is idle (and on the next start); the file is kept until its records
+  are flushed or spilled again, so a crash mid-replay does not lose them
+
+A flush that fails with a transient database error (a dropped connection, a
+failover, an exhausted pool) is retried `DB_WRITE_RETRIES` times,
+`DB_WRITE_RETRY_BACKOFF` seconds apart and doubling; while the worker retries,
+the queue fills up and the backpressure policy applies to new records. A batch
+that still fails is spilled (``spill``) or counted as failed. Any other error
+is not retried or spilled: the batch is counted as failed. Rows the database
+rejects are counted as failed and the rest of their batch is kept (see
+`save_api_responses`).
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from app.config import settings
+from app.db import is_transient_error
+from app.services.db_service import save_api_responses
+from app.utils.logger import logger
+
+BACKPRESSURE_POLICIES = ("block", "drop", "spill")
+
+
+class WriteBehindQueue:
+    def __init__(
+        self,
+        flush_fn: Callable[[List[Dict[str, Any]]], Optional[List[Dict[str, Any]]]],
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_size: int = 10000,
+        policy: str = "block",
+        block_timeout: float = 1.0,
+        spill_path: Optional[str] = None,
+        retries: int = 3,
+        retry_backoff: float = 0.5,
+        is_transient: Callable[[BaseException], bool] = is_transient_error,
+    ):
+        if policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Invalid backpressure policy: {policy}")
+        if policy == "spill" and not spill_path:
+            raise ValueError("spill policy requires a spill_path")
+        self._flush_fn = flush_fn
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.spill_path = spill_path
+        self.retries = max(0, retries)
+        self.retry_backoff = retry_backoff
+        self.is_transient = is_transient
+
+        self._queue: Deque[Dict[str, Any]] = deque()
+        self._cond = threading.Condition()
+        self._spill_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._stop_deadline = 0.0
+
+        self.enqueued = 0
+        self.flushed = 0
+        self.failed = 0
+        self.retried = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.corrupt = 0
+        self.flush_count = 0
+        self.last_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    # -- producer side -------------------------------------------------
+
+    def offer(self, record: Dict[str, Any]) -> bool:
+        """Queue `record` if there is room; never blocks."""
+        with self._cond:
+            if len(self._queue) >= self.max_size:
+                return False
+            self._append(record)
+            return True
+
+    def put(self, record: Dict[str, Any]) -> bool:
+        """Queue `record`, applying the backpressure policy when full.
+
+        Returns False when the record was dropped. May block (``block`` policy),
+        so call it from a worker thread, not the event loop.
+        """
+        with self._cond:
+            if len(self._queue) < self.max_size:
+                self._append(record)
+                return True
+            if self.policy == "block":
+                deadline = time.monotonic() + self.block_timeout
+                while len(self._queue) >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.dropped += 1
+                        logger.warning("Write-behind queue full; dropped record after %.1fs", self.block_timeout)
+                        return False
+                    self._cond.wait(remaining)
+                self._append(record)
+                return True
+            if self.policy == "drop":
+                self.dropped += 1
+                return False
+        self._spill([record])
+        return True
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        # caller holds self._cond
+        self._queue.append(record)
+        self.enqueued += 1
+        if len(self._queue) >= self.batch_size:
+            self._cond.notify_all()
+
+    # -- consumer side -------------------------------------------------
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="db-write-behind", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop the worker after flushing everything still queued."""
+        with self._cond:
+            self._stopping = True
+            self._stop_deadline = time.monotonic() + timeout
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                logger.warning("Write-behind worker did not finish within %.1fs; %s records pending", timeout, len(self._queue))
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and not self._stopping
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        with self._cond:
+            deadline = time.monotonic() + self.flush_interval
+            while len(self._queue) < self.batch_size and not self._stopping:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            n = min(len(self._queue), self.batch_size)
+            batch = [self._queue.popleft() for _ in range(n)]
+            if batch:
+                # wake producers blocked on a full queue
+                self._cond.notify_all()
+            return batch
+
+    def _run(self) -> None:
+        self._replay_spill()
+        while True:
+            batch = self._take_batch()
+            if batch:
+                self._flush(batch)
+            elif self._stopping:
+                return
+            else:
+                self._replay_spill()
+
+    def flush(self) -> None:
+        """Synchronously flush everything currently queued (used by tests and shutdown hooks)."""
+        while True:
+            with self._cond:
+                n = min(len(self._queue), self.batch_size)
+                batch = [self._queue.popleft() for _ in range(n)]
+                self._cond.notify_all()
+            if not batch:
+                return
+            self._flush(batch)
+
+    def _flush_with_retries(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Flush `batch`, retrying transient errors; returns the rows the database rejected."""
+        delay = self.retry_backoff
+        for attempt in range(self.retries + 1):
+            try:
+                return self._flush_fn(batch) or []
+            except Exception as exc:
+                if attempt >= self.retries or not self.is_transient(exc):
+                    raise
+                if self._stopping and time.monotonic() + delay >= self._stop_deadline:
+                    # don't sleep past stop()'s timeout; _flush spills or counts the batch
+                    raise
+                self.retried += 1
+                logger.warning("Write-behind flush of %s records failed (%s); retrying in %.1fs", len(batch), exc, delay)
+                time.sleep(delay)
+                delay *= 2
+
+    def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        start = time.perf_counter()
+        try:
+            rejected = self._flush_with_retries(batch)
+            self.flushed += len(batch) - len(rejected)
+            self.failed += len(rejected)
+        except Exception as exc:
+            logger.error("Write-behind flush of %s records failed: %s", len(batch), exc)
+            if self.policy == "spill" and self.is_transient(exc):
+                self._spill(batch)
+            else:
+                # a permanent error would fail the same way when replayed
+                self.failed += len(batch)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.flush_count += 1
+            self.last_flush_ms = elapsed_ms
+            self.total_flush_ms += elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+
+    # -- spill file ----------------------------------------------------
+
+    def _spill(self, records: List[Dict[str, Any]]) -> None:
+        try:
+            with self._spill_lock, open(self.spill_path, "a", encoding="utf-8") as fh:
+                for record in records:
+                    fh.write(json.dumps(record) + "\n")
+            self.spilled += len(records)
+        except Exception as exc:
+            self.dropped += len(records)
+            logger.error("Could not spill %s records to %s: %s", len(records), self.spill_path, exc)
+
+    def _replay_spill(self) -> None:
+        """Flush the spilled records; the spill file is removed only once they are flushed or spilled again.
+
+        A `.replay` file left by a crash mid-replay is finished before new
+        spills are taken, so its records are not overwritten (they may be
+        written twice instead). Unreadable lines are skipped and counted.
+        """
+        if self.policy != "spill" or not self.spill_path:
+            return
+        replay_path = f"{self.spill_path}.replay"
+        with self._spill_lock:
+            if not os.path.exists(replay_path):
+                try:
+                    os.replace(self.spill_path, replay_path)
+                except OSError:
+                    return
+        records = self._read_spill(replay_path)
+        logger.info("Replaying %s spilled records", len(records))
+        for i in range(0, len(records), self.batch_size):
+            # failures are spilled again by _flush
+            self._flush(records[i:i + self.batch_size])
+        try:
+            os.remove(replay_path)
+        except OSError as exc:
+            logger.error("Could not remove replayed spill file %s: %s", replay_path, exc)
+
+    def _read_spill(self, path: str) -> List[Dict[str, Any]]:
+        records = []
+        with open(path, encoding="utf-8") as fh:
+            for lineno, line in enumerate(fh, 1):
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError as exc:
+                    self.corrupt += 1
+                    logger.warning("Skipping unreadable spilled record %s:%s: %s", path, lineno, exc)
+        return records
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "policy": self.policy,
+            "depth": len(self._queue),
+            "max_size": self.max_size,
+            "enqueued": self.enqueued,
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "retried": self.retried,
+            "dropped": self.dropped,
+            "spilled": self.spilled,
+            "corrupt": self.corrupt,
+            "flush_count": self.flush_count,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "avg_flush_ms": round(self.total_flush_ms / self.flush_count, 2) if self.flush_count else 0.0,
+            "max_flush_ms": round(self.max_flush_ms, 2),
+        }
+
+
+_write_queue: Optional[WriteBehindQueue] = None
+
+
+def start_write_queue() -> Optional[WriteBehindQueue]:
+    """Create and start the write-behind queue when `DB_WRITE_BEHIND` is enabled."""
+    global _write_queue
+    if not settings.DB_WRITE_BEHIND:
+        return None
+    if _write_queue is None:
+        _write_queue = WriteBehindQueue(
+            save_api_responses,
+            batch_size=settings.DB_WRITE_BATCH_SIZE,
+            flush_interval=settings.DB_WRITE_FLUSH_INTERVAL,
+            max_size=settings.DB_WRITE_QUEUE_MAX,
+            policy=settings.DB_WRITE_BACKPRESSURE,
+            block_timeout=settings.DB_WRITE_BLOCK_TIMEOUT,
+            spill_path=settings.DB_WRITE_SPILL_PATH,
+            retries=settings.DB_WRITE_RETRIES,
+            retry_backoff=settings.DB_WRITE_RETRY_BACKOFF,
+        )
+    _write_queue.start()
+    return _write_queue
+
+
+def stop_write_queue(timeout: float = 10.0) -> None:
+    if _write_queue is not None:
+        _write_queue.stop(timeout)
+
+
+def get_write_queue() -> Optional[WriteBehindQueue]:
+    """Return the running queue, or None when records should be saved synchronously."""
+    if _write_queue is not None and _write_queue.running:
+        return _write_queue
+    return None
+
+
+def get_write_queue_stats() -> Dict[str, Any]:
+    if _write_queue is None:
+        return {"enabled": settings.DB_WRITE_BEHIND, "running": False}
+    return {"enabled": settings.DB_WRITE_BEHIND, **_write_queue.stats()}
@@ -0,0 +1,187 @@
+"""Streaming export of stored API responses (NDJSON or CSV).
+
+`ResponseExport` runs the query once and then yields the output in buffered
+chunks straight from the open cursor: rows arrive `EXPORT_ARRAYSIZE` at a time
+and CLOB values are read from their LOB locators in `EXPORT_LOB_CHUNK_SIZE`
+pieces, so memory stays flat however many rows match. Optional gzip is applied
+on the fly.
+
+The query (and connection acquire) happens before the response starts, so
+database errors still produce a proper error status.
+"""
+
+import csv
+import io
+import zlib
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.config import settings
+from app.db import get_connection
+from app.services.query_service import available_columns, build_filters, source_table
+from app.utils.logger import logger
+from app.utils.raw_json import json_dumps
+
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+_LOB_COLUMNS = ("json_data", "params_json")
+
+
+def _read_lob(value: Any, chunk_size: int) -> Iterator[str]:
+    """Yield the text of a CLOB locator piecewise (plain strings are yielded as-is)."""
+    if value is None:
+        return
+    if isinstance(value, str):
+        yield value
+        return
+    offset = 1  # LOB offsets are 1-based
+    while True:
+        data = value.read(offset, chunk_size)
+        if not data:
+            return
+        yield data
+        offset += len(data)
+
+
+def _scalar(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+class ResponseExport:
+    def __init__(
+        self,
+        fmt: str = "ndjson",
+        location: Optional[str] = None,
+        api_type: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        include_json: bool = True,
+        compress: bool = False,
+    ):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {fmt}")
+        self.fmt = fmt
+        self.filters = (location, api_type, start, end)
+        self.include_json = include_json
+        self.compress = compress
+        self.rows = 0
+        self._conn = None
+        self._cursor = None
+        self.columns: List[str] = []
+
+    @property
+    def media_type(self) -> str:
+        return "application/gzip" if self.compress else EXPORT_FORMATS[self.fmt]
+
+    @property
+    def filename(self) -> str:
+        return f"weather_api_response.{self.fmt}" + (".gz" if self.compress else "")
+
+    def open(self) -> "ResponseExport":
+        """Acquire a connection and execute the query (blocking; run in a worker thread)."""
+        self._conn = get_connection()
+        try:
+            self.columns = available_columns(self._conn, self.include_json)
+            where, binds = build_filters(*self.filters)
+            sql = f"SELECT {', '.join(self.columns)} FROM {source_table(self._conn, self.include_json)}"
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+            sql += " ORDER BY request_time, id"
+            self._cursor = self._conn.cursor()
+            self._cursor.arraysize = settings.EXPORT_ARRAYSIZE
+            self._cursor.prefetchrows = settings.EXPORT_PREFETCH_ROWS
+            self._cursor.execute(sql, binds)
+        except Exception:
+            self.close()
+            raise
+        return self
+
+    def close(self) -> None:
+        """Release cursor and connection; safe to call more than once."""
+        cursor, conn = self._cursor, self._conn
+        self._cursor = self._conn = None
+        for resource in (cursor, conn):
+            if resource is not None:
+                try:
+                    resource.close()
+                except Exception:
+                    pass
+
+    # -- row encoders (yield str pieces) ---------------------------------
+
+    def _ndjson_row(self, row: Dict[str, Any]) -> Iterator[str]:
+        head = json_dumps({k: _scalar(v) for k, v in row.items() if k not in _LOB_COLUMNS}).decode("utf-8")
+        yield head[:-1]
+        for column in _LOB_COLUMNS:
+            if column not in row:
+                continue
+            yield f',"{column}":'
+            if row[column] is None:
+                yield "null"
+            else:
+                # stored values are JSON documents already: copy them through
+                yield from _read_lob(row[column], settings.EXPORT_LOB_CHUNK_SIZE)
+        yield "}\n"
+
+    def _csv_row(self, row: Dict[str, Any], writer: Any, line: io.StringIO) -> Iterator[str]:
+        line.seek(0)
+        line.truncate()
+        writer.writerow([_scalar(v) for k, v in row.items() if k not in _LOB_COLUMNS])
+        yield line.getvalue().rstrip("\n")
+        for column in _LOB_COLUMNS:
+            if column not in row:
+                continue
+            if row[column] is None:
+                yield ","
+                continue
+            yield ',"'
+            for piece in _read_lob(row[column], settings.EXPORT_LOB_CHUNK_SIZE):
+                yield piece.replace('"', '""')
+            yield '"'
+        yield "\n"
+
+    def _pieces(self) -> Iterator[str]:
+        # LOB columns come last in `columns`, so CSV values can be streamed after the scalar ones
+        if self.fmt == "csv":
+            line = io.StringIO()
+            writer = csv.writer(line, lineterminator="\n")
+            writer.writerow(self.columns)
+            yield line.getvalue()
+        while True:
+            batch = self._cursor.fetchmany()
+            if not batch:
+                return
+            for values in batch:
+                row = dict(zip(self.columns, values))
+                self.rows += 1
+                if self.fmt == "csv":
+                    yield from self._csv_row(row, writer, line)
+                else:
+                    yield from self._ndjson_row(row)
+
+    def __iter__(self) -> Iterator[bytes]:
+        """Yield the encoded (and optionally gzipped) output in ~`EXPORT_BUFFER_BYTES` chunks."""
+        if self._cursor is None:
+            self.open()
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if self.compress else None
+        buffer: List[bytes] = []
+        size = 0
+        try:
+            for piece in self._pieces():
+                data = piece.encode("utf-8")
+                buffer.append(data)
+                size += len(data)
+                if size >= settings.EXPORT_BUFFER_BYTES:
+                    out = b"".join(buffer)
+                    buffer, size = [], 0
+                    if compressor is not None:
+                        out = compressor.compress(out)
+                    if out:
+                        yield out
+            out = b"".join(buffer)
+            if compressor is not None:
+                out = compressor.compress(out) + compressor.flush()
+            if out:
+                yield out
+            logger.info("Exported %s weather_api_response rows as %s", self.rows, self.fmt)
+        finally:
+            self.close()
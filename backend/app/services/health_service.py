@@ -0,0 +1,137 @@
+"""Background health monitor.
+
+Probing the database (and the upstream API) on every `/health` request blocks
+and multiplies load when many load balancers probe every second. Instead a
+background task refreshes a snapshot every `HEALTH_CHECK_INTERVAL` seconds and
+the health routes only read it:
+
+- ``/health``: the full snapshot (status, DB probe, upstream probe, pool stats)
+- ``/health/live``: the process is up and the event loop responds
+- ``/health/ready``: the last DB probe succeeded and is not older than
+  `HEALTH_MAX_AGE` seconds
+
+The upstream probe is one plain HEAD request on a client of its own: no
+retries, no shared connection pool and no per-host concurrency slot, so it
+neither waits behind nor adds to real traffic and reports what a fresh
+connection sees within `HEALTH_UPSTREAM_TIMEOUT`.
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.config import settings
+from app.db import get_pool_info, ping
+from app.utils.logger import logger
+
+
+class HealthMonitor:
+    def __init__(
+        self,
+        interval: float = 5.0,
+        db_timeout: float = 2.0,
+        upstream_timeout: float = 2.0,
+        check_upstream: bool = True,
+        max_age: float = 30.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.interval = interval
+        self.db_timeout = db_timeout
+        self.upstream_timeout = upstream_timeout
+        self.check_upstream = check_upstream
+        self.max_age = max_age
+        self._transport = transport
+        self._snapshot: Dict[str, Any] = {"status": "ok", "checked_at": None}
+        self._checked_monotonic: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        # a DB probe that outlived its timeout keeps running; don't start another meanwhile
+        self._db_probe: Optional[asyncio.Future] = None
+
+    async def _check_db(self) -> Dict[str, Any]:
+        if self._db_probe is not None and not self._db_probe.done():
+            return {"db_connected": False, "db_error": "previous probe still running"}
+        start = time.perf_counter()
+        self._db_probe = asyncio.get_running_loop().run_in_executor(None, ping)
+        try:
+            await asyncio.wait_for(asyncio.shield(self._db_probe), self.db_timeout)
+            return {"db_connected": True, "db_latency_ms": round((time.perf_counter() - start) * 1000, 2)}
+        except asyncio.TimeoutError:
+            return {"db_connected": False, "db_error": f"probe timed out after {self.db_timeout}s"}
+        except Exception as exc:
+            return {"db_connected": False, "db_error": str(exc), "db_latency_ms": round((time.perf_counter() - start) * 1000, 2)}
+
+    async def _check_upstream(self) -> Dict[str, Any]:
+        if not self.check_upstream:
+            return {}
+        # any HTTP response (even 401 without a key) means the upstream is reachable
+        start = time.perf_counter()
+        try:
+            async with httpx.AsyncClient(timeout=self.upstream_timeout, transport=self._transport) as client:
+                resp = await client.head(settings.WEATHER_BASE_URL)
+            return {
+                "upstream_reachable": True,
+                "upstream_status": resp.status_code,
+                "upstream_latency_ms": round((time.perf_counter() - start) * 1000, 2),
+            }
+        except httpx.HTTPError as exc:
+            return {"upstream_reachable": False, "upstream_error": str(exc) or type(exc).__name__}
+
+    async def check(self) -> Dict[str, Any]:
+        """Run all probes once and replace the snapshot."""
+        db, upstream = await asyncio.gather(self._check_db(), self._check_upstream())
+        snapshot: Dict[str, Any] = {"status": "ok", "checked_at": time.time(), **db, **upstream}
+        try:
+            snapshot["db_pool"] = get_pool_info()
+        except Exception as exc:
+            snapshot["db_pool_error"] = str(exc)
+        self._snapshot = snapshot
+        self._checked_monotonic = time.monotonic()
+        return snapshot
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.check()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.exception("Health check failed: %s", exc)
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def age(self) -> Optional[float]:
+        if self._checked_monotonic is None:
+            return None
+        return time.monotonic() - self._checked_monotonic
+
+    def snapshot(self) -> Dict[str, Any]:
+        age = self.age
+        return {**self._snapshot, "age_s": round(age, 3) if age is not None else None}
+
+    def ready(self) -> bool:
+        age = self.age
+        return age is not None and age <= self.max_age and bool(self._snapshot.get("db_connected"))
+
+
+health_monitor = HealthMonitor(
+    interval=settings.HEALTH_CHECK_INTERVAL,
+    db_timeout=settings.HEALTH_DB_TIMEOUT,
+    upstream_timeout=settings.HEALTH_UPSTREAM_TIMEOUT,
+    check_upstream=settings.HEALTH_UPSTREAM_CHECK,
+    max_age=settings.HEALTH_MAX_AGE,
+)
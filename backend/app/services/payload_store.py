@@ -0,0 +1,58 @@
+"""Content-addressed payload storage (``DB_PAYLOAD_DEDUP``).
+
+Each distinct `json_data` document is stored once in `weather_payload`, keyed
+by the SHA-256 of its text; `weather_api_response` rows only carry the hash
+(see database/migrations/003_payload_dedup_*.sql). Every write MERGEs its
+payloads, even ones stored before: the MERGE and the row INSERT share a
+transaction, so the payload a row points at cannot have been pruned in between
+(see `app.jobs.retention.prune_payloads`). Repeats within a batch are merged once.
+"""
+
+import hashlib
+from typing import Any, Dict, List
+
+import oracledb
+
+from app.utils.logger import logger
+
+MERGE_PAYLOAD_SQL = (
+    "MERGE INTO weather_payload p "
+    "USING (SELECT :phash AS payload_hash FROM dual) s "
+    "ON (p.payload_hash = s.payload_hash) "
+    "WHEN NOT MATCHED THEN INSERT (payload_hash, json_data, byte_size) "
+    "VALUES (:phash, :jsondata, :nbytes)"
+)
+# another writer inserted the same hash between our MERGE's check and insert
+_UNIQUE_VIOLATION = 1
+
+
+def payload_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def store_payloads(cursor, records: List[Dict[str, Any]]) -> int:
+    """Ensure every record's payload is in `weather_payload`; sets ``phash`` on the records.
+
+    Returns the number of payloads inserted (not already stored). Runs in the
+    caller's transaction.
+    """
+    pending: Dict[str, Dict[str, Any]] = {}
+    for record in records:
+        if record.get("jsondata") is None:
+            continue
+        digest = record.get("phash") or payload_hash(record["jsondata"])
+        record["phash"] = digest
+        if digest not in pending:
+            text = record["jsondata"]
+            pending[digest] = {"phash": digest, "jsondata": text, "nbytes": len(text.encode("utf-8"))}
+    if not pending:
+        return 0
+    rows = list(pending.values())
+    cursor.setinputsizes(jsondata=oracledb.DB_TYPE_LONG)
+    cursor.executemany(MERGE_PAYLOAD_SQL, rows, batcherrors=True)
+    for error in cursor.getbatcherrors():
+        if error.code != _UNIQUE_VIOLATION:
+            raise RuntimeError(f"Failed to store payload {rows[error.offset]['phash']}: {error.message}")
+    written = cursor.rowcount or 0
+    logger.debug("Stored %s new payloads (%s records)", written, len(records))
+    return written
@@ -0,0 +1,161 @@
+"""Access-frequency-driven cache pre-warming.
+
+Every cached lookup for a `PREWARM_APIS` endpoint is counted in a
+`HotKeyTracker` (count-min sketch + top-K). `PrewarmScheduler` wakes every
+`PREWARM_INTERVAL` seconds and refreshes the hot keys (at least
+`PREWARM_MIN_HITS` recent accesses) whose entry is missing or within
+`PREWARM_LEAD_TIME` seconds of the end of its fresh TTL, hottest first. Upstream
+calls are limited by a token bucket of `PREWARM_BUDGET_PER_MINUTE` calls and
+`PREWARM_CONCURRENCY` in flight; counters are halved every
+`PREWARM_DECAY_INTERVAL` seconds so the ranking follows current traffic.
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+from app.config import settings
+from app.utils.cache import get_cache
+from app.utils.hotkeys import HotKeyTracker
+from app.utils.logger import logger
+
+_prewarm_apis = {f"{name.strip()}.json" for name in settings.PREWARM_APIS.split(",") if name.strip()}
+hot_keys = HotKeyTracker(k=settings.PREWARM_TOP_K)
+
+
+def record_access(endpoint: str, url: str, params: Dict[str, Any], cache_key: str) -> None:
+    """Count a lookup of `cache_key`, remembering how to refresh it."""
+    if settings.PREWARM_ENABLED and endpoint in _prewarm_apis:
+        hot_keys.record(cache_key, (endpoint, url, params))
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute: int):
+        self.capacity = max(1, rate_per_minute)
+        self.rate = rate_per_minute / 60.0
+        self.tokens = float(self.capacity)
+        self._updated = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class PrewarmScheduler:
+    def __init__(
+        self,
+        tracker: HotKeyTracker,
+        interval: float = 5.0,
+        lead_time: float = 15.0,
+        budget_per_minute: int = 120,
+        concurrency: int = 5,
+        min_hits: int = 3,
+        decay_interval: float = 600.0,
+    ):
+        self.tracker = tracker
+        self.interval = interval
+        self.lead_time = lead_time
+        self.budget = TokenBucket(budget_per_minute)
+        self.concurrency = max(1, concurrency)
+        self.min_hits = min_hits
+        self.decay_interval = decay_interval
+        self._last_decay = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+
+        self.runs = 0
+        self.refreshed = 0
+        self.failed = 0
+        self.over_budget = 0
+
+    async def _due(self, cache_key: str, now: float) -> bool:
+        entry = await get_cache().peek(cache_key)
+        if not entry:
+            return True
+        fresh_until = entry.get("fresh_until")
+        # immutable entries never need a refresh
+        return fresh_until is not None and fresh_until - now <= self.lead_time
+
+    async def run_once(self) -> int:
+        """Refresh due hot keys once; returns the number of refreshes started."""
+        from app.services import weather_service
+
+        self.runs += 1
+        if time.monotonic() - self._last_decay >= self.decay_interval:
+            self.tracker.decay()
+            self._last_decay = time.monotonic()
+
+        now = time.time()
+        due = []
+        for cache_key, _, (endpoint, url, params) in self.tracker.top(min_count=self.min_hits):
+            if cache_key in weather_service._flight or not await self._due(cache_key, now):
+                continue
+            if not self.budget.take():
+                self.over_budget += 1
+                break
+            due.append((endpoint, url, params, cache_key))
+        if not due:
+            return 0
+
+        sem = asyncio.Semaphore(self.concurrency)
+
+        async def refresh(endpoint: str, url: str, params: Dict[str, Any], cache_key: str) -> None:
+            async with sem:
+                try:
+                    await weather_service.refresh_entry(endpoint, url, params, settings.REQUEST_TIMEOUT, cache_key)
+                    self.refreshed += 1
+                except Exception as exc:
+                    self.failed += 1
+                    logger.warning("Pre-warm refresh failed for %s: %s", endpoint, exc)
+
+        await asyncio.gather(*(refresh(*call) for call in due))
+        logger.info("Pre-warmed %s hot cache entries", len(due))
+        return len(due)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as exc:
+                logger.exception("Pre-warm run failed: %s", exc)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.PREWARM_ENABLED,
+            "tracked_keys": len(self.tracker),
+            "accesses": self.tracker.accesses,
+            "runs": self.runs,
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+            "over_budget": self.over_budget,
+            "budget_tokens": round(self.budget.tokens, 1),
+        }
+
+
+prewarm_scheduler = PrewarmScheduler(
+    hot_keys,
+    interval=settings.PREWARM_INTERVAL,
+    lead_time=settings.PREWARM_LEAD_TIME,
+    budget_per_minute=settings.PREWARM_BUDGET_PER_MINUTE,
+    concurrency=settings.PREWARM_CONCURRENCY,
+    min_hits=settings.PREWARM_MIN_HITS,
+    decay_interval=settings.PREWARM_DECAY_INTERVAL,
+)
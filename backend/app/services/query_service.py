@@ -0,0 +1,167 @@
+"""Read access to stored API responses.
+
+`query_responses` pages through `weather_api_response` newest first using keyset
+pagination on ``(request_time, id)``: the cursor returned with a page encodes
+the last row, and the next page continues strictly below it, so deep pages cost
+the same as the first (no OFFSET scan). Filters on location/api_type/time range
+are served by the indexes in database/migrations/002_response_query_indexes_*.sql.
+
+The CLOB columns (`json_data`, `params_json`) are only selected when asked for;
+`json_data` is returned as a `RawPayload` so it is sent without re-encoding.
+With payload dedup installed (migration 003) they are read through the
+`weather_api_response_full` view, which resolves `json_data` from `weather_payload`.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import oracledb
+
+from app.db import connection
+from app.services.db_service import get_insert_statement
+from app.utils.locations import normalize_location
+from app.utils.raw_json import RawPayload
+
+MAX_PAGE_SIZE = 500
+_SUMMARY_COLUMNS = ("id", "location", "api_type", "request_time", "response_time_ms", "status_code", "request_url")
+_LOB_COLUMNS = ("json_data", "params_json")
+
+
+class InvalidQuery(ValueError):
+    """Bad pagination cursor or page size (a client error)."""
+
+
+def encode_cursor(request_time: datetime, row_id: int) -> str:
+    raw = json.dumps([request_time.isoformat(), row_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        ts, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(ts), int(row_id)
+    except Exception as exc:
+        raise InvalidQuery("Invalid pagination cursor") from exc
+
+
+def lobs_as_strings(cursor, metadata):
+    # fetch CLOBs inline as str instead of one LOB locator round trip per row
+    if metadata.type_code is oracledb.DB_TYPE_CLOB:
+        return cursor.var(oracledb.DB_TYPE_LONG, arraysize=cursor.arraysize)
+
+
+def build_query(
+    columns: List[str],
+    location: Optional[str] = None,
+    api_type: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    after: Optional[Tuple[datetime, int]] = None,
+    limit: int = 50,
+    table: str = "weather_api_response",
+) -> Tuple[str, Dict[str, Any]]:
+    """Build the page query; fetches `limit + 1` rows so the caller can tell whether more exist."""
+    where, binds = build_filters(location, api_type, start, end)
+    if after is not None:
+        # row-value comparison spelled out: Oracle has no (a, b) < (x, y)
+        where.append("(request_time < :after_ts OR (request_time = :after_ts AND id < :after_id))")
+        binds["after_ts"], binds["after_id"] = after
+    sql = f"SELECT {', '.join(columns)} FROM {table}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY request_time DESC, id DESC FETCH FIRST :page_rows ROWS ONLY"
+    binds["page_rows"] = limit + 1
+    return sql, binds
+
+
+def build_filters(
+    location: Optional[str] = None,
+    api_type: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> Tuple[List[str], Dict[str, Any]]:
+    """WHERE conditions and binds for the location/api_type/time-range filters."""
+    where: List[str] = []
+    binds: Dict[str, Any] = {}
+    if location is not None:
+        # locations are stored normalized (see db_service.build_record)
+        where.append("location = :loc")
+        binds["loc"] = normalize_location(location)
+    if api_type is not None:
+        where.append("api_type = :api")
+        binds["api"] = api_type
+    if start is not None:
+        where.append("request_time >= :start_ts")
+        binds["start_ts"] = start
+    if end is not None:
+        where.append("request_time < :end_ts")
+        binds["end_ts"] = end
+    return where, binds
+
+
+def available_columns(conn, include_json: bool) -> List[str]:
+    """Summary columns (plus the CLOBs when `include_json`) that exist in this table."""
+    # older installs lack the migration 001 columns
+    present = set(get_insert_statement(conn).present) | {"id", "request_time"}
+    wanted = _SUMMARY_COLUMNS + (_LOB_COLUMNS if include_json else ())
+    return [c for c in wanted if c in present]
+
+
+def source_table(conn, include_json: bool) -> str:
+    """Table to read from: with payload dedup installed, json_data is resolved through the view."""
+    if include_json and "payload_hash" in get_insert_statement(conn).present:
+        return "weather_api_response_full"
+    return "weather_api_response"
+
+
+def _row_to_item(columns: List[str], row: Tuple[Any, ...]) -> Dict[str, Any]:
+    item = dict(zip(columns, row))
+    if isinstance(item.get("request_time"), datetime):
+        item["request_time"] = item["request_time"].isoformat()
+    if item.get("json_data") is not None:
+        item["json_data"] = RawPayload(item["json_data"].encode("utf-8"))
+    if item.get("params_json") is not None:
+        try:
+            item["params_json"] = json.loads(item["params_json"])
+        except ValueError:
+            pass
+    return item
+
+
+def query_responses(
+    location: Optional[str] = None,
+    api_type: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    include_json: bool = False,
+) -> Dict[str, Any]:
+    """Return one page of stored responses: {"items": [...], "next_cursor": str | None}."""
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise InvalidQuery(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    after = decode_cursor(cursor) if cursor else None
+
+    with connection() as conn:
+        columns = available_columns(conn, include_json)
+        sql, binds = build_query(columns, location, api_type, start, end, after, limit, source_table(conn, include_json))
+        cur = conn.cursor()
+        try:
+            cur.arraysize = limit + 1
+            cur.prefetchrows = limit + 2
+            if include_json:
+                cur.outputtypehandler = lobs_as_strings
+            cur.execute(sql, binds)
+            rows = cur.fetchall()
+        finally:
+            cur.close()
+
+    items = [_row_to_item(columns, row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = dict(zip(columns, rows[limit - 1]))
+        next_cursor = encode_cursor(last["request_time"], last["id"])
+    return {"items": items, "next_cursor": next_cursor}
@@ -1,18 +1,39 @@
-from typing import Dict, Any, Optional, Tuple
+from typing import Awaitable, Callable, Dict, Any, List, Optional, Set, Tuple
+import asyncio
+import hashlib
 import time
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+import httpx
 from app.config import settings
+from app.utils.http_client import create_upstream_session
 from app.utils.logger import logger
+from app.utils.metrics import UPSTREAM_LATENCY
 from app.utils.cache import get_cache
+from app.utils import cache_policy, locations
+from app.utils.raw_json import RawPayload
+from app.utils.hedging import Hedger
+from app.utils.rate_limit import RateLimited, create_key_pool
+from app.utils.resilience import CLOSED, STATE_CODES, AIMDLimiter, CircuitBreakers
+from app.utils.singleflight import SingleFlight
+from app.services.prewarm_service import record_access
 import json
 
 
+# (payload, meta): payload keeps the upstream bytes, meta has status_code, duration_ms, request_url
+RawResult = Tuple[RawPayload, Dict[str, Any]]
+
+
 class WeatherAPIError(Exception):
     """Raised when weather API call fails."""
 
 
+class UpstreamUnavailable(WeatherAPIError):
+    """The upstream call was not attempted: circuit open, concurrency limit reached or no API key free."""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
 VALID_API_NAMES = {
     "current",
     "forecast",
@@ -31,77 +52,595 @@ def _normalize_endpoint(name: str) -> str:
     return name if name.endswith(".json") else f"{name}.json"
 
 
-# Configure a session with a small retry policy to handle transient errors and 429s
-session = requests.Session()
-retries = Retry(total=2, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504))
-adapter = HTTPAdapter(max_retries=retries)
-session.mount("https://", adapter)
-session.mount("http://", adapter)
+def _api_name(endpoint: str) -> str:
+    return endpoint[:-len(".json")] if endpoint.endswith(".json") else endpoint
 
 
-def call_weather_api(endpoint: str, params: Optional[Dict[str, Any]] = None, timeout: Optional[int] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
-    """
-    Generic caller for WeatherAPI endpoints.
-    Returns a tuple of (json_result, meta) where meta contains status_code, duration_ms and request_url.
+# Shared async session: pooled keep-alive connections (HTTP/2 when available) with a
+# small retry policy to handle transient errors. Closed from the app lifespan.
+session = create_upstream_session()
+# API keys with per-key rate limits and quotas; 429s rest a key instead of being retried into
+key_pool = create_key_pool()
+
+# Identical concurrent calls (same cache key) share one upstream request
+_flight = SingleFlight()
+_remote_stats = {"remote_leader": 0, "remote_coalesced": 0, "remote_timeout": 0}
+# strong references to background stale-while-revalidate refreshes
+_refresh_tasks: Set[asyncio.Task] = set()
+
+# Fail fast instead of piling requests onto a degraded upstream (see app/utils/resilience.py)
+breakers = CircuitBreakers(
+    window=settings.CIRCUIT_WINDOW,
+    min_calls=settings.CIRCUIT_MIN_CALLS,
+    error_rate=settings.CIRCUIT_ERROR_RATE,
+    slow_call_ms=settings.CIRCUIT_SLOW_CALL_MS,
+    slow_rate=settings.CIRCUIT_SLOW_RATE,
+    open_seconds=settings.CIRCUIT_OPEN_SECONDS,
+    half_open_probes=settings.CIRCUIT_HALF_OPEN_PROBES,
+)
+limiter = AIMDLimiter(
+    initial=settings.UPSTREAM_LIMIT_INITIAL,
+    min_limit=settings.UPSTREAM_LIMIT_MIN,
+    max_limit=settings.UPSTREAM_LIMIT_MAX,
+    latency_ms=settings.UPSTREAM_LIMIT_LATENCY_MS,
+    backoff=settings.UPSTREAM_LIMIT_BACKOFF,
+)
+# Second attempt for calls stuck in the latency tail (see app/utils/hedging.py)
+hedger = Hedger(
+    percentile=settings.HEDGE_PERCENTILE,
+    min_delay_ms=settings.HEDGE_MIN_DELAY_MS,
+    min_samples=settings.HEDGE_MIN_SAMPLES,
+    window=settings.HEDGE_WINDOW,
+    budget=settings.HEDGE_BUDGET,
+)
+_hedge_apis = {name.strip() for name in settings.HEDGE_APIS.split(",") if name.strip()}
+
+
+def get_coalescing_stats() -> Dict[str, int]:
+    """Counters for leader vs. coalesced upstream calls (in-process and via Redis lock)."""
+    return {**_flight.stats(), **_remote_stats}
+
+
+def get_upstream_stats() -> Dict[str, Any]:
+    """Circuit breaker state per API, the adaptive concurrency limit, the API key pool and hedging."""
+    return {
+        "circuit_breaker": {"enabled": settings.CIRCUIT_BREAKER_ENABLED, "apis": breakers.stats()},
+        "concurrency": {"enabled": settings.UPSTREAM_ADAPTIVE_LIMIT, **limiter.stats()},
+        "keys": key_pool.stats(),
+        "hedging": {"enabled": settings.HEDGE_ENABLED, **hedger.stats()},
+    }
+
+
+def get_circuit_states() -> Dict[Tuple[str, ...], int]:
+    return {(name,): STATE_CODES[stats["state"]] for name, stats in breakers.stats().items()}
+
+
+def get_key_samples() -> Dict[Tuple[str, ...], float]:
+    samples: Dict[Tuple[str, ...], float] = {}
+    for key in key_pool.stats()["keys"]:
+        for field in ("calls", "used", "remaining", "throttled"):
+            if key[field] is not None:
+                samples[(key["id"], field)] = key[field]
+    return samples
+
+
+def _admit(api: str) -> None:
+    """Reserve an upstream call slot for `api`, or raise `UpstreamUnavailable`."""
+    # take the limiter slot first: a half-open probe slot must not be claimed for a call that never goes out
+    if settings.UPSTREAM_ADAPTIVE_LIMIT and not limiter.try_acquire():
+        raise UpstreamUnavailable(f"upstream concurrency limit reached ({limiter.stats()['limit']} in flight)")
+    if settings.CIRCUIT_BREAKER_ENABLED:
+        breaker = breakers.get(api)
+        if not breaker.allow():
+            if settings.UPSTREAM_ADAPTIVE_LIMIT:
+                limiter.release()
+            raise UpstreamUnavailable(f"circuit open for {api}", retry_after=breaker.retry_after())
+
+
+def _settle(api: str, success: Optional[bool], latency_ms: float) -> None:
+    """Report an admitted call's outcome; None when it was cancelled before completing."""
+    if settings.UPSTREAM_ADAPTIVE_LIMIT:
+        limiter.release(success, latency_ms)
+    if settings.CIRCUIT_BREAKER_ENABLED:
+        if success is None:
+            breakers.get(api).release_probe()
+        else:
+            breakers.get(api).record(success, latency_ms)
+
+
+async def _acquire_key(default: str, cost: int = 1, max_wait: Optional[float] = None) -> str:
+    """An API key for one upstream call, from the pool when keys are configured."""
+    if not key_pool.keys:
+        return default
+    try:
+        return await key_pool.acquire(cost, max_wait=max_wait)
+    except RateLimited as exc:
+        raise UpstreamUnavailable(str(exc), retry_after=exc.retry_after) from exc
+
+
+def _retry_after(resp: httpx.Response) -> Optional[float]:
+    value = resp.headers.get("Retry-After", "")
+    return float(value) if value.isdigit() else None
+
+
+async def _send(url: str, params: Dict[str, Any], timeout: int, api_key: Optional[str] = None) -> httpx.Response:
+    """GET with a key from the pool (or `api_key`, already taken from it); a 429 rests that key
+    and the call moves on to the next one.
+
+    After every key got a 429, one more attempt waits (up to RATE_LIMIT_MAX_WAIT) for the
+    first key to come back.
     """
-    if not settings.WEATHER_BASE_URL:
-        raise ValueError("WEATHER_BASE_URL is not configured")
-    if not settings.WEATHER_API_KEY:
-        raise ValueError("WEATHER_API_KEY is not configured")
+    attempts = len(key_pool.keys) + 1
+    attempt = 0
+    while True:
+        attempt += 1
+        if api_key is None:
+            api_key = await _acquire_key(params["key"])
+        resp = await session.get(url, params=dict(params, key=api_key), timeout=timeout)
+        if resp.status_code == 429:
+            await key_pool.penalize(api_key, _retry_after(resp))
+            if attempt < attempts:
+                await resp.aclose()
+                api_key = None
+                continue
+        else:
+            key_pool.succeeded(api_key)
+        return resp
 
-    endpoint = _normalize_endpoint(endpoint)
-    url = f"{settings.WEATHER_BASE_URL.rstrip('/')}/{endpoint}"
 
-    params = dict(params or {})
-    params["key"] = settings.WEATHER_API_KEY
+async def _send_checked(url: str, params: Dict[str, Any], timeout: int, api_key: Optional[str] = None) -> httpx.Response:
+    """`_send` raising on an error status, so a hedged error answer does not beat a slower success."""
+    resp = await _send(url, params, timeout, api_key)
+    if not resp.is_success:
+        await resp.aclose()
+        resp.raise_for_status()
+    return resp
 
-    to = timeout or settings.REQUEST_TIMEOUT
 
-    # attempt to use Redis cache if available
-    cache = get_cache()
-    cache_key = None
+async def _admit_hedge(api: str, url: str, params: Dict[str, Any], timeout: int) -> Optional[Callable[[], Awaitable[httpx.Response]]]:
+    """Admit a hedge like a call of its own, or None without headroom.
+
+    The hedge needs a closed circuit, takes a concurrency slot (given back when it
+    finishes or is cancelled) and an API key from the pool right away: a hedge never
+    waits for a key, and is paid for like any other call.
+    """
+    if settings.CIRCUIT_BREAKER_ENABLED and breakers.get(api).state != CLOSED:
+        return None
+    if settings.UPSTREAM_ADAPTIVE_LIMIT and not limiter.try_acquire():
+        return None
     try:
-        key_parts = {**(params or {})}
-        cache_key = f"weather:{endpoint}:{json.dumps(key_parts, sort_keys=True)}"
-        cached = cache.get(cache_key)
-        if cached:
-            logger.info("Cache hit for %s", cache_key)
-            return cached.get("data"), cached.get("meta")
-    except Exception:
-        # ignore cache errors
-        cache_key = None
+        api_key = await _acquire_key(params["key"], max_wait=0)
+    except UpstreamUnavailable:
+        if settings.UPSTREAM_ADAPTIVE_LIMIT:
+            limiter.release()
+        return None
+
+    async def hedge() -> httpx.Response:
+        start = time.time()
+        success: Optional[bool] = None
+        try:
+            resp = await _send_checked(url, params, timeout, api_key)
+            success = True
+            return resp
+        except httpx.HTTPError as exc:
+            success = not _is_upstream_failure(exc)
+            raise
+        finally:
+            if settings.UPSTREAM_ADAPTIVE_LIMIT:
+                limiter.release(success, (time.time() - start) * 1000)
+
+    return hedge
+
+
+def _is_upstream_failure(exc: Exception) -> bool:
+    # 4xx answers (unknown location, bad params) say nothing about upstream health; 429 does
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500 or exc.response.status_code == 429
+    return True
+
 
+async def _fetch_upstream(endpoint: str, url: str, params: Dict[str, Any], timeout: int, cache_key: Optional[str]) -> RawResult:
+    cache = get_cache()
+    api = _api_name(endpoint)
+    _admit(api)
     start = time.time()
+    success: Optional[bool] = None
     try:
-        resp = session.get(url, params=params, timeout=to)
+        if settings.HEDGE_ENABLED and api in _hedge_apis:
+            resp = await hedger.run(
+                api,
+                lambda: _send_checked(url, params, timeout),
+                lambda: _admit_hedge(api, url, params, timeout),
+                httpx.Response.aclose,
+            )
+        else:
+            resp = await _send(url, params, timeout)
         resp.raise_for_status()
-        result = resp.json()
-        duration_ms = int((time.time() - start) * 1000)
-        meta = {"status_code": resp.status_code, "duration_ms": duration_ms, "request_url": resp.url}
-        logger.info("Weather API call %s status=%s duration_ms=%s url=%s", endpoint, resp.status_code, duration_ms, resp.url)
+        # keep the upstream bytes next to the parsed object (parsing also validates the body)
+        result = RawPayload(resp.content, resp.json())
+        elapsed = time.time() - start
+        duration_ms = int(elapsed * 1000)
+        success = True
+        UPSTREAM_LATENCY.observe(elapsed, _api_name(endpoint), "ok")
+        meta = {"status_code": resp.status_code, "duration_ms": duration_ms, "request_url": str(resp.url)}
+        logger.info(
+            "Weather API call %s status=%s duration_ms=%s", endpoint, resp.status_code, duration_ms,
+            extra={"event": "upstream_call", "api": api, "status": resp.status_code, "latency_ms": duration_ms, "url": str(httpx.URL(str(resp.url)).copy_remove_param("key"))},
+        )
 
-        # set cache if enabled
+        # set cache if enabled; TTL depends on the API (and e.g. whether a history date has passed)
         try:
             if cache_key:
-                cache.set(cache_key, {"data": result, "meta": meta}, ttl=settings.CACHE_TTL)
+                fresh_ttl = cache_policy.ttl_for(_api_name(endpoint), params)
+                await cache.set(cache_key, cache_policy.make_entry(result, meta, fresh_ttl), ttl=cache_policy.storage_ttl(fresh_ttl))
         except Exception:
             pass
 
         return result, meta
-    except requests.RequestException as exc:
-        duration_ms = int((time.time() - start) * 1000)
-        logger.error("Weather API request failed: %s (duration_ms=%s)", exc, duration_ms)
+    except (httpx.HTTPError, json.JSONDecodeError) as exc:
+        elapsed = time.time() - start
+        duration_ms = int(elapsed * 1000)
+        success = not _is_upstream_failure(exc)
+        UPSTREAM_LATENCY.observe(elapsed, _api_name(endpoint), "error")
+        logger.error("Weather API request failed: %s (duration_ms=%s)", exc, duration_ms, extra={"event": "upstream_error", "api": api, "latency_ms": duration_ms})
         raise WeatherAPIError(str(exc)) from exc
+    finally:
+        _settle(api, success, (time.time() - start) * 1000)
 
 
-def fetch_api_by_name(api_name: str, q: Optional[str] = None, extra: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
-    if api_name not in VALID_API_NAMES:
-        raise ValueError(f"Invalid api_name: {api_name}")
+def _is_leader_result(entry: Dict[str, Any], seen_fresh_until: Optional[float]) -> bool:
+    """Whether `entry` can be the leader's result: fresher than the entry seen before waiting, or fresh."""
+    fresh_until = entry.get("fresh_until")
+    if seen_fresh_until is not None and fresh_until is not None and fresh_until > seen_fresh_until:
+        return True
+    return cache_policy.entry_state(entry) in (cache_policy.FRESH, cache_policy.REFRESH)
+
+
+async def _wait_for_remote_leader(cache_key: str, lock_key: str, error_key: str) -> Optional[RawResult]:
+    """Poll Redis while another process fetches `cache_key`; None if its result never shows up.
+
+    Entries are kept past their fresh period (stale-while-revalidate, stale-if-error), so
+    an entry that was already there when waiting started is not the leader's result.
+    """
+    cache = get_cache()
+    before = await cache.get_shared(cache_key)
+    seen_fresh_until = before.get("fresh_until") if before else None
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.COALESCE_WAIT_TIMEOUT
+    while loop.time() < deadline:
+        await asyncio.sleep(settings.COALESCE_POLL_INTERVAL)
+        cached = await cache.get_shared(cache_key)
+        if cached and _is_leader_result(cached, seen_fresh_until):
+            return RawPayload.wrap(cached.get("data")), cached.get("meta")
+        failed = await cache.get_shared(error_key)
+        if failed:
+            raise WeatherAPIError(failed.get("error", "upstream call failed"))
+        if not await cache.exists(lock_key):
+            # leader released without publishing a result
+            return None
+    return None
+
+
+async def _fetch_coalesced(endpoint: str, url: str, params: Dict[str, Any], timeout: int, cache_key: str) -> RawResult:
+    cache = get_cache()
+    if not (settings.COALESCE_DISTRIBUTED and cache.enabled):
+        return await _fetch_upstream(endpoint, url, params, timeout, cache_key)
+
+    lock_key = f"lock:{cache_key}"
+    error_key = f"error:{cache_key}"
+    token = await cache.acquire_lock(lock_key, settings.COALESCE_LOCK_TTL_MS)
+    if token is None:
+        result = await _wait_for_remote_leader(cache_key, lock_key, error_key)
+        if result is not None:
+            _remote_stats["remote_coalesced"] += 1
+            return result
+        _remote_stats["remote_timeout"] += 1
+        token = await cache.acquire_lock(lock_key, settings.COALESCE_LOCK_TTL_MS)
+
+    _remote_stats["remote_leader"] += 1
+    try:
+        return await _fetch_upstream(endpoint, url, params, timeout, cache_key)
+    except WeatherAPIError as exc:
+        # let waiters in other processes fail fast instead of timing out
+        ttl = max(1, settings.COALESCE_LOCK_TTL_MS // 1000)
+        await cache.set(error_key, {"error": str(exc)}, ttl=ttl)
+        raise
+    finally:
+        if token:
+            await cache.release_lock(lock_key, token)
+
+
+async def refresh_entry(endpoint: str, url: str, params: Dict[str, Any], timeout: int, cache_key: str) -> RawResult:
+    """Fetch `cache_key` from upstream and re-cache it, sharing any call already in flight."""
+    return await _flight.do(cache_key, lambda: _fetch_coalesced(endpoint, url, params, timeout, cache_key))
+
+
+def _schedule_refresh(endpoint: str, url: str, params: Dict[str, Any], timeout: int, cache_key: str) -> None:
+    """Refresh `cache_key` in the background; concurrent refreshes share the in-flight call."""
+    async def refresh() -> None:
+        try:
+            await refresh_entry(endpoint, url, params, timeout, cache_key)
+        except UpstreamUnavailable as exc:
+            logger.debug("Background refresh skipped for %s: %s", cache_key, exc)
+        except Exception as exc:
+            # the stale entry keeps being served until it physically expires
+            logger.warning("Background refresh failed for %s: %s", cache_key, exc)
+
+    task = asyncio.ensure_future(refresh())
+    _refresh_tasks.add(task)
+    task.add_done_callback(_refresh_tasks.discard)
 
+
+def _prepare_call(endpoint: str, params: Optional[Dict[str, Any]]) -> Tuple[str, str, Dict[str, Any], Optional[str]]:
+    """Return (endpoint, url, params with key, cache_key) for an upstream call."""
+    if not settings.WEATHER_BASE_URL:
+        raise ValueError("WEATHER_BASE_URL is not configured")
+    api_key = settings.WEATHER_API_KEY or next(iter(key_pool.keys), None)
+    if not api_key:
+        raise ValueError("WEATHER_API_KEY is not configured")
+
+    endpoint = _normalize_endpoint(endpoint)
+    url = f"{settings.WEATHER_BASE_URL.rstrip('/')}/{endpoint}"
+
+    params = dict(params or {})
+    # the key actually sent is picked per call from `key_pool` (see `_send`)
+    params["key"] = api_key
+
+    try:
+        cache_key = make_cache_key(endpoint, params)
+    except Exception:
+        cache_key = None
+    return endpoint, url, params, cache_key
+
+
+def make_cache_key(endpoint: str, params: Dict[str, Any]) -> str:
+    """Compact cache key: endpoint plus a hash of the (canonical) params, without the API key."""
+    key_parts = {k: v for k, v in params.items() if k != "key"}
+    digest = hashlib.blake2b(json.dumps(key_parts, sort_keys=True, separators=(",", ":")).encode("utf-8"), digest_size=16).hexdigest()
+    return f"weather:{endpoint}:{digest}"
+
+
+def _serve_cached(cached: Dict[str, Any], endpoint: str, url: str, params: Dict[str, Any], timeout: int, cache_key: str) -> Optional[RawResult]:
+    """The cached result (refreshing it in the background when stale); None when it has expired."""
+    state = cache_policy.entry_state(cached)
+    if state == cache_policy.EXPIRED:
+        return None
+    logger.info("Cache hit for %s (%s)", cache_key, state, extra={"event": "cache_hit", "api": _api_name(endpoint), "cache_state": state})
+    if state != cache_policy.FRESH and cache_key not in _flight:
+        _schedule_refresh(endpoint, url, params, timeout, cache_key)
+    return RawPayload.wrap(cached.get("data")), cached.get("meta")
+
+
+def _serve_fallback(cached: Dict[str, Any], cache_key: str, exc: WeatherAPIError) -> RawResult:
+    """Serve an expired entry because the upstream failed or is unavailable (stale-if-error)."""
+    logger.warning("Serving expired cache entry for %s: %s", cache_key, exc, extra={"event": "stale_fallback"})
+    return RawPayload.wrap(cached.get("data")), dict(cached.get("meta") or {}, stale=True)
+
+
+async def _fetch(endpoint: str, url: str, params: Dict[str, Any], timeout: int, cache_key: Optional[str]) -> RawResult:
+    if not cache_key or not settings.COALESCE_ENABLED:
+        return await _fetch_upstream(endpoint, url, params, timeout, cache_key)
+    return await _flight.do(cache_key, lambda: _fetch_coalesced(endpoint, url, params, timeout, cache_key))
+
+
+async def call_weather_api(endpoint: str, params: Optional[Dict[str, Any]] = None, timeout: Optional[int] = None) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Generic caller for WeatherAPI endpoints.
+    Returns a tuple of (json_result, meta) where meta contains status_code, duration_ms and request_url.
+    """
+    payload, meta = await call_weather_api_raw(endpoint, params, timeout)
+    return payload.data, meta
+
+
+async def call_weather_api_raw(endpoint: str, params: Optional[Dict[str, Any]] = None, timeout: Optional[int] = None) -> RawResult:
+    """
+    Like `call_weather_api` but returns the payload as a `RawPayload`, so the upstream
+    bytes can be passed to the cache, the DB and the response without re-encoding.
+
+    Concurrent calls for the same cache key are coalesced into a single upstream request.
+    Cached entries past their fresh TTL (or picked for early refresh) are returned
+    immediately while a background refresh runs (stale-while-revalidate). Expired
+    entries are only returned when the upstream call fails or is not attempted
+    (`UpstreamUnavailable`: circuit open or concurrency limit reached).
+    """
+    endpoint, url, params, cache_key = _prepare_call(endpoint, params)
+    to = timeout or settings.REQUEST_TIMEOUT
+    if cache_key:
+        record_access(endpoint, url, params, cache_key)
+
+    # attempt to use the cache (in-process, then Redis if configured)
+    expired = None
+    if cache_key:
+        try:
+            cached = await get_cache().get(cache_key)
+            if cached:
+                result = _serve_cached(cached, endpoint, url, params, to, cache_key)
+                if result is not None:
+                    return result
+                expired = cached
+        except Exception:
+            # ignore cache errors
+            cache_key = None
+
+    try:
+        return await _fetch(endpoint, url, params, to, cache_key)
+    except WeatherAPIError as exc:
+        if expired is None:
+            raise
+        return _serve_fallback(expired, cache_key, exc)
+
+
+def _build_params(api_name: str, q: Optional[str], extra: Optional[Dict[str, Any]]) -> Dict[str, Any]:
     params: Dict[str, Any] = {}
     if q:
         params["q"] = q
     if extra:
         params.update(extra)
+    if params.get("q"):
+        # one spelling per place, so equivalent queries share cache entries
+        params["q"] = locations.canonicalize(api_name, str(params["q"]))
+    return params
+
+
+async def fetch_api_by_name(api_name: str, q: Optional[str] = None, extra: Optional[Dict[str, Any]] = None) -> Tuple[Any, Dict[str, Any]]:
+    payload, meta = await fetch_api_by_name_raw(api_name, q, extra)
+    return payload.data, meta
+
+
+async def fetch_api_by_name_raw(api_name: str, q: Optional[str] = None, extra: Optional[Dict[str, Any]] = None) -> RawResult:
+    if api_name not in VALID_API_NAMES:
+        raise ValueError(f"Invalid api_name: {api_name}")
+
+    params = _build_params(api_name, q, extra)
+    result = await call_weather_api_raw(api_name, params)
+    if api_name == "search" and settings.LOCATION_ALIASES_ENABLED:
+        try:
+            locations.aliases.learn_from_search(params.get("q"), result[0].data)
+        except Exception as exc:
+            logger.warning("Could not learn location aliases: %s", exc)
+    return result
+
+
+async def _fetch_bulk_current(calls: List[Tuple[int, Dict[str, Any], Optional[str]]], timeout: int) -> Dict[int, Any]:
+    """Resolve many `current` lookups with WeatherAPI bulk requests (`q=bulk`).
+
+    Returns {index: (payload, meta) | WeatherAPIError}; the per-location payload has the
+    same shape as a single `current.json` response.
+    """
+    cache = get_cache()
+    url = f"{settings.WEATHER_BASE_URL.rstrip('/')}/current.json"
+    fresh_ttl = cache_policy.ttl_for("current")
+    results: Dict[int, Any] = {}
+    for chunk_start in range(0, len(calls), settings.WEATHER_BULK_SIZE):
+        chunk = calls[chunk_start:chunk_start + settings.WEATHER_BULK_SIZE]
+        body = {"locations": [{"q": params["q"], "custom_id": str(idx)} for idx, params, _ in chunk]}
+        try:
+            _admit("current")
+        except UpstreamUnavailable as exc:
+            for idx, _, _ in chunk:
+                results[idx] = exc
+            continue
+        start = time.time()
+        success: Optional[bool] = None
+        try:
+            # WeatherAPI counts every location of a bulk request against the key's quota
+            api_key = await _acquire_key(chunk[0][1]["key"], cost=len(chunk))
+            resp = await session.post(url, params={"key": api_key, "q": "bulk"}, json=body, timeout=timeout)
+            if resp.status_code == 429:
+                await key_pool.penalize(api_key, _retry_after(resp))
+            else:
+                key_pool.succeeded(api_key)
+            resp.raise_for_status()
+            payload = resp.json()
+            success = True
+        except UpstreamUnavailable as exc:
+            for idx, _, _ in chunk:
+                results[idx] = exc
+            continue
+        except (httpx.HTTPError, json.JSONDecodeError) as exc:
+            success = not _is_upstream_failure(exc)
+            logger.error("Weather API bulk request failed: %s", exc, extra={"event": "upstream_error", "api": "current", "locations": len(chunk)})
+            for idx, _, _ in chunk:
+                results[idx] = WeatherAPIError(str(exc))
+            continue
+        finally:
+            _settle("current", success, (time.time() - start) * 1000)
+        duration_ms = int((time.time() - start) * 1000)
+        logger.info(
+            "Weather API bulk call current.json locations=%s duration_ms=%s", len(chunk), duration_ms,
+            extra={"event": "upstream_bulk_call", "api": "current", "locations": len(chunk), "latency_ms": duration_ms},
+        )
+
+        keys = {idx: cache_key for idx, _, cache_key in chunk}
+        for item in payload.get("bulk", []):
+            query = item.get("query") or {}
+            try:
+                idx = int(query.get("custom_id"))
+            except (TypeError, ValueError):
+                continue
+            if "error" in query:
+                results[idx] = WeatherAPIError((query["error"] or {}).get("message", "bulk lookup failed"))
+                continue
+            data = RawPayload.from_data({"location": query.get("location"), "current": query.get("current")})
+            meta = {"status_code": resp.status_code, "duration_ms": duration_ms, "request_url": str(resp.url)}
+            results[idx] = (data, meta)
+            if keys.get(idx):
+                try:
+                    await cache.set(keys[idx], cache_policy.make_entry(data, meta, fresh_ttl), ttl=cache_policy.storage_ttl(fresh_ttl))
+                except Exception:
+                    pass
+        for idx, _, _ in chunk:
+            results.setdefault(idx, WeatherAPIError("missing from bulk response"))
+    return results
+
+
+async def fetch_many(items: List[Tuple[str, Optional[str], Optional[Dict[str, Any]]]], concurrency: Optional[int] = None, timeout: Optional[int] = None) -> List[Any]:
+    """Fetch many `(api_name, q, extra)` lookups.
+
+    Cache hits are resolved in bulk (one L2 round trip), misses are fetched
+    concurrently with at most `concurrency` upstream calls in flight; `current`
+    misses use WeatherAPI bulk requests when `WEATHER_BULK_ENABLED` is set.
+    Returns one entry per item, in order: `(payload, meta)` (payload is a `RawPayload`)
+    or the exception raised.
+    """
+    to = timeout or settings.REQUEST_TIMEOUT
+    results: List[Any] = [None] * len(items)
+    prepared: Dict[int, Tuple[str, str, Dict[str, Any], Optional[str]]] = {}
+    for idx, (api_name, q, extra) in enumerate(items):
+        try:
+            if api_name not in VALID_API_NAMES:
+                raise ValueError(f"Invalid api_name: {api_name}")
+            prepared[idx] = _prepare_call(api_name, _build_params(api_name, q, extra))
+            if prepared[idx][3]:
+                record_access(*prepared[idx])
+        except ValueError as exc:
+            results[idx] = exc
+
+    # bulk cache lookup
+    indexes = [idx for idx in prepared if prepared[idx][3]]
+    try:
+        cached_entries = await get_cache().get_many([prepared[idx][3] for idx in indexes])
+    except Exception:
+        cached_entries = [None] * len(indexes)
+    misses = [idx for idx in prepared if not prepared[idx][3]]
+    expired: Dict[int, Dict[str, Any]] = {}
+    for idx, cached in zip(indexes, cached_entries):
+        if cached:
+            endpoint, url, params, cache_key = prepared[idx]
+            results[idx] = _serve_cached(cached, endpoint, url, params, to, cache_key)
+            if results[idx] is not None:
+                continue
+            expired[idx] = cached
+        misses.append(idx)
+
+    bulk: List[Tuple[int, Dict[str, Any], Optional[str]]] = []
+    if settings.WEATHER_BULK_ENABLED:
+        for idx in misses:
+            endpoint, _, params, cache_key = prepared[idx]
+            # only plain `q` lookups map onto the bulk API
+            if endpoint == "current.json" and set(params) == {"q", "key"}:
+                bulk.append((idx, params, cache_key))
+    bulk_indexes = {idx for idx, _, _ in bulk}
+
+    sem = asyncio.Semaphore(concurrency or settings.BATCH_CONCURRENCY)
+
+    async def fetch_one(idx: int) -> None:
+        endpoint, url, params, cache_key = prepared[idx]
+        async with sem:
+            try:
+                results[idx] = await _fetch(endpoint, url, params, to, cache_key)
+            except Exception as exc:
+                results[idx] = exc
+
+    async def fetch_bulk() -> None:
+        if bulk:
+            async with sem:
+                results_by_idx = await _fetch_bulk_current(bulk, to)
+            for idx, value in results_by_idx.items():
+                results[idx] = value
 
-    return call_weather_api(api_name, params)
+    await asyncio.gather(fetch_bulk(), *(fetch_one(idx) for idx in misses if idx not in bulk_indexes))
+    for idx, cached in expired.items():
+        if isinstance(results[idx], WeatherAPIError):
+            results[idx] = _serve_fallback(cached, prepared[idx][3], results[idx])
+    return results
@@ -1,42 +1,327 @@
-import json
-from typing import Optional
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
 from app.config import settings
+from app.utils.cache_codec import CacheCodec, create_codec
 from app.utils.logger import logger
 
 
+# compare-and-delete so a lock is only released by the holder that set it
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
 class RedisCache:
-    def __init__(self):
+    def __init__(self, codec: Optional[CacheCodec] = None):
         self._client = None
+        self.codec = codec or create_codec()
+        self.errors = 0
         if settings.REDIS_URL:
             try:
-                import redis
-                self._client = redis.from_url(settings.REDIS_URL)
+                import redis.asyncio as aioredis
+                self._client = aioredis.from_url(settings.REDIS_URL)
             except Exception as exc:
                 logger.warning("Redis not available: %s", exc)
 
-    def get(self, key: str) -> Optional[dict]:
+    async def get(self, key: str) -> Optional[dict]:
         if not self._client:
             return None
         try:
-            raw = self._client.get(key)
+            raw = await self._client.get(key)
             if not raw:
                 return None
-            return json.loads(raw)
+            return self.codec.decode(raw)
         except Exception as exc:
+            self.errors += 1
             logger.warning("Redis get failed: %s", exc)
             return None
 
-    def set(self, key: str, value: dict, ttl: int = 30) -> None:
+    async def get_with_ttl(self, key: str) -> Tuple[Optional[dict], int, int]:
+        """Return (value, remaining ttl seconds, encoded size) in a single round trip."""
+        if not self._client:
+            return None, 0, 0
+        try:
+            pipe = self._client.pipeline(transaction=False)
+            pipe.get(key)
+            pipe.pttl(key)
+            raw, pttl = await pipe.execute()
+            if not raw:
+                return None, 0, 0
+            value, size = self.codec.decode_sized(raw)
+            return value, max(0, int(pttl or 0)) // 1000, size
+        except Exception as exc:
+            self.errors += 1
+            logger.warning("Redis get failed: %s", exc)
+            return None, 0, 0
+
+    async def get_many_with_ttl(self, keys: List[str]) -> List[Tuple[Optional[dict], int, int]]:
+        """Like `get_with_ttl` for many keys, pipelined into one round trip."""
+        if not self._client or not keys:
+            return [(None, 0, 0)] * len(keys)
+        try:
+            pipe = self._client.pipeline(transaction=False)
+            pipe.mget(keys)
+            for key in keys:
+                pipe.pttl(key)
+            replies = await pipe.execute()
+        except Exception as exc:
+            self.errors += 1
+            logger.warning("Redis mget failed: %s", exc)
+            return [(None, 0, 0)] * len(keys)
+        results: List[Tuple[Optional[dict], int, int]] = []
+        for raw, pttl in zip(replies[0], replies[1:]):
+            if not raw:
+                results.append((None, 0, 0))
+                continue
+            try:
+                value, size = self.codec.decode_sized(raw)
+                results.append((value, max(0, int(pttl or 0)) // 1000, size))
+            except Exception as exc:
+                self.errors += 1
+                logger.warning("Could not decode cache entry: %s", exc)
+                results.append((None, 0, 0))
+        return results
+
+    async def set(self, key: str, value: dict, ttl: int = 30) -> None:
+        if not self._client:
+            return
+        await self.set_raw(key, self.codec.encode(value), ttl=ttl)
+
+    async def set_raw(self, key: str, raw: bytes, ttl: int = 30) -> None:
+        """Store an already encoded value (see `CacheCodec.pack`)."""
         if not self._client:
             return
         try:
-            self._client.set(key, json.dumps(value), ex=ttl)
+            await self._client.set(key, raw, ex=ttl)
         except Exception as exc:
+            self.errors += 1
             logger.warning("Redis set failed: %s", exc)
 
+    @property
+    def enabled(self) -> bool:
+        return self._client is not None
+
+    async def acquire_lock(self, name: str, ttl_ms: int) -> Optional[str]:
+        """Try to take a short-lived lock; return its token, or None if another holder has it.
+
+        Fails open: when Redis errors, a token is still returned so the caller proceeds.
+        """
+        token = uuid.uuid4().hex
+        if not self._client:
+            return token
+        try:
+            if await self._client.set(name, token, nx=True, px=ttl_ms):
+                return token
+            return None
+        except Exception as exc:
+            logger.warning("Redis lock acquire failed: %s", exc)
+            return token
+
+    async def release_lock(self, name: str, token: str) -> None:
+        if not self._client:
+            return
+        try:
+            await self._client.eval(_RELEASE_LOCK_SCRIPT, 1, name, token)
+        except Exception as exc:
+            logger.warning("Redis lock release failed: %s", exc)
+
+    async def exists(self, key: str) -> bool:
+        if not self._client:
+            return False
+        try:
+            return bool(await self._client.exists(key))
+        except Exception as exc:
+            logger.warning("Redis exists failed: %s", exc)
+            return False
+
+
+class LocalCache:
+    """In-process LRU cache with per-entry TTL and an entry/byte budget.
+
+    Values are stored as the decoded objects, so a hit costs no network round
+    trip and no `json.loads`. Callers must treat returned values as read-only.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires_at, size, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self._bytes -= size
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key: str) -> Optional[Any]:
+        """Like `get` but without touching LRU order or hit/miss counters."""
+        with self._lock:
+            item = self._data.get(key)
+        if item is None or item[0] <= time.monotonic():
+            return None
+        return item[2]
+
+    def set(self, key: str, value: Any, ttl: int, size: int) -> None:
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._data[key] = (time.monotonic() + ttl, size, value)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class TieredCache:
+    """L1 `LocalCache` in front of L2 `RedisCache`.
+
+    Sets write through to both tiers; L2 hits are promoted into L1 for the
+    remaining Redis TTL. Without `REDIS_URL` only L1 is used. L1 is plain
+    in-process state; everything that may reach Redis is a coroutine (the
+    client is `redis.asyncio`), so a slow Redis never blocks the event loop.
+    """
+
+    def __init__(self, local: Optional[LocalCache], remote: RedisCache):
+        self.local = local
+        self.remote = remote
+        self.remote_hits = 0
+        self.remote_misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        # distributed features (locks) need the shared tier
+        return self.remote.enabled
+
+    async def get(self, key: str) -> Optional[dict]:
+        if self.local is not None:
+            value = self.local.get(key)
+            if value is not None:
+                return value
+        if not self.remote.enabled:
+            return None
+        value, ttl, size = await self.remote.get_with_ttl(key)
+        if value is None:
+            self.remote_misses += 1
+            return None
+        self.remote_hits += 1
+        if self.local is not None:
+            self.local.set(key, value, ttl=ttl, size=size)
+        return value
+
+    async def get_shared(self, key: str) -> Optional[dict]:
+        """Read `key` from Redis only (what other processes see), replacing the L1 copy on a hit."""
+        if not self.remote.enabled:
+            return None
+        value, ttl, size = await self.remote.get_with_ttl(key)
+        if value is not None and self.local is not None:
+            self.local.set(key, value, ttl=ttl, size=size)
+        return value
+
+    async def peek(self, key: str) -> Optional[dict]:
+        """Look a key up for housekeeping (e.g. pre-warming): no stats, no L1 promotion."""
+        if self.local is not None:
+            value = self.local.peek(key)
+            if value is not None:
+                return value
+        return await self.remote.get(key) if self.remote.enabled else None
+
+    async def get_many(self, keys: List[str]) -> List[Optional[dict]]:
+        """Bulk `get`: L1 first, remaining keys from Redis in one pipelined MGET."""
+        results: List[Optional[dict]] = [None] * len(keys)
+        pending: List[int] = []
+        for i, key in enumerate(keys):
+            value = self.local.get(key) if self.local is not None else None
+            if value is not None:
+                results[i] = value
+            else:
+                pending.append(i)
+        if not pending or not self.remote.enabled:
+            return results
+        fetched = await self.remote.get_many_with_ttl([keys[i] for i in pending])
+        for i, (value, ttl, size) in zip(pending, fetched):
+            if value is None:
+                self.remote_misses += 1
+                continue
+            self.remote_hits += 1
+            results[i] = value
+            if self.local is not None:
+                self.local.set(keys[i], value, ttl=ttl, size=size)
+        return results
+
+    async def set(self, key: str, value: dict, ttl: int = 30) -> None:
+        # serialize once: the body sizes the L1 entry and is packed for Redis
+        serialized = self.remote.codec.dumps(value)
+        if self.local is not None:
+            self.local.set(key, value, ttl=ttl, size=len(serialized[1]))
+        if self.remote.enabled:
+            await self.remote.set_raw(key, self.remote.codec.pack(serialized), ttl=ttl)
+
+    async def acquire_lock(self, name: str, ttl_ms: int) -> Optional[str]:
+        return await self.remote.acquire_lock(name, ttl_ms)
+
+    async def release_lock(self, name: str, token: str) -> None:
+        await self.remote.release_lock(name, token)
+
+    async def exists(self, key: str) -> bool:
+        return await self.remote.exists(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "l1": self.local.stats() if self.local is not None else None,
+            "l2": {"enabled": self.remote.enabled, "hits": self.remote_hits, "misses": self.remote_misses, "errors": self.remote.errors},
+            "codec": self.remote.codec.stats(),
+        }
+
 
 _cache = RedisCache()
+_local_cache = LocalCache(settings.LOCAL_CACHE_MAX_ENTRIES, settings.LOCAL_CACHE_MAX_BYTES) if settings.LOCAL_CACHE_ENABLED else None
+_tiered_cache = TieredCache(_local_cache, _cache)
 
 
 def get_cache():
-    return _cache
+    return _tiered_cache
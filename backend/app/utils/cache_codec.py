@@ -0,0 +1,160 @@
+"""Binary encoding for cache values stored in Redis.
+
+Encoded values start with a 4-byte header::
+
+    MAGIC (0xFF) | version | serializer id | compression id
+
+followed by the (optionally compressed) body. 0xFF never starts a JSON
+document, so entries written before the header existed (plain `json.dumps`
+text) are still decoded.
+
+Serializers: ``json`` (uses `orjson` when installed) and ``msgpack``. Entries
+whose ``data`` is a `RawPayload` use the ``raw`` layout instead: a length-prefixed
+JSON head (meta, freshness) followed by the upstream bytes, untouched.
+Compression: ``none``, ``zlib`` and ``zstd`` (needs `zstandard`), applied only
+to bodies of at least `CACHE_COMPRESS_MIN_BYTES`.
+"""
+
+import json
+import struct
+import time
+import zlib
+from typing import Any, Dict, Tuple
+
+from app.config import settings
+from app.utils.logger import logger
+from app.utils.raw_json import RawPayload, json_dumps, json_loads
+
+MAGIC = 0xFF
+VERSION = 1
+
+SERIALIZERS = {"json": 1, "msgpack": 2, "raw": 3}
+_HEAD_LEN = struct.Struct(">I")
+COMPRESSIONS = {"none": 0, "zlib": 1, "zstd": 2}
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class CacheCodec:
+    def __init__(self, serializer: str = "json", compression: str = "zlib", min_bytes: int = 1024, level: int = 3):
+        if serializer not in ("json", "msgpack"):
+            raise ValueError(f"Unknown cache serializer: {serializer}")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown cache compression: {compression}")
+        if serializer == "msgpack" and msgpack is None:
+            logger.warning("msgpack not installed; cache falling back to JSON encoding")
+            serializer = "json"
+        if compression == "zstd" and zstandard is None:
+            logger.warning("zstandard not installed; cache falling back to zlib compression")
+            compression = "zlib"
+        self.serializer = serializer
+        self.compression = compression
+        self.min_bytes = min_bytes
+        self.level = level
+        self._zstd_c = zstandard.ZstdCompressor(level=level) if compression == "zstd" else None
+        self._zstd_d = zstandard.ZstdDecompressor() if zstandard is not None else None
+
+        self.encoded = 0
+        self.decoded = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        self.encode_ns = 0
+        self.decode_ns = 0
+
+    def dumps(self, value: Any) -> Tuple[int, bytes]:
+        """Serialize without header or compression; returns (serializer id, body)."""
+        if isinstance(value, dict) and isinstance(value.get("data"), RawPayload):
+            head = json_dumps({k: v for k, v in value.items() if k != "data"})
+            return SERIALIZERS["raw"], _HEAD_LEN.pack(len(head)) + head + value["data"].raw
+        if self.serializer == "msgpack":
+            return SERIALIZERS["msgpack"], msgpack.packb(value, use_bin_type=True)
+        return SERIALIZERS["json"], json_dumps(value)
+
+    def pack(self, serialized: Tuple[int, bytes]) -> bytes:
+        """Add the header and compress a body produced by `dumps`."""
+        start = time.perf_counter_ns()
+        serializer_id, body = serialized
+        compression = self.compression if len(body) >= self.min_bytes else "none"
+        if compression == "zlib":
+            body_out = zlib.compress(body, self.level)
+        elif compression == "zstd":
+            body_out = self._zstd_c.compress(body)
+        else:
+            body_out = body
+        out = bytes((MAGIC, VERSION, serializer_id, COMPRESSIONS[compression])) + body_out
+        self.encoded += 1
+        self.raw_bytes += len(body)
+        self.stored_bytes += len(out)
+        self.encode_ns += time.perf_counter_ns() - start
+        return out
+
+    def encode(self, value: Any) -> bytes:
+        return self.pack(self.dumps(value))
+
+    def decode(self, raw: Any) -> Any:
+        return self.decode_sized(raw)[0]
+
+    def decode_sized(self, raw: Any) -> Tuple[Any, int]:
+        """Decode `raw`; also return the uncompressed body size (used to size L1 entries)."""
+        start = time.perf_counter_ns()
+        if isinstance(raw, str):
+            raw = raw.encode("utf-8")
+        if not raw or raw[0] != MAGIC:
+            # legacy entry: plain JSON text
+            body = raw
+            value = json.loads(raw)
+        else:
+            version, serializer_id, compression_id = raw[1], raw[2], raw[3]
+            if version != VERSION:
+                raise ValueError(f"Unsupported cache entry version: {version}")
+            body = raw[4:]
+            if compression_id == COMPRESSIONS["zlib"]:
+                body = zlib.decompress(body)
+            elif compression_id == COMPRESSIONS["zstd"]:
+                if self._zstd_d is None:
+                    raise ValueError("zstd-compressed cache entry but zstandard is not installed")
+                body = self._zstd_d.decompress(body)
+            if serializer_id == SERIALIZERS["raw"]:
+                (head_len,) = _HEAD_LEN.unpack_from(body)
+                value = json_loads(body[_HEAD_LEN.size:_HEAD_LEN.size + head_len])
+                value["data"] = RawPayload(bytes(body[_HEAD_LEN.size + head_len:]))
+            elif serializer_id == SERIALIZERS["msgpack"]:
+                if msgpack is None:
+                    raise ValueError("msgpack cache entry but msgpack is not installed")
+                value = msgpack.unpackb(body, raw=False)
+            else:
+                value = json_loads(body)
+        self.decoded += 1
+        self.decode_ns += time.perf_counter_ns() - start
+        return value, len(body)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "serializer": self.serializer,
+            "compression": self.compression,
+            "encoded": self.encoded,
+            "decoded": self.decoded,
+            "raw_bytes": self.raw_bytes,
+            "stored_bytes": self.stored_bytes,
+            "compression_ratio": round(self.raw_bytes / self.stored_bytes, 3) if self.stored_bytes else None,
+            "avg_encode_us": round(self.encode_ns / self.encoded / 1000, 2) if self.encoded else 0.0,
+            "avg_decode_us": round(self.decode_ns / self.decoded / 1000, 2) if self.decoded else 0.0,
+        }
+
+
+def create_codec() -> CacheCodec:
+    """Build a codec from the `CACHE_SERIALIZER` / `CACHE_COMPRESSION*` settings."""
+    return CacheCodec(
+        serializer=settings.CACHE_SERIALIZER,
+        compression=settings.CACHE_COMPRESSION,
+        min_bytes=settings.CACHE_COMPRESS_MIN_BYTES,
+        level=settings.CACHE_COMPRESSION_LEVEL,
+    )
@@ -0,0 +1,112 @@
+"""Per-API cache TTL policy and freshness checks.
+
+Cache entries are stored as `{"data", "meta", "fresh_until", "delta"}`. An entry
+is served as-is until `fresh_until`, then served stale (while a background
+refresh runs) for `CACHE_STALE_TTL` more seconds. After that it is expired: the
+caller fetches synchronously, and only falls back to the entry when the upstream
+fails or its circuit is open, until the physical TTL (`fresh ttl +
+CACHE_STALE_TTL + CACHE_STALE_IF_ERROR_TTL`) removes it.
+Refreshes may also start slightly before `fresh_until` using probabilistic early
+expiration (XFetch), so hot keys do not all expire at the same instant.
+"""
+
+import math
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from app.config import settings
+
+FRESH = "fresh"
+REFRESH = "refresh"  # still fresh, but picked for an early background refresh
+STALE = "stale"
+EXPIRED = "expired"  # past the stale window: only usable as a fallback on upstream errors
+
+# seconds; `current` follows CACHE_TTL
+DEFAULT_TTLS: Dict[str, int] = {
+    "forecast": 600,
+    "future": 6 * 3600,
+    "history": 3600,
+    "marine": 1800,
+    "search": 24 * 3600,
+    "ip": 3600,
+    "timezone": 24 * 3600,
+    "astronomy": 6 * 3600,
+}
+
+# APIs whose answer for a date that has fully passed never changes
+DATED_IMMUTABLE_APIS = {"history", "astronomy"}
+
+
+def _parse_overrides(raw: str) -> Dict[str, int]:
+    overrides: Dict[str, int] = {}
+    for item in (raw or "").split(","):
+        if "=" not in item:
+            continue
+        name, _, value = item.partition("=")
+        try:
+            overrides[name.strip()] = int(value)
+        except ValueError:
+            continue
+    return overrides
+
+
+_overrides = _parse_overrides(settings.CACHE_TTL_OVERRIDES)
+
+
+def _is_past_date(dt: Any) -> bool:
+    try:
+        day = datetime.strptime(str(dt), "%Y-%m-%d").date()
+    except ValueError:
+        return False
+    # a calendar day has ended in every timezone once UTC is a full day past it
+    return day < datetime.now(timezone.utc).date() - timedelta(days=1)
+
+
+def ttl_for(api_name: str, params: Optional[Dict[str, Any]] = None) -> Optional[int]:
+    """Fresh TTL in seconds for `api_name`; None means the result is immutable."""
+    params = params or {}
+    if api_name in DATED_IMMUTABLE_APIS and params.get("dt") and _is_past_date(params["dt"]):
+        return None
+    if api_name in _overrides:
+        return _overrides[api_name]
+    if api_name == "current":
+        return settings.CACHE_TTL
+    return DEFAULT_TTLS.get(api_name, settings.CACHE_TTL)
+
+
+def storage_ttl(fresh_ttl: Optional[int]) -> int:
+    """Physical TTL for the cache backend: fresh period plus the stale-while-revalidate and stale-if-error windows."""
+    if fresh_ttl is None:
+        return settings.CACHE_IMMUTABLE_TTL
+    return fresh_ttl + settings.CACHE_STALE_TTL + settings.CACHE_STALE_IF_ERROR_TTL
+
+
+def make_entry(data: Any, meta: Dict[str, Any], fresh_ttl: Optional[int]) -> Dict[str, Any]:
+    return {
+        "data": data,
+        "meta": meta,
+        "fresh_until": None if fresh_ttl is None else time.time() + fresh_ttl,
+        # recompute cost in seconds, scales the early-refresh window
+        "delta": max((meta.get("duration_ms") or 0) / 1000.0, 0.001),
+    }
+
+
+def entry_state(entry: Dict[str, Any], now: Optional[float] = None, beta: Optional[float] = None) -> str:
+    fresh_until = entry.get("fresh_until")
+    if fresh_until is None:
+        # immutable, or written before the policy existed
+        return FRESH
+    now = time.time() if now is None else now
+    if now >= fresh_until + settings.CACHE_STALE_TTL:
+        return EXPIRED
+    if now >= fresh_until:
+        return STALE
+    beta = settings.CACHE_EARLY_REFRESH_BETA if beta is None else beta
+    if beta > 0:
+        delta = entry.get("delta") or 0.001
+        # XFetch: now - delta * beta * ln(U) >= expiry, U ~ (0, 1]
+        if now - delta * beta * math.log(1.0 - random.random()) >= fresh_until:
+            return REFRESH
+    return FRESH
@@ -0,0 +1,187 @@
+"""Hedged requests: send a second copy of a slow call and keep whichever answers first.
+
+`Hedger` keeps the latencies of the last `window` calls per API. Once at
+least `min_samples` were seen, a call still outstanding after their
+`percentile` (and at least `min_delay_ms`) gets a second, identical attempt;
+the first attempt to finish without raising wins and the other is cancelled.
+With the 95th percentile only about one call in twenty is a candidate, and
+those are exactly the ones stuck in the tail.
+
+Hedges are paid for from a budget: every call earns `budget` tokens (held up
+to `burst`) and every hedge spends one, so hedges stay under roughly
+`budget` x calls. When the whole upstream slows down, most calls become
+candidates and the budget, not the delay, keeps the extra load bounded.
+
+Only the first attempt's latency is recorded. When it loses, the time until
+it was cancelled is recorded instead: a lower bound, but one above the hedge
+delay, which is all the percentile needs.
+
+An attempt that raises does not win, so callers should make error answers
+raise: otherwise a fast 5xx beats a slower 200.
+"""
+
+import asyncio
+import math
+import time
+from collections import Counter, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, TypeVar
+
+from app.utils.metrics import UPSTREAM_HEDGES
+
+T = TypeVar("T")
+
+
+class LatencyWindow:
+    """The last `size` latencies (ms) with a percentile re-sorted every `size // 20` samples."""
+
+    def __init__(self, size: int = 1000):
+        self._samples: Deque[float] = deque(maxlen=max(1, size))
+        self._sorted: List[float] = []
+        self._added = 0
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, latency_ms: float) -> None:
+        self._samples.append(latency_ms)
+        self._added += 1
+
+    def percentile(self, pct: float) -> float:
+        if not self._samples:
+            return 0.0
+        if not self._sorted or self._added >= max(1, self._samples.maxlen // 20):
+            self._sorted = sorted(self._samples)
+            self._added = 0
+        # nearest rank
+        rank = min(len(self._sorted), max(1, math.ceil(pct / 100.0 * len(self._sorted))))
+        return self._sorted[rank - 1]
+
+
+class Hedger:
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        min_delay_ms: float = 50.0,
+        min_samples: int = 50,
+        window: int = 1000,
+        budget: float = 0.05,
+        burst: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.percentile = percentile
+        self.min_delay_ms = min_delay_ms
+        self.min_samples = min_samples
+        self.window = window
+        self.budget = budget
+        self.burst = max(1.0, burst)
+        self._clock = clock
+        self._tokens = 0.0
+        self._latencies: Dict[str, LatencyWindow] = {}
+        self._counts: Dict[str, Counter] = {}
+
+    def _window(self, api: str) -> LatencyWindow:
+        latencies = self._latencies.get(api)
+        if latencies is None:
+            latencies = self._latencies[api] = LatencyWindow(self.window)
+        return latencies
+
+    def record(self, api: str, latency_ms: float) -> None:
+        self._window(api).add(latency_ms)
+
+    def delay(self, api: str) -> Optional[float]:
+        """Seconds to wait before hedging a call to `api`; None while there are too few samples."""
+        latencies = self._window(api)
+        if len(latencies) < self.min_samples:
+            return None
+        return max(self.min_delay_ms, latencies.percentile(self.percentile)) / 1000.0
+
+    def _count(self, api: str, event: str) -> None:
+        self._counts.setdefault(api, Counter())[event] += 1
+        UPSTREAM_HEDGES.inc(api, event)
+
+    async def _timed(self, api: str, attempt: Callable[[], Awaitable[T]]) -> T:
+        start = self._clock()
+        try:
+            result = await attempt()
+        except asyncio.CancelledError:
+            self.record(api, (self._clock() - start) * 1000)
+            raise
+        self.record(api, (self._clock() - start) * 1000)
+        return result
+
+    async def run(
+        self,
+        api: str,
+        attempt: Callable[[], Awaitable[T]],
+        admit: Optional[Callable[[], Awaitable[Optional[Callable[[], Awaitable[T]]]]]] = None,
+        discard: Optional[Callable[[T], Awaitable[None]]] = None,
+    ) -> T:
+        """Await `attempt()`, hedging it with a second attempt when it is slow.
+
+        An attempt counts as answered only if it returns; one that raises (e.g.
+        on an error status) leaves the other one running. `admit` is awaited
+        right before hedging and returns the attempt to send as the hedge, or
+        None to skip it (e.g. no concurrency slot free); a hedge it refuses does
+        not spend budget. Without `admit`, `attempt` is sent again. `discard`
+        releases the result of an attempt that finished but lost (e.g. closes
+        its response).
+        """
+        self._tokens = min(self.burst, self._tokens + self.budget)
+        delay = self.delay(api)
+        if delay is None:
+            return await self._timed(api, attempt)
+
+        primary = asyncio.ensure_future(self._timed(api, attempt))
+        tasks = [primary]
+        winner = None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return primary.result()
+            hedge = None
+            if self._tokens >= 1:
+                hedge = await admit() if admit is not None else attempt
+            if hedge is None:
+                self._count(api, "skipped")
+                return await primary
+            self._tokens -= 1
+            self._count(api, "sent")
+            # an admitted hedge is always started, so it can give back what admitting it took
+            tasks.append(asyncio.ensure_future(hedge()))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # the first attempt wins ties; a failed attempt leaves the other one running
+                for task in tasks:
+                    if task in done and task.exception() is None:
+                        winner = task
+                        self._count(api, "lost" if task is primary else "won")
+                        return task.result()
+            self._count(api, "failed")
+            return primary.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif task.cancelled():
+                    continue
+                elif task.exception() is None:  # the losing attempt's error is not worth a warning
+                    if task is not winner and discard is not None:
+                        await discard(task.result())
+
+    def stats(self) -> Dict[str, Any]:
+        apis = {}
+        for api in sorted(self._latencies):
+            delay = self.delay(api)
+            counts = self._counts.get(api, Counter())
+            apis[api] = {
+                "samples": len(self._latencies[api]),
+                "delay_ms": None if delay is None else round(delay * 1000, 1),
+                **{event: counts[event] for event in ("sent", "won", "lost", "failed", "skipped")},
+            }
+        return {"budget_tokens": round(self._tokens, 2), "apis": apis}
+
+    def reset(self) -> None:
+        self._tokens = 0.0
+        self._latencies.clear()
+        self._counts.clear()
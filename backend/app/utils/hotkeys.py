@@ -0,0 +1,109 @@
+"""Approximate access-frequency tracking for cache keys.
+
+`HotKeyTracker` counts accesses with a count-min sketch (fixed memory, never
+under-counts) and keeps the `k` keys with the highest estimates together with
+a caller-supplied value (e.g. how to refresh the key). `decay()` halves every
+counter so the ranking follows recent traffic. Finding the entry to evict is
+O(log k) amortized (a heap over the top-k estimates).
+
+Not thread-safe: it is updated from the event loop only.
+"""
+
+import heapq
+import itertools
+import random
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+
+class CountMinSketch:
+    def __init__(self, width: int = 4096, depth: int = 4, seed: Optional[int] = None):
+        self.width = width
+        self.depth = depth
+        rng = random.Random(seed)
+        self._salts = [rng.getrandbits(32) for _ in range(depth)]
+        self._rows = [[0] * width for _ in range(depth)]
+
+    def _cells(self, key: Hashable) -> List[int]:
+        return [hash((salt, key)) % self.width for salt in self._salts]
+
+    def add(self, key: Hashable, count: int = 1) -> int:
+        """Add `count` (conservative update) and return the new estimate."""
+        cells = self._cells(key)
+        estimate = min(row[c] for row, c in zip(self._rows, cells)) + count
+        for row, c in zip(self._rows, cells):
+            if row[c] < estimate:
+                row[c] = estimate
+        return estimate
+
+    def estimate(self, key: Hashable) -> int:
+        return min(row[c] for row, c in zip(self._rows, self._cells(key)))
+
+    def decay(self) -> None:
+        for row in self._rows:
+            for i, value in enumerate(row):
+                if value:
+                    row[i] = value >> 1
+
+
+class HotKeyTracker:
+    def __init__(self, k: int = 500, width: int = 4096, depth: int = 4):
+        self.k = k
+        self.sketch = CountMinSketch(width, depth)
+        # key -> [estimate, value]
+        self._top: Dict[Hashable, List[Any]] = {}
+        # one (estimate, seq, key) per tracked key, a min-heap on the estimate. Estimates
+        # only grow between decays, so an entry may lag behind `_top`; `_min_key` bumps
+        # lagging entries lazily instead of re-pushing on every access.
+        self._heap: List[Tuple[int, int, Hashable]] = []
+        self._seq = itertools.count()
+        self.accesses = 0
+
+    def _min_key(self) -> Hashable:
+        heap = self._heap
+        while True:
+            estimate, _, key = heap[0]
+            current = self._top[key][0]
+            if current == estimate:
+                return key
+            heapq.heapreplace(heap, (current, next(self._seq), key))
+
+    def record(self, key: Hashable, value: Any = None) -> int:
+        """Count one access to `key`; `value` is kept while the key is in the top-k."""
+        self.accesses += 1
+        estimate = self.sketch.add(key)
+        entry = self._top.get(key)
+        if entry is not None:
+            entry[0] = estimate
+            entry[1] = value
+            return estimate
+        if len(self._top) < self.k:
+            self._top[key] = [estimate, value]
+            heapq.heappush(self._heap, (estimate, next(self._seq), key))
+            return estimate
+        if not self._heap:
+            return estimate
+        min_key = self._min_key()
+        if estimate > self._top[min_key][0]:
+            # the min key's entry is at the top of the heap
+            heapq.heapreplace(self._heap, (estimate, next(self._seq), key))
+            del self._top[min_key]
+            self._top[key] = [estimate, value]
+        return estimate
+
+    def top(self, n: Optional[int] = None, min_count: int = 1) -> List[Tuple[Hashable, int, Any]]:
+        """(key, estimate, value) for the hottest keys, highest first."""
+        ranked = sorted(((key, e[0], e[1]) for key, e in self._top.items() if e[0] >= min_count), key=lambda t: t[1], reverse=True)
+        return ranked[:n] if n is not None else ranked
+
+    def decay(self) -> None:
+        self.sketch.decay()
+        for key in list(self._top):
+            entry = self._top[key]
+            entry[0] >>= 1
+            if not entry[0]:
+                del self._top[key]
+        self._heap = [(e[0], next(self._seq), key) for key, e in self._top.items()]
+        heapq.heapify(self._heap)
+
+    def __len__(self) -> int:
+        return len(self._top)
@@ -0,0 +1,138 @@
+"""Shared async HTTP client for upstream calls.
+
+`AsyncUpstreamSession` wraps a single `httpx.AsyncClient` (keep-alive pool,
+HTTP/2 when `h2` is installed) and applies the retry policy of the old
+`requests` adapter, `Retry(total=2, backoff_factor=0.5,
+status_forcelist=(429, 500, 502, 503, 504))`, except for 429: unlike the old
+adapter, 429s are not retried here. Retrying with the same key only spends
+more of its quota, so they are returned to the caller, which rests the key
+and moves on to another (see app/utils/rate_limit.py).
+"""
+
+import asyncio
+from typing import Any, Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.config import settings
+from app.utils.logger import logger
+
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+# urllib3 caps backoff sleeps at 120s; keep the same ceiling
+BACKOFF_MAX = 120.0
+
+
+class AsyncUpstreamSession:
+    def __init__(
+        self,
+        pool_size: int = 100,
+        keepalive: int = 20,
+        keepalive_expiry: float = 30.0,
+        max_per_host: int = 100,
+        http2: bool = True,
+        retries: int = 2,
+        backoff_factor: float = 0.5,
+        status_forcelist: Iterable[int] = RETRY_STATUS_CODES,
+    ):
+        self._pool_size = pool_size
+        self._keepalive = keepalive
+        self._keepalive_expiry = keepalive_expiry
+        self._max_per_host = max_per_host
+        self._http2 = http2
+        self._retries = retries
+        self._backoff_factor = backoff_factor
+        self._status_forcelist = frozenset(status_forcelist)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            http2 = self._http2
+            if http2:
+                try:
+                    import h2  # noqa: F401
+                except ImportError:
+                    logger.warning("h2 not installed; upstream client falling back to HTTP/1.1")
+                    http2 = False
+            self._client = httpx.AsyncClient(
+                http2=http2,
+                limits=httpx.Limits(
+                    max_connections=self._pool_size,
+                    max_keepalive_connections=self._keepalive,
+                    keepalive_expiry=self._keepalive_expiry,
+                ),
+            )
+        return self._client
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        sem = self._host_limits.get(host)
+        if sem is None:
+            sem = self._host_limits[host] = asyncio.Semaphore(self._max_per_host)
+        return sem
+
+    def _backoff(self, attempt: int, resp: Optional[httpx.Response] = None) -> float:
+        # honour Retry-After on 429/503 like urllib3 does
+        if resp is not None and resp.status_code in (429, 503):
+            retry_after = resp.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), BACKOFF_MAX)
+        # urllib3 semantics: no sleep before the first retry, then factor * 2^(n-1)
+        if attempt <= 1:
+            return 0.0
+        return min(self._backoff_factor * (2 ** (attempt - 1)), BACKOFF_MAX)
+
+    async def get(self, url: str, params: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None) -> httpx.Response:
+        """GET `url` with retries on transport errors and retryable status codes.
+
+        Once retries are exhausted the last response is returned (callers use
+        `raise_for_status()`), or the last transport error is raised.
+        """
+        return await self.request("GET", url, params=params, timeout=timeout)
+
+    async def post(self, url: str, params: Optional[Dict[str, Any]] = None, json: Any = None, timeout: Optional[float] = None) -> httpx.Response:
+        """POST with the same retry policy; only use it for idempotent upstream calls (e.g. bulk lookups)."""
+        return await self.request("POST", url, params=params, json=json, timeout=timeout)
+
+    async def request(self, method: str, url: str, params: Optional[Dict[str, Any]] = None, json: Any = None, timeout: Optional[float] = None) -> httpx.Response:
+        client = self._get_client()
+        to = timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+        sem = self._host_semaphore(url)
+        attempt = 0
+        while True:
+            try:
+                async with sem:
+                    resp = await client.request(method, url, params=params, json=json, timeout=to)
+            except httpx.TransportError:
+                attempt += 1
+                if attempt > self._retries:
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+
+            if resp.status_code in self._status_forcelist and attempt < self._retries:
+                attempt += 1
+                await resp.aclose()
+                await asyncio.sleep(self._backoff(attempt, resp))
+                continue
+            return resp
+
+    async def aclose(self) -> None:
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+        self._host_limits.clear()
+
+
+def create_upstream_session() -> AsyncUpstreamSession:
+    """Build a session from the `UPSTREAM_*` settings."""
+    return AsyncUpstreamSession(
+        pool_size=settings.UPSTREAM_POOL_SIZE,
+        keepalive=settings.UPSTREAM_KEEPALIVE,
+        keepalive_expiry=settings.UPSTREAM_KEEPALIVE_EXPIRY,
+        max_per_host=settings.UPSTREAM_MAX_PER_HOST,
+        http2=settings.UPSTREAM_HTTP2,
+        retries=settings.UPSTREAM_RETRIES,
+        backoff_factor=settings.UPSTREAM_BACKOFF_FACTOR,
+    )
@@ -0,0 +1,100 @@
+"""Canonical location queries.
+
+Different spellings of the same place ("Delhi", " delhi ", "DELHI",
+"28.6139,77.2090" vs "28.61,77.21") used to be fetched and cached separately.
+`normalize_location` folds whitespace and case and rounds coordinates to
+`LOCATION_COORD_PRECISION` decimals; `canonicalize` additionally maps names
+learned from `search` results to WeatherAPI location ids (``id:<id>``), so
+"delhi" and "delhi, delhi, india" share one cache entry.
+"""
+
+import re
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+
+_COORDS = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$")
+_COMMA = re.compile(r"\s*,\s*")
+# the lookup itself, or the caller's own address: aliases don't apply
+_NO_ALIAS_APIS = {"search", "ip"}
+
+
+def _round(value: float, precision: int) -> str:
+    text = f"{round(value, precision):.{precision}f}"
+    # "-0.00" and "0.00" are the same place
+    return text.lstrip("-") if float(text) == 0 else text
+
+
+def normalize_location(q: Optional[str], precision: Optional[int] = None) -> Optional[str]:
+    """Fold whitespace/case and round `lat,lon` pairs; None and "" pass through."""
+    if not q:
+        return q
+    match = _COORDS.match(q)
+    if match:
+        lat, lon = float(match.group(1)), float(match.group(2))
+        if -90 <= lat <= 90 and -180 <= lon <= 180:
+            p = settings.LOCATION_COORD_PRECISION if precision is None else precision
+            return f"{_round(lat, p)},{_round(lon, p)}"
+    return _COMMA.sub(", ", " ".join(q.split())).casefold()
+
+
+class LocationAliases:
+    """Bounded LRU map of normalized names to ``id:<location id>`` queries."""
+
+    def __init__(self, max_entries: int = 50000):
+        self.max_entries = max_entries
+        self._aliases: "OrderedDict[str, str]" = OrderedDict()
+        self.hits = 0
+
+    def get(self, name: str) -> Optional[str]:
+        alias = self._aliases.get(name)
+        if alias is not None:
+            self._aliases.move_to_end(name)
+            self.hits += 1
+        return alias
+
+    def add(self, name: Optional[str], target: str) -> None:
+        if not name or name == target:
+            return
+        self._aliases[name] = target
+        self._aliases.move_to_end(name)
+        while len(self._aliases) > self.max_entries:
+            self._aliases.popitem(last=False)
+
+    def learn_from_search(self, q: str, results: Any) -> int:
+        """Record aliases from a `search` response for normalized query `q`; returns how many results were usable."""
+        if not isinstance(results, list):
+            return 0
+        entries: List[Dict[str, Any]] = [r for r in results if isinstance(r, dict) and r.get("id") is not None and r.get("name")]
+        names: Dict[str, List[str]] = {}
+        for r in entries:
+            target = f"id:{r['id']}"
+            names.setdefault(normalize_location(r["name"]), []).append(target)
+            self.add(normalize_location(", ".join(str(r[k]) for k in ("name", "region", "country") if r.get(k))), target)
+        # a bare name is only an alias when the search found a single place with it
+        for name, targets in names.items():
+            if len(targets) == 1:
+                self.add(name, targets[0])
+        if len(entries) == 1:
+            self.add(q, f"id:{entries[0]['id']}")
+        elif len(names.get(q, [])) == 1:
+            self.add(q, names[q][0])
+        return len(entries)
+
+    def clear(self) -> None:
+        self._aliases.clear()
+
+    def __len__(self) -> int:
+        return len(self._aliases)
+
+
+aliases = LocationAliases(settings.LOCATION_ALIAS_MAX)
+
+
+def canonicalize(api_name: str, q: Optional[str]) -> Optional[str]:
+    """Normalized query for `api_name`, replaced by a learned location id when one is known."""
+    normalized = normalize_location(q)
+    if not normalized or not settings.LOCATION_ALIASES_ENABLED or api_name in _NO_ALIAS_APIS:
+        return normalized
+    return aliases.get(normalized) or normalized
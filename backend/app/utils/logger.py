@@ -1,34 +1,252 @@
+"""Application logging: the `weather_app` logger and its handlers.
+
+With `LOG_ASYNC` (the default) the logger only puts records on a bounded
+queue (`QueueHandler`); a `QueueListener` thread formats them and writes to
+the console and the rotating file, so request handlers never wait on disk or
+terminal I/O. When the queue is full, records are dropped and counted rather
+than blocking the caller.
+
+Before a record is queued, `LogSampler` may drop it: records tagged with an
+``event`` (``logger.info(..., extra={"event": "cache_hit"})``) are kept with
+the probability set for that event in `LOG_SAMPLE_RATES`, and every event
+(the message template for untagged records) is capped at `LOG_RATE_LIMIT`
+records per second. Warnings and errors are never sampled, only rate
+limited; the next record let through for a capped event carries the number
+suppressed meanwhile.
+
+`LOG_FORMAT=json` writes one JSON object per line with the request ID of the
+HTTP request being served (see `RequestIdMiddleware`) and any extra fields
+passed with the record (api, latency_ms, status, ...).
+"""
+
+import atexit
+import contextvars
+import json
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict, List, Optional
 
-LOG_DIR = os.path.join(os.getcwd(), "logs")
+from app.config import settings
+
+LOG_DIR = settings.LOG_DIR
 LOG_FILE = os.path.join(LOG_DIR, "app.log")
 
-def configure_logging():
-    os.makedirs(LOG_DIR, exist_ok=True)
+# ID of the HTTP request being served, set by `RequestIdMiddleware`
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
 
-    logger = logging.getLogger("weather_app")
-    if logger.handlers:
-        return  # already configured
+# attributes every LogRecord has; anything else was passed with `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional["_DroppingQueueHandler"] = None
+_sampler: Optional["LogSampler"] = None
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """Parse "cache_hit=0.01,upstream_call=0.5" into {event: keep probability}."""
+    rates: Dict[str, float] = {}
+    for part in spec.split(","):
+        name, sep, value = part.partition("=")
+        if not sep or not name.strip():
+            continue
+        try:
+            rates[name.strip()] = min(1.0, max(0.0, float(value)))
+        except ValueError:
+            continue
+    return rates
+
+
+class LogSampler(logging.Filter):
+    """Per-event sampling (INFO and below) and a per-event records-per-second cap."""
+
+    def __init__(self, rates: Optional[Dict[str, float]] = None, per_second: int = 0, clock=time.monotonic, rng=random.random):
+        super().__init__()
+        self.rates = rates or {}
+        self.per_second = per_second
+        self._clock = clock
+        self._rng = rng
+        self._lock = threading.Lock()
+        # event -> [window start, records let through, records suppressed]
+        self._windows: Dict[str, List[float]] = {}
+        self.sampled_out = 0
+        self.rate_limited = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        event = getattr(record, "event", None)
+        key = event or str(record.msg)
+        rate = self.rates.get(event) if event else None
+        if rate is not None and record.levelno < logging.WARNING and self._rng() >= rate:
+            self.sampled_out += 1
+            return False
+        if self.per_second <= 0:
+            return True
+        now = self._clock()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= 1.0:
+                suppressed = int(window[2]) if window else 0
+                window = self._windows[key] = [now, 0, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                if len(self._windows) > 10000:
+                    # untagged messages with changing text would otherwise grow this forever
+                    self._windows = {key: window}
+            if window[1] >= self.per_second:
+                window[2] += 1
+                self.rate_limited += 1
+                return False
+            window[1] += 1
+        return True
+
+
+class _ContextFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        # runs on the calling task/thread, where the request context is still set
+        if not hasattr(record, "request_id"):
+            record.request_id = request_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: ts, level, logger, message, request_id and the `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRS and value is not None:
+                entry[name] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _DroppingQueueHandler(QueueHandler):
+    dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
 
-    logger.setLevel(logging.INFO)
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # the queue stays in this process, so the record need not be made picklable: only
+        # resolve the message now (args may change later) and leave formatting to the listener
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        return record
 
-    fmt = logging.Formatter("%(asctime)s [%(levelname)s] %(name)s - %(message)s")
 
+def _formatter() -> logging.Formatter:
+    if settings.LOG_FORMAT == "json":
+        return JsonFormatter()
+    return logging.Formatter("%(asctime)s [%(levelname)s] %(name)s - %(message)s")
+
+
+def _output_handlers() -> List[logging.Handler]:
+    fmt = _formatter()
     ch = logging.StreamHandler()
-    ch.setLevel(logging.INFO)
     ch.setFormatter(fmt)
-    logger.addHandler(ch)
-
+    handlers: List[logging.Handler] = [ch]
     try:
         fh = RotatingFileHandler(LOG_FILE, maxBytes=10 * 1024 * 1024, backupCount=3)
-        fh.setLevel(logging.INFO)
         fh.setFormatter(fmt)
-        logger.addHandler(fh)
+        handlers.append(fh)
     except Exception:
+        pass
+    return handlers
+
+
+def configure_logging():
+    global _listener, _queue_handler, _sampler
+    os.makedirs(LOG_DIR, exist_ok=True)
+
+    logger = logging.getLogger("weather_app")
+    if logger.handlers:
+        return  # already configured
+
+    level = logging.getLevelName(settings.LOG_LEVEL.upper())
+    logger.setLevel(level if isinstance(level, int) else logging.INFO)
+    # logger filters run once per record on the caller's side, before any handler
+    _sampler = LogSampler(parse_sample_rates(settings.LOG_SAMPLE_RATES), settings.LOG_RATE_LIMIT)
+    logger.addFilter(_ContextFilter())
+    logger.addFilter(_sampler)
+
+    handlers = _output_handlers()
+    if settings.LOG_ASYNC:
+        _queue_handler = _DroppingQueueHandler(queue.Queue(maxsize=settings.LOG_QUEUE_SIZE))
+        logger.addHandler(_queue_handler)
+        _listener = QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+    else:
+        for handler in handlers:
+            logger.addHandler(handler)
+    if len(handlers) == 1:
         logger.warning("Could not initialize file rotating handler. Continuing with console logging only.")
 
+
+def stop_logging() -> None:
+    """Flush queued records and stop the writer thread (also registered with atexit)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logging_stats() -> Dict[str, Any]:
+    return {
+        "async": _queue_handler is not None,
+        "queued": _queue_handler.queue.qsize() if _queue_handler is not None else 0,
+        "dropped_queue_full": _queue_handler.dropped if _queue_handler is not None else 0,
+        "sampled_out": _sampler.sampled_out if _sampler is not None else 0,
+        "rate_limited": _sampler.rate_limited if _sampler is not None else 0,
+    }
+
+
+class RequestIdMiddleware:
+    """ASGI middleware: take the request ID from `X-Request-ID` (or make one), expose it to
+    log records and echo it in the response."""
+
+    def __init__(self, app: Any, header: str = "x-request-id"):
+        self.app = app
+        self.header = header.lower().encode("latin-1")
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope.get("headers") or ()).get(self.header, b"").decode("latin-1")
+        request_id = incoming if _REQUEST_ID_RE.match(incoming) else uuid.uuid4().hex
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(self.header, request_id.encode("latin-1"))]
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id_var.reset(token)
+
+
 # expose module-level logger object after configuration
 configure_logging()
 logger = logging.getLogger("weather_app")
@@ -0,0 +1,279 @@
+"""Low-overhead Prometheus metrics.
+
+Counters, gauges and histograms keep one shard per thread: a thread only ever
+writes its own shard, so recording takes no lock (the registry lock is taken
+once per thread, the first time it touches a metric). A scrape sums the
+shards. Values that already live elsewhere (cache stats, pool counts, queue
+depth) are exported with callback metrics evaluated at scrape time.
+
+`render()` produces the Prometheus text exposition format (version 0.0.4).
+"""
+
+import bisect
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[Dict[LabelValues, Any]] = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> Dict[LabelValues, Any]:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def collect(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, value: float = 1) -> None:
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + value
+
+    def _totals(self) -> Dict[LabelValues, float]:
+        totals: Dict[LabelValues, float] = {}
+        for shard in list(self._shards):
+            for labels, value in list(shard.items()):
+                totals[labels] = totals.get(labels, 0) + value
+        return totals
+
+    def value(self, *labels: str) -> float:
+        return self._totals().get(labels, 0)
+
+    def collect(self) -> List[str]:
+        lines = self._header()
+        for labels, value in sorted(self._totals().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    """Up/down gauge (e.g. in-flight requests); per-thread deltas are summed on scrape."""
+
+    kind = "gauge"
+
+    def dec(self, *labels: str, value: float = 1) -> None:
+        self.inc(*labels, value=-value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        shard = self._shard()
+        state = shard.get(labels)
+        if state is None:
+            # [per-bucket counts (+Inf last), sum, count]
+            state = shard[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    def time(self, *labels: str) -> "_Timer":
+        return _Timer(self, labels)
+
+    def collect(self) -> List[str]:
+        merged: Dict[LabelValues, list] = {}
+        for shard in list(self._shards):
+            for labels, (counts, total, count) in list(shard.items()):
+                acc = merged.setdefault(labels, [[0] * (len(self.buckets) + 1), 0.0, 0])
+                for i, c in enumerate(list(counts)):
+                    acc[0][i] += c
+                acc[1] += total
+                acc[2] += count
+        lines = self._header()
+        for labels, (counts, total, count) in sorted(merged.items()):
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: LabelValues):
+        self._histogram = histogram
+        self._labels = labels
+        self._start = 0.0
+
+    def __enter__(self) -> "_Timer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._histogram.observe(time.perf_counter() - self._start, *self._labels)
+
+
+class CallbackMetric(_Metric):
+    """Gauge/counter whose samples come from `fn()` at scrape time: {label values: value}."""
+
+    def __init__(self, name: str, documentation: str, fn: Callable[[], Dict[LabelValues, float]], labelnames: Sequence[str] = (), kind: str = "gauge"):
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self._fn = fn
+
+    def collect(self) -> List[str]:
+        lines = self._header()
+        try:
+            samples = self._fn() or {}
+        except Exception:
+            return lines
+        for labels, value in sorted(samples.items()):
+            if value is None:
+                continue
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name: str, documentation: str, fn: Callable[[], Dict[LabelValues, float]], labelnames: Sequence[str] = (), kind: str = "gauge") -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, fn, labelnames, kind))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+# -- metrics shared across modules ----------------------------------------
+
+UPSTREAM_LATENCY = REGISTRY.histogram(
+    "weather_upstream_request_duration_seconds",
+    "Latency of upstream WeatherAPI calls (including retries).",
+    ("api", "outcome"),
+)
+UPSTREAM_HEDGES = REGISTRY.counter(
+    "weather_upstream_hedges_total",
+    "Hedged upstream calls: sent, won (hedge answered first), lost, failed (both attempts), skipped (no budget).",
+    ("api", "result"),
+)
+DB_INSERT_LATENCY = REGISTRY.histogram(
+    "weather_db_insert_duration_seconds",
+    "Latency of weather_api_response inserts (one statement, single row or batch).",
+    ("mode",),
+)
+DB_INSERT_ROWS = REGISTRY.counter(
+    "weather_db_insert_rows_total",
+    "Rows written to weather_api_response.",
+    ("outcome",),
+)
+HTTP_IN_FLIGHT = REGISTRY.gauge(
+    "weather_http_requests_in_flight",
+    "HTTP requests currently being served.",
+)
+HTTP_LATENCY = REGISTRY.histogram(
+    "weather_http_request_duration_seconds",
+    "Latency of HTTP requests by route template.",
+    ("method", "route", "status"),
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording in-flight requests and per-route latency."""
+
+    def __init__(self, app: Any, exclude_paths: Optional[Iterable[str]] = ("/metrics",)):
+        self.app = app
+        self.exclude_paths = set(exclude_paths or ())
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or scope.get("path") in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = scope.get("route")
+            # use the route template so path parameters don't explode cardinality
+            route_path = getattr(route, "path", None) or "unmatched"
+            HTTP_LATENCY.observe(time.perf_counter() - start, scope.get("method", ""), route_path, str(status["code"]))
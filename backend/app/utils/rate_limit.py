@@ -0,0 +1,362 @@
+"""Upstream API keys: per-key token buckets, monthly quotas and 429 cool-downs.
+
+`KeyPool` hands out one of the configured WeatherAPI keys per upstream call.
+Each key has a token bucket (`rate` calls per second, bursts of up to
+`burst`) and an optional monthly call `quota`. Keys with the most quota left
+are tried first (ties go to the key this process used least), and the next
+key is tried when a bucket is empty. When no key has a token, `acquire`
+sleeps until the earliest refill, for at most `max_wait` seconds, and then
+raises `RateLimited` so the caller can answer 503 with Retry-After instead of
+sending a call that would come back 429. A key that does get a 429 rests for
+the upstream's Retry-After, or else `cooldown` seconds doubling with every
+429 in a row (up to `cooldown_max`) until a call with it succeeds. The last
+key still usable never rests longer than `max_wait`, so with a single key a
+stray 429 delays calls instead of failing every one of them with 503.
+
+With an (asyncio) Redis client the buckets, usage counters and cool-downs
+live in Redis and are updated by one atomic script per attempt, timed by the
+Redis clock, so all workers draw from the same budget. Without Redis every
+process keeps its own state (the limits then apply per process). When Redis
+errors, the pool switches to its in-process state for `redis_backoff`
+seconds, doubling up to `redis_backoff_max` while the errors continue, so an
+unreachable Redis costs one timeout per backoff period instead of one per
+call. With neither `rate` nor `quota` set, the pool only rotates keys and
+rests throttled ones, without touching Redis.
+
+Keys show up in Redis key names, logs and stats as a short hash, never as
+their value.
+"""
+
+import asyncio
+import hashlib
+import math
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from app.config import settings
+from app.utils.logger import logger
+
+# KEYS: bucket, usage, cooldown; ARGV: rate per second, burst, quota, cost, usage ttl (s).
+# Returns {granted, wait ms (-1 when the quota cannot cover the cost), calls used this period}.
+_TAKE_SCRIPT = """
+local used = tonumber(redis.call("get", KEYS[2]) or "0")
+local cooldown = redis.call("pttl", KEYS[3])
+if cooldown > 0 then
+    return {0, cooldown, used}
+end
+local quota = tonumber(ARGV[3])
+if quota > 0 and used + tonumber(ARGV[4]) > quota then
+    return {0, -1, used}
+end
+local rate = tonumber(ARGV[1])
+if rate > 0 then
+    local burst = tonumber(ARGV[2])
+    local t = redis.call("time")
+    local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+    local state = redis.call("hmget", KEYS[1], "tokens", "ts")
+    local tokens = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - ts) * rate / 1000)
+    local wait = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        wait = math.ceil((1 - tokens) * 1000 / rate)
+    end
+    redis.call("hset", KEYS[1], "tokens", tostring(tokens), "ts", tostring(now))
+    redis.call("pexpire", KEYS[1], math.ceil(burst * 1000 / rate) + 1000)
+    if wait > 0 then
+        return {0, wait, used}
+    end
+end
+used = redis.call("incrby", KEYS[2], ARGV[4])
+if redis.call("ttl", KEYS[2]) < 0 then
+    redis.call("expire", KEYS[2], ARGV[5])
+end
+return {1, 0, used}
+"""
+
+# usage counters outlive their month by a few days so late readers still see them
+_USAGE_TTL = 35 * 86400
+
+
+class RateLimited(Exception):
+    """No API key may be used within the allowed wait."""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def key_id(key: str) -> str:
+    """Short, stable label for an API key that does not reveal it."""
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:10]
+
+
+class TokenBucket:
+    """In-process token bucket: `rate` tokens per second, holding at most `burst`."""
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self._clock = clock
+        self._ts = clock()
+
+    def take(self) -> float:
+        """Take a token: 0 when granted, otherwise the seconds until one is available."""
+        if self.rate <= 0:
+            return 0.0
+        now = self._clock()
+        self.tokens = min(self.burst, self.tokens + (now - self._ts) * self.rate)
+        self._ts = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class _KeyState:
+    def __init__(self, key: str, bucket: TokenBucket):
+        self.key = key
+        self.id = key_id(key)
+        self.bucket = bucket
+        # calls used this period: counted locally, or the last value Redis reported
+        self.used = 0
+        self.period = ""
+        self.cooldown_until = 0.0
+        self.calls = 0
+        self.throttled = 0
+        # 429s in a row, each doubling the default cool-down
+        self.strikes = 0
+
+
+class KeyPool:
+    def __init__(
+        self,
+        keys: Iterable[str],
+        rate: float = 0.0,
+        burst: float = 1.0,
+        quota: int = 0,
+        max_wait: float = 1.0,
+        cooldown: float = 1.0,
+        cooldown_max: float = 60.0,
+        redis_client: Any = None,
+        redis_backoff: float = 1.0,
+        redis_backoff_max: float = 60.0,
+        prefix: str = "weather:ratelimit",
+        clock: Callable[[], float] = time.monotonic,
+        wall_clock: Callable[[], float] = time.time,
+    ):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.quota = max(0, quota)
+        self.max_wait = max_wait
+        self.cooldown = cooldown
+        self.cooldown_max = max(cooldown, cooldown_max)
+        self.prefix = prefix
+        self._redis = redis_client
+        self.redis_backoff = redis_backoff
+        self.redis_backoff_max = redis_backoff_max
+        self._redis_retry_at = 0.0
+        self._redis_delay = 0.0
+        self._clock = clock
+        self._wall_clock = wall_clock
+        self._states: List[_KeyState] = []
+        self._by_key: Dict[str, _KeyState] = {}
+        for key in keys:
+            if key and key not in self._by_key:
+                state = _KeyState(key, TokenBucket(rate, self.burst, clock))
+                self._states.append(state)
+                self._by_key[key] = state
+        self.deferred = 0
+        self.rejected = 0
+        self.redis_errors = 0
+
+    @property
+    def keys(self) -> List[str]:
+        return [state.key for state in self._states]
+
+    @property
+    def limited(self) -> bool:
+        return self.rate > 0 or self.quota > 0
+
+    def _period(self) -> str:
+        return datetime.fromtimestamp(self._wall_clock(), timezone.utc).strftime("%Y%m")
+
+    def _seconds_to_next_period(self) -> float:
+        now = datetime.fromtimestamp(self._wall_clock(), timezone.utc)
+        year, month = (now.year + 1, 1) if now.month == 12 else (now.year, now.month + 1)
+        return (datetime(year, month, 1, tzinfo=timezone.utc) - now).total_seconds()
+
+    def _remaining(self, state: _KeyState) -> Optional[int]:
+        return max(0, self.quota - state.used) if self.quota else None
+
+    def _order(self) -> List[_KeyState]:
+        return sorted(self._states, key=lambda state: (-(self._remaining(state) or 0), state.calls))
+
+    def _redis_keys(self, state: _KeyState, period: str) -> List[str]:
+        # one hash tag per key keeps its three entries in the same cluster slot
+        base = f"{self.prefix}:{{{state.id}}}"
+        return [f"{base}:bucket", f"{base}:used:{period}", f"{base}:cooldown"]
+
+    def _shared(self) -> bool:
+        return self._redis is not None and self._clock() >= self._redis_retry_at
+
+    def _redis_failed(self, exc: Exception) -> None:
+        self.redis_errors += 1
+        self._redis_delay = min(self.redis_backoff_max, self._redis_delay * 2 if self._redis_delay else self.redis_backoff)
+        self._redis_retry_at = self._clock() + self._redis_delay
+        logger.warning("Rate limiter using in-process state for %.0fs, Redis failed: %s", self._redis_delay, exc)
+
+    async def _take(self, state: _KeyState, cost: int) -> float:
+        """Claim `state`'s key for one call: 0 when granted, else seconds to wait (inf: not enough quota left)."""
+        period = self._period()
+        if state.period != period:
+            state.period, state.used = period, 0
+        now = self._clock()
+        if now < state.cooldown_until:
+            return state.cooldown_until - now
+        if not self.limited:
+            return 0.0
+        if self._shared():
+            try:
+                granted, wait_ms, used = await self._redis.eval(
+                    _TAKE_SCRIPT, 3, *self._redis_keys(state, period), self.rate, self.burst, self.quota, cost, _USAGE_TTL
+                )
+                self._redis_delay = 0.0
+                state.used = int(used)
+                if granted:
+                    return 0.0
+                return math.inf if int(wait_ms) < 0 else int(wait_ms) / 1000.0
+            except Exception as exc:
+                self._redis_failed(exc)
+        if self.quota and state.used + cost > self.quota:
+            return math.inf
+        wait = state.bucket.take()
+        if wait <= 0:
+            state.used += cost
+        return wait
+
+    async def acquire(self, cost: int = 1, max_wait: Optional[float] = None) -> str:
+        """A key for one upstream call worth `cost` quota units, waiting up to `max_wait`
+        (default: the pool's) for a token.
+
+        Raises `RateLimited` when no key frees up in time (or every quota is used up).
+        """
+        if not self._states:
+            raise RateLimited("no API keys configured")
+        deadline = self._clock() + (self.max_wait if max_wait is None else max_wait)
+        waited = False
+        while True:
+            wait = math.inf
+            for state in self._order():
+                state_wait = await self._take(state, cost)
+                if state_wait <= 0:
+                    state.calls += 1
+                    self.deferred += int(waited)
+                    return state.key
+                wait = min(wait, state_wait)
+            if wait > deadline - self._clock():
+                self.rejected += 1
+                retry_after = self._seconds_to_next_period() if math.isinf(wait) else wait
+                raise RateLimited(f"all {len(self._states)} API keys are rate limited", retry_after=retry_after)
+            waited = True
+            await asyncio.sleep(wait)
+
+    async def penalize(self, key: str, retry_after: Optional[float] = None) -> None:
+        """Rest `key` after a 429 for `retry_after` seconds, or the (doubling) default cool-down.
+
+        When every other key is resting too, the rest is capped at `max_wait` so the
+        next call can still wait for this key instead of being refused.
+        """
+        state = self._by_key.get(key)
+        if state is None:
+            return
+        state.strikes += 1
+        if retry_after and retry_after > 0:
+            seconds = retry_after
+        else:
+            seconds = min(self.cooldown_max, self.cooldown * 2 ** (state.strikes - 1))
+        now = self._clock()
+        if not any(other is not state and other.cooldown_until <= now for other in self._states):
+            seconds = min(seconds, self.max_wait)
+        state.cooldown_until = now + seconds
+        state.throttled += 1
+        logger.warning("API key %s was throttled upstream; resting it for %.1fs", state.id, seconds)
+        if self.limited and self._shared() and seconds > 0:
+            try:
+                await self._redis.set(self._redis_keys(state, self._period())[2], 1, px=int(seconds * 1000))
+            except Exception as exc:
+                self._redis_failed(exc)
+
+    def succeeded(self, key: str) -> None:
+        """A call with `key` was not throttled: its next 429 starts from the base cool-down again."""
+        state = self._by_key.get(key)
+        if state is not None:
+            state.strikes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        now = self._clock()
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "quota": self.quota,
+            "shared": self.limited and self._shared(),
+            "deferred": self.deferred,
+            "rejected": self.rejected,
+            "redis_errors": self.redis_errors,
+            "keys": [
+                {
+                    "id": state.id,
+                    "calls": state.calls,
+                    "used": state.used,
+                    "remaining": self._remaining(state),
+                    "throttled": state.throttled,
+                    "cooling_s": round(max(0.0, state.cooldown_until - now), 1),
+                }
+                for state in self._states
+            ],
+        }
+
+    def reset(self) -> None:
+        """Forget in-process state (Redis state is left alone)."""
+        for state in self._states:
+            state.bucket = TokenBucket(self.rate, self.burst, self._clock)
+            state.used = state.calls = state.throttled = state.strikes = 0
+            state.period = ""
+            state.cooldown_until = 0.0
+        self.deferred = self.rejected = self.redis_errors = 0
+        self._redis_retry_at = self._redis_delay = 0.0
+
+
+def _redis_client() -> Any:
+    if not (settings.RATE_LIMIT_SHARED and settings.REDIS_URL):
+        return None
+    try:
+        import redis.asyncio as aioredis
+        # short timeouts: a slow Redis must not hold up upstream calls for long
+        return aioredis.from_url(
+            settings.REDIS_URL,
+            socket_timeout=settings.RATE_LIMIT_REDIS_TIMEOUT,
+            socket_connect_timeout=settings.RATE_LIMIT_REDIS_TIMEOUT,
+        )
+    except Exception as exc:
+        logger.warning("Redis not available for rate limiting: %s", exc)
+        return None
+
+
+def create_key_pool() -> KeyPool:
+    """Build the pool from `WEATHER_API_KEY`, `WEATHER_API_KEYS` and the `RATE_LIMIT_*` settings."""
+    keys = [settings.WEATHER_API_KEY or ""] + [key.strip() for key in settings.WEATHER_API_KEYS.split(",")]
+    return KeyPool(
+        keys,
+        rate=settings.RATE_LIMIT_PER_KEY,
+        burst=settings.RATE_LIMIT_BURST,
+        quota=settings.RATE_LIMIT_MONTHLY_QUOTA,
+        max_wait=settings.RATE_LIMIT_MAX_WAIT,
+        cooldown=settings.RATE_LIMIT_COOLDOWN,
+        cooldown_max=settings.RATE_LIMIT_COOLDOWN_MAX,
+        redis_client=_redis_client(),
+    )
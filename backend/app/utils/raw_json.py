@@ -0,0 +1,103 @@
+"""Raw JSON payloads and a response class that splices them without re-encoding.
+
+`RawPayload` keeps the upstream response bytes next to the parsed object
+(parsed lazily, at most once). The cache, the DB `json_data` column and the
+HTTP response all reuse the bytes, so a cache hit is returned without a
+parse/encode cycle of the payload.
+"""
+
+import json
+from typing import Any, Callable, Dict
+
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+_MISSING = object()
+
+
+def json_dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+def json_loads(raw: Any) -> Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+class RawPayload:
+    __slots__ = ("raw", "_data")
+
+    def __init__(self, raw: bytes, data: Any = _MISSING):
+        self.raw = raw
+        self._data = data
+
+    @classmethod
+    def from_data(cls, data: Any) -> "RawPayload":
+        return cls(json_dumps(data), data)
+
+    @classmethod
+    def wrap(cls, value: Any) -> "RawPayload":
+        """Return `value` as a RawPayload (entries cached before raw payloads hold plain objects)."""
+        return value if isinstance(value, cls) else cls.from_data(value)
+
+    @property
+    def data(self) -> Any:
+        if self._data is _MISSING:
+            self._data = json_loads(self.raw)
+        return self._data
+
+    @property
+    def text(self) -> str:
+        return self.raw.decode("utf-8")
+
+    def __len__(self) -> int:
+        return len(self.raw)
+
+    def __repr__(self) -> str:
+        return f"RawPayload({len(self.raw)} bytes)"
+
+
+def _encode(obj: Any, emit: Callable[[bytes], None]) -> None:
+    if isinstance(obj, RawPayload):
+        emit(obj.raw)
+    elif isinstance(obj, dict):
+        emit(b"{")
+        for i, (key, value) in enumerate(obj.items()):
+            if i:
+                emit(b",")
+            emit(json_dumps(str(key)))
+            emit(b":")
+            _encode(value, emit)
+        emit(b"}")
+    elif isinstance(obj, (list, tuple)):
+        emit(b"[")
+        for i, value in enumerate(obj):
+            if i:
+                emit(b",")
+            _encode(value, emit)
+        emit(b"]")
+    else:
+        emit(json_dumps(obj))
+
+
+def dumps_with_raw(obj: Any) -> bytes:
+    """JSON-encode `obj`, copying any RawPayload bytes through verbatim."""
+    parts = []
+    _encode(obj, parts.append)
+    return b"".join(parts)
+
+
+class RawJSONResponse(Response):
+    """JSON response whose RawPayload values are spliced in as-is (no `jsonable_encoder`)."""
+
+    media_type = "application/json"
+
+    def render(self, content: Dict[str, Any]) -> bytes:
+        return dumps_with_raw(content)
@@ -0,0 +1,209 @@
+"""Upstream protection: per-endpoint circuit breakers and an adaptive concurrency limit.
+
+`CircuitBreaker` tracks the outcome of calls over a sliding time window. Once
+at least `min_calls` were seen and the failure rate (or the rate of calls
+slower than `slow_call_ms`) crosses its threshold, the circuit opens and calls
+are rejected without touching the network. After `open_seconds` it lets
+`half_open_probes` trial calls through: if they all succeed the circuit
+closes, any failure opens it again.
+
+`AIMDLimiter` caps outstanding upstream calls. The limit grows by about one
+per `limit` successful calls (additive increase) and is multiplied by
+`backoff` on a failure or a call slower than `latency_ms` (multiplicative
+decrease, at most once per `cooldown` seconds so a burst of failures counts
+as one congestion signal). Calls over the limit are rejected immediately
+instead of queueing behind a slow upstream.
+
+Both are used from the event loop only and are not thread-safe.
+"""
+
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        window: float = 30.0,
+        min_calls: int = 20,
+        error_rate: float = 0.5,
+        slow_call_ms: float = 5000.0,
+        slow_rate: float = 0.8,
+        open_seconds: float = 15.0,
+        half_open_probes: int = 3,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_ms = slow_call_ms
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = max(1, half_open_probes)
+        self._clock = clock
+        # (timestamp, failed, slow)
+        self._calls: Deque[Tuple[float, bool, bool]] = deque()
+        self._failures = 0
+        self._slow = 0
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probes_started = 0
+        self._probes_ok = 0
+        self.opened = 0
+        self.rejected = 0
+
+    def _trim(self, now: float) -> None:
+        while self._calls and self._calls[0][0] < now - self.window:
+            _, failed, slow = self._calls.popleft()
+            self._failures -= failed
+            self._slow -= slow
+
+    def _open(self, now: float) -> None:
+        self.state = OPEN
+        self._opened_at = now
+        self.opened += 1
+        self._calls.clear()
+        self._failures = self._slow = 0
+
+    def allow(self) -> bool:
+        """Whether a call may go out now (claims a probe slot when half-open)."""
+        if self.state == OPEN:
+            if self._clock() - self._opened_at < self.open_seconds:
+                self.rejected += 1
+                return False
+            self.state = HALF_OPEN
+            self._probes_started = self._probes_ok = 0
+        if self.state == HALF_OPEN:
+            if self._probes_started >= self.half_open_probes:
+                self.rejected += 1
+                return False
+            self._probes_started += 1
+        return True
+
+    def release_probe(self) -> None:
+        """Give back a half-open probe slot whose call never completed (e.g. cancelled)."""
+        if self.state == HALF_OPEN and self._probes_started > 0:
+            self._probes_started -= 1
+
+    def retry_after(self) -> float:
+        """Seconds until the circuit will let probes through (0 unless open)."""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.open_seconds - (self._clock() - self._opened_at))
+
+    def record(self, success: bool, latency_ms: float) -> None:
+        now = self._clock()
+        slow = latency_ms >= self.slow_call_ms
+        if self.state == HALF_OPEN:
+            if not success or slow:
+                self._open(now)
+                return
+            self._probes_ok += 1
+            if self._probes_ok >= self.half_open_probes:
+                self.state = CLOSED
+            return
+        if self.state == OPEN:
+            # a call admitted before the circuit opened
+            return
+        self._calls.append((now, not success, slow))
+        self._failures += not success
+        self._slow += slow
+        self._trim(now)
+        total = len(self._calls)
+        if total >= self.min_calls and (self._failures / total >= self.error_rate or self._slow / total >= self.slow_rate):
+            self._open(now)
+
+    def stats(self) -> Dict[str, Any]:
+        self._trim(self._clock())
+        total = len(self._calls)
+        return {
+            "state": self.state,
+            "calls": total,
+            "error_rate": round(self._failures / total, 3) if total else 0.0,
+            "slow_rate": round(self._slow / total, 3) if total else 0.0,
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "retry_after_s": round(self.retry_after(), 1),
+        }
+
+
+class CircuitBreakers:
+    """One `CircuitBreaker` per name, created on first use with shared settings."""
+
+    def __init__(self, **options: Any):
+        self.options = options
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            breaker = self._breakers[name] = CircuitBreaker(name, **self.options)
+        return breaker
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: breaker.stats() for name, breaker in sorted(self._breakers.items())}
+
+    def reset(self) -> None:
+        self._breakers.clear()
+
+
+class AIMDLimiter:
+    def __init__(
+        self,
+        initial: int = 50,
+        min_limit: int = 5,
+        max_limit: int = 200,
+        latency_ms: float = 2000.0,
+        backoff: float = 0.7,
+        cooldown: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.initial = initial
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.latency_ms = latency_ms
+        self.backoff = backoff
+        self.cooldown = cooldown
+        self._clock = clock
+        self._last_decrease = float("-inf")
+        self.in_flight = 0
+        self.rejected = 0
+        self.decreases = 0
+
+    def try_acquire(self) -> bool:
+        if self.in_flight >= int(self.limit):
+            self.rejected += 1
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self, success: Optional[bool] = None, latency_ms: float = 0.0) -> None:
+        """Return a slot; `success` None means the call never went out (no signal)."""
+        self.in_flight = max(0, self.in_flight - 1)
+        if success is None:
+            return
+        if success and latency_ms < self.latency_ms:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            return
+        now = self._clock()
+        if now - self._last_decrease >= self.cooldown:
+            self._last_decrease = now
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+            self.decreases += 1
+
+    def reset(self) -> None:
+        self.limit = float(min(max(self.initial, self.min_limit), self.max_limit))
+        self._last_decrease = float("-inf")
+        self.in_flight = self.rejected = self.decreases = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"limit": int(self.limit), "in_flight": self.in_flight, "rejected": self.rejected, "decreases": self.decreases}
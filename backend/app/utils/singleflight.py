@@ -0,0 +1,48 @@
+"""In-process request coalescing ("single flight").
+
+Concurrent callers asking for the same key share one in-flight call: the first
+caller (the leader) starts it, later callers await the same task and receive
+its result or exception.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.leader_count = 0
+        self.coalesced_count = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is not None and not task.done():
+            self.coalesced_count += 1
+            return await asyncio.shield(task)
+
+        self.leader_count += 1
+        # run the call as its own task so a cancelled leader (e.g. client
+        # disconnect) does not cancel the result the waiters are expecting
+        task = asyncio.ensure_future(fn())
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._forget(key, t))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # mark the exception as retrieved when every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+    def __contains__(self, key: str) -> bool:
+        task = self._inflight.get(key)
+        return task is not None and not task.done()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "leader": self.leader_count,
+            "coalesced": self.coalesced_count,
+            "in_flight": len(self._inflight),
+        }
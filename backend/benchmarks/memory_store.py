@@ -0,0 +1,43 @@
+"""In-memory stand-in for the response tables, so benchmarks measure the service, not Oracle."""
+
+import threading
+from typing import Any, Dict, List, Optional
+
+from app.services.db_service import build_record
+
+
+class MemoryStore:
+    """Counts (and optionally keeps) the records the app would have inserted."""
+
+    def __init__(self, keep: bool = False):
+        self.keep = keep
+        self.records: List[Dict[str, Any]] = []
+        self.saved = 0
+        self.batches = 0
+        self._lock = threading.Lock()
+
+    def save_api_responses(self, records: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self.saved += len(records)
+            self.batches += 1
+            if self.keep:
+                self.records.extend(records)
+
+    def save_api_response(self, location: Optional[str], api_type: str, payload: Any, params: Optional[Dict[str, Any]] = None, response_time_ms: Optional[int] = None, status_code: Optional[int] = None, request_url: Optional[str] = None) -> None:
+        # build the record anyway: serialization is part of the real cost
+        self.save_api_responses([build_record(location, api_type, payload, params, response_time_ms, status_code, request_url)])
+
+    def stats(self) -> Dict[str, int]:
+        return {"saved": self.saved, "batches": self.batches}
+
+    def install(self) -> "MemoryStore":
+        """Route the app's inserts (direct and write-behind) to this store."""
+        from app import main
+        from app.services import db_service, db_writer
+
+        db_service.save_api_response = self.save_api_response
+        db_service.save_api_responses = self.save_api_responses
+        db_writer.save_api_responses = self.save_api_responses
+        # no schema to introspect at startup
+        main.get_insert_statement = lambda: None
+        return self
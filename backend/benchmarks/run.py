@@ -0,0 +1,322 @@
+"""Load-test the `/weather/*` routes against a stub upstream and an in-memory store.
+
+Starts `benchmarks.stub_upstream` and the app (`benchmarks.serve`) as
+subprocesses on free local ports, then drives each selected route with
+``--concurrency`` concurrent clients over a Zipf-distributed set of
+``--locations`` (so the cache sees a realistic mix of hot and cold keys). For
+each route it reports requests/s, p50/p95/p99 latency, error count, upstream
+calls, cache hit ratio and the app's resident memory.
+
+``--save-baseline FILE`` stores the results; ``--baseline FILE`` compares a run
+against them and exits with status 1 when a route's RPS drops, or its p95/p99
+latency grows, by more than ``--tolerance``. Baselines are only comparable on
+the same machine and settings.
+
+    cd backend
+    python -m benchmarks.run --routes current,forecast --requests 2000 --concurrency 50
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from itertools import accumulate
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+ROUTES = {
+    "current": "/weather/current?location={q}",
+    "forecast": "/weather/forecast?q={q}&days=3",
+    "history": "/weather/history?q={q}&dt=2024-01-15",
+    "marine": "/weather/marine?q={q}",
+    "search": "/weather/search?q={q}",
+    "ip": "/weather/ip?ip={ip}",
+    "timezone": "/weather/timezone?q={q}",
+    "astronomy": "/weather/astronomy?q={q}&dt=2024-01-15",
+    "future": "/weather/future?q={q}&days=3",
+}
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def memory_kb(pid: int) -> Dict[str, Optional[int]]:
+    """Resident and peak resident memory of `pid` (Linux /proc; None elsewhere)."""
+    usage: Dict[str, Optional[int]] = {"rss_kb": None, "peak_rss_kb": None}
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    usage["rss_kb"] = int(line.split()[1])
+                elif line.startswith("VmHWM:"):
+                    usage["peak_rss_kb"] = int(line.split()[1])
+    except OSError:
+        pass
+    return usage
+
+
+def cache_counters(health: Dict[str, Any]) -> Dict[str, int]:
+    cache = health.get("cache") or {}
+    l1 = cache.get("l1") or {}
+    l2 = cache.get("l2") or {}
+    return {"l1_hits": l1.get("hits", 0), "l1_misses": l1.get("misses", 0), "l2_hits": l2.get("hits", 0), "l2_misses": l2.get("misses", 0)}
+
+
+def hit_ratio(before: Dict[str, int], after: Dict[str, int]) -> Optional[float]:
+    delta = {k: after[k] - before[k] for k in after}
+    hits = delta["l1_hits"] + delta["l2_hits"]
+    # L2 is only consulted on an L1 miss
+    lookups = delta["l1_hits"] + delta["l1_misses"] if (delta["l1_hits"] + delta["l1_misses"]) else delta["l2_hits"] + delta["l2_misses"]
+    return round(hits / lookups, 4) if lookups else None
+
+
+class Services:
+    """The stub upstream and the app under test, as subprocesses."""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.stub_port = free_port()
+        self.app_port = free_port()
+        self.procs: List[subprocess.Popen] = []
+        self.logs: List[Any] = []
+
+    @property
+    def app_url(self) -> str:
+        return f"http://127.0.0.1:{self.app_port}"
+
+    @property
+    def stub_url(self) -> str:
+        return f"http://127.0.0.1:{self.stub_port}"
+
+    def _spawn(self, argv: List[str], env: Dict[str, str]) -> subprocess.Popen:
+        log = tempfile.TemporaryFile(mode="w+")
+        self.logs.append(log)
+        proc = subprocess.Popen([sys.executable, "-m"] + argv, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=log)
+        self.procs.append(proc)
+        return proc
+
+    def start(self) -> None:
+        a = self.args
+        self._spawn(
+            ["benchmarks.stub_upstream", "--port", str(self.stub_port), "--latency-ms", str(a.latency_ms),
+             "--latency-sigma", str(a.latency_sigma), "--error-rate", str(a.error_rate), "--seed", str(a.seed)],
+            dict(os.environ),
+        )
+        env = dict(os.environ)
+        env.update({
+            "WEATHER_BASE_URL": f"{self.stub_url}/v1",
+            "WEATHER_API_KEY": "bench",
+            "HEALTH_UPSTREAM_CHECK": "false",
+            "PREWARM_ENABLED": "false",
+        })
+        env.pop("REDIS_URL", None)
+        for item in a.env:
+            key, _, value = item.partition("=")
+            env[key] = value
+        self.app = self._spawn(["benchmarks.serve", "--port", str(self.app_port)], env)
+        self._wait_ready()
+
+    def _wait_ready(self, timeout: float = 30.0) -> None:
+        deadline = time.monotonic() + timeout
+        urls = [f"{self.stub_url}/__stats", f"{self.app_url}/health/live"]
+        while urls:
+            if time.monotonic() > deadline or any(p.poll() is not None for p in self.procs):
+                self.stop()
+                raise RuntimeError("benchmark services did not start:\n" + self.output())
+            try:
+                if httpx.get(urls[0], timeout=1.0).status_code == 200:
+                    urls.pop(0)
+                    continue
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.1)
+
+    def output(self) -> str:
+        text = []
+        for log in self.logs:
+            log.seek(0)
+            text.append(log.read()[-4000:])
+        return "\n".join(text)
+
+    def stop(self) -> None:
+        for proc in self.procs:
+            if proc.poll() is None:
+                proc.terminate()
+        for proc in self.procs:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+class Workload:
+    def __init__(self, locations: int, zipf_s: float, seed: int):
+        self.names = [f"city{i}" for i in range(locations)]
+        self.cum_weights = list(accumulate(1.0 / (i + 1) ** zipf_s for i in range(locations)))
+        self.rng = random.Random(seed)
+
+    def path(self, route: str) -> str:
+        i = self.rng.choices(range(len(self.names)), cum_weights=self.cum_weights)[0]
+        return ROUTES[route].format(q=self.names[i], ip=f"10.0.{i // 256}.{i % 256}")
+
+
+async def drive(client: httpx.AsyncClient, workload: Workload, route: str, requests: int, concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    remaining = requests
+
+    async def worker() -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            path = workload.path(route)
+            start = time.perf_counter()
+            try:
+                resp = await client.get(path)
+                status = str(resp.status_code)
+            except httpx.HTTPError as exc:
+                status = type(exc).__name__
+            latencies.append((time.perf_counter() - start) * 1000.0)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+        "errors": sum(n for s, n in statuses.items() if s != "200"),
+        "statuses": statuses,
+    }
+
+
+async def run_benchmark(args: argparse.Namespace, services: Services) -> Dict[str, Any]:
+    workload = Workload(args.locations, args.zipf, args.seed)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results: Dict[str, Any] = {}
+    async with httpx.AsyncClient(base_url=services.app_url, limits=limits, timeout=args.timeout) as client, httpx.AsyncClient(base_url=services.stub_url) as stub:
+        for route in args.routes:
+            if args.warmup:
+                await drive(client, workload, route, args.warmup, args.concurrency)
+            upstream_before = (await stub.get("/__stats")).json()["total_calls"]
+            cache_before = cache_counters((await client.get("/health")).json())
+
+            result = await drive(client, workload, route, args.requests, args.concurrency)
+
+            result["upstream_calls"] = (await stub.get("/__stats")).json()["total_calls"] - upstream_before
+            result["cache_hit_ratio"] = hit_ratio(cache_before, cache_counters((await client.get("/health")).json()))
+            result.update(memory_kb(services.app.pid))
+            results[route] = result
+            print(format_row(route, result), flush=True)
+        store = (await client.get("/__bench/store")).json()
+    return {
+        "settings": {k: getattr(args, k) for k in ("requests", "concurrency", "locations", "zipf", "latency_ms", "latency_sigma", "error_rate", "warmup")},
+        "routes": results,
+        "store": store,
+    }
+
+
+def format_row(route: str, r: Dict[str, Any]) -> str:
+    ratio = "-" if r["cache_hit_ratio"] is None else f"{r['cache_hit_ratio']:.1%}"
+    rss = "-" if r.get("rss_kb") is None else f"{r['rss_kb'] / 1024:.0f}MB"
+    return (
+        f"{route:<10} {r['rps']:>8.1f} rps  p50 {r['p50_ms']:>7.1f}  p95 {r['p95_ms']:>7.1f}  p99 {r['p99_ms']:>7.1f} ms  "
+        f"errors {r['errors']:>4}  upstream {r['upstream_calls']:>5}  hit {ratio:>6}  rss {rss:>6}"
+    )
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions of `current` against `baseline` beyond the relative `tolerance`."""
+    problems = []
+    for route, base in baseline.get("routes", {}).items():
+        now = current["routes"].get(route)
+        if now is None:
+            continue
+        if base["rps"] and now["rps"] < base["rps"] * (1 - tolerance):
+            problems.append(f"{route}: rps {now['rps']} < baseline {base['rps']}")
+        for key in ("p95_ms", "p99_ms"):
+            if base[key] and now[key] > base[key] * (1 + tolerance):
+                problems.append(f"{route}: {key} {now[key]} > baseline {base[key]}")
+        if now["errors"] > base["errors"] + max(1, int(base["requests"] * 0.01)):
+            problems.append(f"{route}: errors {now['errors']} > baseline {base['errors']}")
+    return problems
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the /weather routes against a stub upstream")
+    parser.add_argument("--routes", default="current,forecast,search", help=f"comma-separated, from {','.join(ROUTES)}")
+    parser.add_argument("--requests", type=int, default=1000, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=0, help="unmeasured requests per route first")
+    parser.add_argument("--locations", type=int, default=200, help="distinct locations")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of location popularity (0 = uniform)")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="median stub upstream latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="log-normal spread of the upstream latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of failing upstream calls")
+    parser.add_argument("--timeout", type=float, default=30.0, help="client timeout per request (seconds)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra app setting (repeatable)")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--save-baseline", metavar="FILE", help="write the results as the new baseline")
+    parser.add_argument("--baseline", metavar="FILE", help="compare against this baseline; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+    args.routes = [r.strip() for r in args.routes.split(",") if r.strip()]
+    unknown = [r for r in args.routes if r not in ROUTES]
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(unknown)}")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    services = Services(args)
+    services.start()
+    try:
+        results = asyncio.run(run_benchmark(args, services))
+    finally:
+        services.stop()
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w") as fh:
+            json.dump(results, fh, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as fh:
+            problems = compare(results, json.load(fh), args.tolerance)
+        if problems:
+            print("Regressions against baseline:\n  " + "\n  ".join(problems))
+            return 1
+        print("No regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,34 @@
+"""Run the app for benchmarking: in-memory persistence, no database.
+
+Configuration comes from the environment as usual (the runner points
+`WEATHER_BASE_URL` at the stub upstream). ``GET /__bench/store`` reports what
+would have been written.
+
+    python -m benchmarks.serve --port 8900
+"""
+
+import argparse
+
+import uvicorn
+
+from benchmarks.memory_store import MemoryStore
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve the app with an in-memory store")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    args = parser.parse_args()
+
+    store = MemoryStore().install()
+    from app.main import app
+
+    @app.get("/__bench/store", include_in_schema=False)
+    async def store_stats():
+        return store.stats()
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Local stand-in for WeatherAPI used by the benchmarks.
+
+Serves ``/v1/<api>.json`` with WeatherAPI-shaped payloads after a simulated
+latency: log-normal around ``--latency-ms`` with spread ``--latency-sigma``
+(0 gives a fixed delay). A ``--error-rate`` fraction of calls fails with
+``--error-status``. ``GET /__stats`` returns the call counters.
+
+    python -m benchmarks.stub_upstream --port 8901 --latency-ms 80 --error-rate 0.01
+"""
+
+import argparse
+import asyncio
+import math
+import random
+import time
+from collections import Counter
+from typing import Any, Dict
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def _place(q: str) -> Dict[str, Any]:
+    seed = sum(map(ord, q or "x"))
+    return {
+        "name": (q or "unknown").title(),
+        "region": "Region",
+        "country": "Country",
+        "lat": round(-60 + seed % 120 + 0.123, 3),
+        "lon": round(-170 + seed * 7 % 340 + 0.456, 3),
+        "tz_id": "UTC",
+        "localtime_epoch": int(time.time()),
+    }
+
+
+def _conditions(epoch: int, rng: random.Random) -> Dict[str, Any]:
+    return {
+        "temp_c": round(rng.uniform(-10, 35), 1),
+        "feelslike_c": round(rng.uniform(-12, 38), 1),
+        "humidity": rng.randint(10, 100),
+        "wind_kph": round(rng.uniform(0, 40), 1),
+        "wind_degree": rng.randint(0, 359),
+        "gust_kph": round(rng.uniform(0, 60), 1),
+        "pressure_mb": round(rng.uniform(990, 1035), 1),
+        "precip_mm": round(rng.uniform(0, 5), 1),
+        "cloud": rng.randint(0, 100),
+        "uv": round(rng.uniform(0, 10), 1),
+        "condition": {"text": "Partly cloudy", "code": 1003},
+    }
+
+
+def make_payload(api: str, params: Dict[str, str]) -> Any:
+    """A response shaped like WeatherAPI's for `api` (sizes roughly match the real ones)."""
+    q = params.get("q", "")
+    rng = random.Random(q)
+    now = int(time.time()) // 900 * 900
+    if api == "search":
+        return [{"id": 1000 + sum(map(ord, q)), **{k: v for k, v in _place(q).items() if k in ("name", "region", "country", "lat", "lon")}}]
+    if api == "ip":
+        return {"ip": q, "type": "ipv4", **_place("ip " + q)}
+    body: Dict[str, Any] = {"location": _place(q)}
+    if api in ("current", "forecast"):
+        body["current"] = {"last_updated_epoch": now, **_conditions(now, rng)}
+    if api in ("forecast", "history", "future", "marine"):
+        days = max(1, min(int(params.get("days", 1) or 1), 10))
+        body["forecast"] = {
+            "forecastday": [
+                {
+                    "date_epoch": now // 86400 * 86400 + d * 86400,
+                    "day": {"maxtemp_c": 30.0, "mintemp_c": 18.0},
+                    "hour": [{"time_epoch": now // 86400 * 86400 + d * 86400 + h * 3600, **_conditions(h, rng)} for h in range(24)],
+                }
+                for d in range(days)
+            ]
+        }
+    if api == "astronomy":
+        body["astronomy"] = {"astro": {"sunrise": "06:10 AM", "sunset": "06:40 PM", "moon_phase": "Waxing Gibbous"}}
+    return body
+
+
+def create_stub_app(latency_ms: float = 50.0, latency_sigma: float = 0.5, error_rate: float = 0.0, error_status: int = 500, seed: int = 0) -> FastAPI:
+    app = FastAPI()
+    rng = random.Random(seed)
+    calls: Counter = Counter()
+    errors: Counter = Counter()
+
+    async def delay() -> None:
+        if latency_ms > 0:
+            await asyncio.sleep(latency_ms * math.exp(latency_sigma * rng.gauss(0, 1)) / 1000.0)
+
+    @app.get("/__stats")
+    async def stats():
+        return {"calls": dict(calls), "errors": dict(errors), "total_calls": sum(calls.values()), "total_errors": sum(errors.values())}
+
+    @app.get("/v1/{api}.json")
+    async def lookup(api: str, request: Request):
+        calls[api] += 1
+        await delay()
+        if rng.random() < error_rate:
+            errors[api] += 1
+            return JSONResponse({"error": {"code": 9999, "message": "stub failure"}}, status_code=error_status)
+        return make_payload(api, dict(request.query_params))
+
+    @app.post("/v1/current.json")
+    async def bulk(request: Request):
+        calls["bulk"] += 1
+        await delay()
+        body = await request.json()
+        return {"bulk": [{"query": {"custom_id": loc.get("custom_id"), "q": loc.get("q"), **make_payload("current", {"q": loc.get("q", "")})}} for loc in body.get("locations", [])]}
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Stub WeatherAPI server for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="median simulated upstream latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="log-normal spread (0 = fixed latency)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls that fail")
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    app = create_stub_app(args.latency_ms, args.latency_sigma, args.error_rate, args.error_status, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
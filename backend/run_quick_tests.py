@@ -1,3 +1,4 @@
+import json
 from app.main import app
 from app.services import weather_service
 from app.utils import cache as cache_module
@@ -22,10 +23,14 @@ class FakeResp:
     def json(self):
         return self._payload
 
+    @property
+    def content(self):
+        return json.dumps(self.json()).encode()
+
 
 def make_fake_get(mapping):
     """Return a fake_get function that returns different payloads depending on endpoint name."""
-    def fake_get(url, params=None, timeout=None):
+    async def fake_get(url, params=None, timeout=None):
         # find endpoint name from URL
         if isinstance(url, str):
             end = url.split('/')[-1]
@@ -1,8 +1,33 @@
 import sys
 import os
+import tempfile
+import pytest
 
 # Make backend the root (so app.main can be imported)
 ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 sys.path.insert(0, ROOT_DIR)
 
 print("PYTHONPATH updated ->", ROOT_DIR)
+
+# keep test-run logs out of the source tree (read when app.config is first imported)
+os.environ.setdefault("LOG_DIR", tempfile.mkdtemp(prefix="weather-test-logs-"))
+
+
+@pytest.fixture(autouse=True)
+def clear_local_cache():
+    """Start every test with an empty in-process cache."""
+    from app.utils import cache as cache_module
+    if cache_module._local_cache is not None:
+        cache_module._local_cache.clear()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def reset_upstream_guards():
+    """Circuit breakers, the adaptive limit, key cool-downs and hedge latencies must not leak across tests."""
+    from app.services import weather_service
+    weather_service.breakers.reset()
+    weather_service.limiter.reset()
+    weather_service.key_pool.reset()
+    weather_service.hedger.reset()
+    yield
@@ -0,0 +1,94 @@
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import aggregate_service
+from app.utils.cache import LocalCache
+
+client = TestClient(app)
+
+OBSERVATIONS = [
+    ("delhi", datetime(2024, 1, 1, 10, 0), 10.0),
+    ("delhi", datetime(2024, 1, 1, 10, 30), 14.0),
+    ("delhi", datetime(2024, 1, 1, 11, 15), 15.0),
+    ("oslo", datetime(2024, 1, 1, 10, 45), -3.0),
+    ("oslo", datetime(2024, 1, 2, 9, 0), -5.0),
+]
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.arraysize = 2
+        self.rows = []
+
+    def execute(self, sql, params=None):
+        self.conn.queries.append((sql, params))
+        self.rows = list(self.conn.rows)
+
+    def fetchmany(self):
+        batch, self.rows = self.rows[: self.arraysize], self.rows[self.arraysize:]
+        return batch
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakeConn:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def results_cache(monkeypatch):
+    monkeypatch.setattr(aggregate_service, "_results", LocalCache())
+    monkeypatch.setattr(aggregate_service.settings, "AGGREGATE_CHUNK_ROWS", 2)
+
+
+def test_numpy_engine_merges_chunks(monkeypatch, results_cache):
+    pytest.importorskip("numpy")
+    conn = FakeConn(OBSERVATIONS)
+    monkeypatch.setattr("app.db.get_connection", lambda: conn)
+
+    result = aggregate_service.aggregate("temp_c", "hour", engine="numpy")
+
+    assert [(i["location"], i["bucket"], i["min"], i["max"], i["mean"], i["count"]) for i in result["items"]] == [
+        ("delhi", "2024-01-01T10:00:00", 10.0, 14.0, 12.0, 2),
+        ("delhi", "2024-01-01T11:00:00", 15.0, 15.0, 15.0, 1),
+        ("oslo", "2024-01-01T10:00:00", -3.0, -3.0, -3.0, 1),
+        ("oslo", "2024-01-02T09:00:00", -5.0, -5.0, -5.0, 1),
+    ]
+    daily = aggregate_service.aggregate("temp_c", "day", location="delhi", engine="numpy")
+    assert conn.queries[-1][1] == {"kind": "current", "loc": "delhi"}
+    assert (daily["items"][0]["bucket"], daily["items"][0]["count"]) == ("2024-01-01T00:00:00", 3)
+
+
+def test_sql_engine_pushes_group_by_down_and_caches(monkeypatch, results_cache):
+    conn = FakeConn([("delhi", datetime(2024, 1, 1), 10.0, 15.0, 13.0, 3)])
+    monkeypatch.setattr("app.db.get_connection", lambda: conn)
+
+    first = aggregate_service.aggregate("humidity", "day", engine="sql")
+    second = aggregate_service.aggregate("humidity", "day", engine="sql")
+
+    sql = conn.queries[0][0]
+    assert "GROUP BY location, TRUNC(observed_at, 'DD')" in sql and "MAX(humidity)" in sql
+    assert len(conn.queries) == 1
+    assert not first["cached"] and second["cached"]
+    assert second["items"] == [{"location": "delhi", "bucket": "2024-01-01T00:00:00", "min": 10.0, "max": 15.0, "mean": 13.0, "count": 3}]
+
+
+def test_aggregates_route_rejects_unknown_metric():
+    resp = client.get("/db/aggregates", params={"metric": "json_data"})
+    assert resp.status_code == 400
@@ -0,0 +1,33 @@
+from benchmarks.memory_store import MemoryStore
+from benchmarks.run import compare, hit_ratio, percentile
+from benchmarks.stub_upstream import make_payload
+
+
+def test_percentile_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 95) == 0.0
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    base = {"routes": {"current": {"rps": 1000, "p95_ms": 10, "p99_ms": 20, "errors": 0, "requests": 1000}}}
+    ok = {"routes": {"current": {"rps": 900, "p95_ms": 11, "p99_ms": 23, "errors": 5, "requests": 1000}}}
+    slow = {"routes": {"current": {"rps": 700, "p95_ms": 15, "p99_ms": 20, "errors": 0, "requests": 1000}}}
+    assert compare(ok, base, 0.2) == []
+    assert len(compare(slow, base, 0.2)) == 2
+
+
+def test_hit_ratio_counts_l2_hits_after_l1_misses():
+    before = {"l1_hits": 0, "l1_misses": 0, "l2_hits": 0, "l2_misses": 0}
+    after = {"l1_hits": 6, "l1_misses": 4, "l2_hits": 2, "l2_misses": 2}
+    assert hit_ratio(before, after) == 0.8
+
+
+def test_stub_payloads_and_memory_store():
+    forecast = make_payload("forecast", {"q": "delhi", "days": "2"})
+    assert len(forecast["forecast"]["forecastday"]) == 2
+    assert "last_updated_epoch" in forecast["current"]
+    store = MemoryStore()
+    store.save_api_response("delhi", "forecast", forecast)
+    assert store.stats() == {"saved": 1, "batches": 1}
@@ -0,0 +1,255 @@
+import asyncio
+import json
+import time
+
+from app.utils.cache import LocalCache, RedisCache, TieredCache
+
+
+class FakeRedis:
+    """Just enough of the redis.asyncio client API for RedisCache."""
+
+    def __init__(self):
+        self.store = {}
+        self.gets = 0
+
+    async def get(self, key):
+        self.gets += 1
+        return self.store.get(key)
+
+    async def set(self, key, value, ex=None, nx=False, px=None):
+        if nx and key in self.store:
+            return False
+        self.store[key] = value.encode() if isinstance(value, str) else value
+        return True
+
+    def pipeline(self, transaction=False):
+        fake = self
+
+        class Pipe:
+            def __init__(self):
+                self.ops = []
+
+            def get(self, key):
+                self.ops.append(lambda: fake.store.get(key))
+                fake.gets += 1
+
+            def pttl(self, key):
+                self.ops.append(lambda: 20000 if key in fake.store else -2)
+
+            async def execute(self):
+                return [op() for op in self.ops]
+
+        return Pipe()
+
+
+def make_remote(client=None):
+    remote = RedisCache()
+    remote._client = client
+    return remote
+
+
+def test_local_cache_lru_eviction_by_entries():
+    cache = LocalCache(max_entries=2, max_bytes=1000)
+    cache.set("a", 1, ttl=10, size=1)
+    cache.set("b", 2, ttl=10, size=1)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.set("c", 3, ttl=10, size=1)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_local_cache_respects_byte_budget():
+    cache = LocalCache(max_entries=100, max_bytes=10)
+    cache.set("a", "x", ttl=10, size=6)
+    cache.set("b", "y", ttl=10, size=6)
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] == 6
+
+
+def test_local_cache_expires_entries(monkeypatch):
+    cache = LocalCache()
+    now = time.monotonic()
+    cache.set("a", 1, ttl=5, size=1)
+    monkeypatch.setattr("app.utils.cache.time.monotonic", lambda: now + 6)
+    assert cache.get("a") is None
+
+
+def test_tiered_cache_works_without_redis():
+    cache = TieredCache(LocalCache(), make_remote())
+    asyncio.run(cache.set("k", {"data": 1}, ttl=30))
+    assert asyncio.run(cache.get("k")) == {"data": 1}
+
+
+def test_tiered_cache_promotes_l2_hits():
+    client = FakeRedis()
+    client.store["k"] = json.dumps({"data": 2}).encode()
+    cache = TieredCache(LocalCache(), make_remote(client))
+
+    assert asyncio.run(cache.get("k")) == {"data": 2}
+    assert asyncio.run(cache.get("k")) == {"data": 2}
+    assert client.gets == 1  # second read served from L1
+    assert cache.stats()["l2"]["hits"] == 1
+
+
+def test_tiered_cache_writes_through():
+    client = FakeRedis()
+    cache = TieredCache(LocalCache(), make_remote(client))
+    asyncio.run(cache.set("k", {"data": 3}, ttl=30))
+    assert cache.remote.codec.decode(client.store["k"]) == {"data": 3}
+
+
+def test_slow_redis_does_not_block_the_event_loop():
+    class SlowRedis(FakeRedis):
+        async def get(self, key):
+            await asyncio.sleep(0.05)
+            return await super().get(key)
+
+    client = SlowRedis()
+    client.store["k"] = json.dumps({"data": 4}).encode()
+    remote = make_remote(client)
+    ticks = []
+
+    async def ticker():
+        for _ in range(3):
+            ticks.append(1)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        task = asyncio.ensure_future(ticker())
+        value = await remote.get("k")
+        # the ticker kept running while Redis was answering
+        seen = len(ticks)
+        await task
+        return value, seen
+
+    assert asyncio.run(run()) == ({"data": 4}, 3)
+
+
+def test_ttl_policy_per_api():
+    from datetime import datetime, timedelta, timezone
+    from app.utils import cache_policy
+
+    assert cache_policy.ttl_for("current") == cache_policy.settings.CACHE_TTL
+    assert cache_policy.ttl_for("search") == 24 * 3600
+    # past-dated history never changes; today's may still be filled in
+    assert cache_policy.ttl_for("history", {"dt": "2020-01-01"}) is None
+    today = datetime.now(timezone.utc).date().isoformat()
+    assert cache_policy.ttl_for("history", {"dt": today}) == 3600
+    yesterday = (datetime.now(timezone.utc).date() - timedelta(days=1)).isoformat()
+    assert cache_policy.ttl_for("history", {"dt": yesterday}) == 3600
+
+
+def test_ttl_overrides_parsing():
+    from app.utils.cache_policy import _parse_overrides
+
+    assert _parse_overrides("forecast=300, search=60,bad,x=y") == {"forecast": 300, "search": 60}
+
+
+def test_entry_state_fresh_stale_and_early_refresh():
+    from app.utils import cache_policy
+
+    entry = cache_policy.make_entry({"x": 1}, {"duration_ms": 1000}, fresh_ttl=10)
+    now = entry["fresh_until"] - 5
+    assert cache_policy.entry_state(entry, now=now, beta=0) == cache_policy.FRESH
+    assert cache_policy.entry_state(entry, now=entry["fresh_until"] + 1) == cache_policy.STALE
+    assert cache_policy.entry_state(entry, now=entry["fresh_until"] + cache_policy.settings.CACHE_STALE_TTL + 1) == cache_policy.EXPIRED
+    # a huge beta makes the early refresh certain
+    assert cache_policy.entry_state(entry, now=now, beta=1e6) == cache_policy.REFRESH
+    assert cache_policy.entry_state(cache_policy.make_entry({}, {}, None)) == cache_policy.FRESH
+
+
+def test_stale_entry_served_while_refreshing(monkeypatch):
+    import asyncio
+    from app.services import weather_service
+    from app.utils import cache_policy
+    from app.utils.cache import get_cache
+
+    monkeypatch.setattr(weather_service.settings, "WEATHER_API_KEY", "test")
+    calls = []
+
+    class FakeResp:
+        status_code = 200
+        url = "https://api.test/current.json?q=Oslo"
+
+        def raise_for_status(self):
+            return None
+
+        def json(self):
+            return {"current": {"fresh": True}}
+
+        @property
+        def content(self):
+            return json.dumps(self.json()).encode()
+
+    async def fake_get(url, params=None, timeout=None):
+        calls.append(url)
+        return FakeResp()
+
+    monkeypatch.setattr(weather_service.session, "get", fake_get)
+
+    key = weather_service.make_cache_key("current.json", {"q": "oslo"})
+    stale = cache_policy.make_entry({"current": {"fresh": False}}, {"duration_ms": 5}, fresh_ttl=10)
+    stale["fresh_until"] -= 60
+    asyncio.run(get_cache().set(key, stale, ttl=300))
+
+    async def run():
+        first, _ = await weather_service.fetch_api_by_name("current", "Oslo")
+        await asyncio.gather(*weather_service._refresh_tasks)
+        second, _ = await weather_service.fetch_api_by_name("current", "Oslo")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == {"current": {"fresh": False}}
+    assert second == {"current": {"fresh": True}}
+    assert len(calls) == 1
+
+
+def test_codec_roundtrip_compresses_large_values():
+    from app.utils.cache_codec import CacheCodec, MAGIC
+
+    codec = CacheCodec(serializer="json", compression="zlib", min_bytes=100)
+    value = {"forecast": [{"hour": i, "temp_c": 20.5} for i in range(200)]}
+    raw = codec.encode(value)
+    assert raw[0] == MAGIC
+    assert codec.decode(raw) == value
+    assert codec.stats()["compression_ratio"] > 2
+
+
+def test_codec_skips_compression_for_small_values():
+    from app.utils.cache_codec import CacheCodec, COMPRESSIONS
+
+    codec = CacheCodec(compression="zlib", min_bytes=1024)
+    raw = codec.encode({"a": 1})
+    assert raw[3] == COMPRESSIONS["none"]
+    assert codec.decode(raw) == {"a": 1}
+
+
+def test_codec_reads_legacy_json_entries():
+    from app.utils.cache_codec import CacheCodec
+
+    codec = CacheCodec()
+    legacy = json.dumps({"data": {"x": 1}, "meta": {}}).encode()
+    assert codec.decode(legacy) == {"data": {"x": 1}, "meta": {}}
+
+
+def test_codec_keeps_raw_payload_bytes():
+    from app.utils.cache_codec import CacheCodec, SERIALIZERS
+    from app.utils.raw_json import RawPayload
+
+    codec = CacheCodec(compression="none")
+    raw = b'{"current": {"temp_c": 3.0}}'
+    encoded = codec.encode({"data": RawPayload(raw), "meta": {"status_code": 200}, "fresh_until": 1.5})
+    assert encoded[2] == SERIALIZERS["raw"]
+    decoded = codec.decode(encoded)
+    assert decoded["data"].raw == raw
+    assert decoded["meta"] == {"status_code": 200}
+
+
+def test_dumps_with_raw_splices_payload_verbatim():
+    from app.utils.raw_json import RawPayload, dumps_with_raw
+
+    raw = b'{"b": 2,   "a": 1}'
+    out = dumps_with_raw({"status": "success", "data": RawPayload(raw), "items": [1, None]})
+    assert raw in out
+    assert json.loads(out) == {"status": "success", "data": {"b": 2, "a": 1}, "items": [1, None]}
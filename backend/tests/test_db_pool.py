@@ -0,0 +1,62 @@
+import pytest
+
+from app import db
+
+
+class FakeConn:
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakePool:
+    min, max, increment, busy, opened = 1, 4, 1, 0, 1
+
+    def __init__(self, error=None):
+        self.error = error
+
+    def acquire(self):
+        if self.error:
+            raise self.error
+        return FakeConn()
+
+
+@pytest.fixture
+def fake_pool(monkeypatch):
+    pool = FakePool()
+    monkeypatch.setattr(db, "_pool", pool)
+    monkeypatch.setattr(db, "_sync_telemetry", db.PoolTelemetry("sync"))
+    return pool
+
+
+def test_connection_context_returns_connection(fake_pool):
+    with db.connection() as conn:
+        assert not conn.closed
+    assert conn.closed
+    stats = db.get_pool_info()["sync"]
+    assert stats["acquired"] == 1
+    assert stats["waiting"] == 0
+    assert stats["busy"] == 0 and stats["opened"] == 1
+
+
+def test_acquire_timeout_is_counted(fake_pool):
+    fake_pool.error = RuntimeError("DPY-4005: timed out waiting for the connection pool to return a connection")
+    with pytest.raises(RuntimeError):
+        with db.connection():
+            pass
+    stats = db.get_pool_info()["sync"]
+    assert stats["failed"] == 1
+    assert stats["timeouts"] == 1
+    assert db.get_pool_stats()["sync"]["waiting"] == 0
+
+
+@pytest.mark.parametrize("error, transient", [
+    (RuntimeError("DPY-4005: timed out waiting for the connection pool to return a connection"), True),
+    (RuntimeError("ORA-03113: end-of-file on communication channel"), True),
+    (ConnectionResetError("reset by peer"), True),
+    (RuntimeError("ORA-00001: unique constraint (WEATHER.PK) violated"), False),
+    (ValueError("Oracle DB credentials are not configured in environment variables."), False),
+])
+def test_is_transient_error(error, transient):
+    assert db.is_transient_error(error) is transient
@@ -0,0 +1,234 @@
+import json
+import time
+from types import SimpleNamespace
+
+from app.services import db_service
+from app.services.db_writer import WriteBehindQueue
+
+
+def make_record(i):
+    return db_service.build_record(f"loc{i}", "current", {"i": i})
+
+
+def test_stop_flushes_pending_records_in_batches():
+    batches = []
+    queue = WriteBehindQueue(batches.append, batch_size=3, flush_interval=60, max_size=100)
+    queue.start()
+    for i in range(7):
+        assert queue.offer(make_record(i))
+    queue.stop()
+
+    assert [len(b) for b in batches] == [3, 3, 1]
+    assert queue.stats()["flushed"] == 7
+    assert queue.stats()["depth"] == 0
+
+
+def test_drop_policy_when_full():
+    queue = WriteBehindQueue(lambda batch: None, max_size=2, policy="drop")
+    assert queue.offer(make_record(1))
+    assert queue.offer(make_record(2))
+    assert not queue.offer(make_record(3))
+    assert queue.put(make_record(3)) is False
+    assert queue.stats()["dropped"] == 1
+
+
+def test_block_policy_times_out_and_drops():
+    queue = WriteBehindQueue(lambda batch: None, max_size=1, policy="block", block_timeout=0.01)
+    assert queue.put(make_record(1))
+    assert queue.put(make_record(2)) is False
+    assert queue.stats()["dropped"] == 1
+
+
+def test_spill_policy_writes_and_replays(tmp_path):
+    spill = tmp_path / "spill.jsonl"
+    flushed = []
+    queue = WriteBehindQueue(flushed.extend, max_size=1, policy="spill", spill_path=str(spill))
+    assert queue.put(make_record(1))
+    assert queue.put(make_record(2))  # queue full -> spilled
+    assert json.loads(spill.read_text().splitlines()[0])["loc"] == "loc2"
+
+    queue.flush()
+    queue._replay_spill()
+    assert [r["loc"] for r in flushed] == ["loc1", "loc2"]
+    assert not spill.exists()
+
+
+def test_replay_skips_corrupt_lines_and_finishes_a_leftover_replay(tmp_path):
+    spill = tmp_path / "spill.jsonl"
+    leftover = tmp_path / "spill.jsonl.replay"
+    leftover.write_text(json.dumps(make_record(1)) + "\n" + '{"loc": "trunc')
+    spill.write_text(json.dumps(make_record(2)) + "\n")
+    flushed = []
+    queue = WriteBehindQueue(flushed.extend, policy="spill", spill_path=str(spill))
+
+    queue._replay_spill()
+    assert [r["loc"] for r in flushed] == ["loc1"]
+    assert queue.stats()["corrupt"] == 1
+    assert not leftover.exists() and spill.exists()
+
+    queue._replay_spill()
+    assert [r["loc"] for r in flushed] == ["loc1", "loc2"]
+    assert not spill.exists()
+
+
+def test_replay_keeps_the_file_until_its_batches_are_handled(tmp_path):
+    spill = tmp_path / "spill.jsonl"
+    spill.write_text("".join(json.dumps(make_record(i)) + "\n" for i in range(3)))
+    seen = []
+
+    def flush(batch):
+        # the replayed records are still on disk while they are being written
+        seen.append((tmp_path / "spill.jsonl.replay").exists())
+        raise ConnectionError("db down")
+
+    queue = WriteBehindQueue(flush, batch_size=2, policy="spill", spill_path=str(spill), retries=0)
+    queue._replay_spill()
+    assert seen == [True, True]
+    assert len(spill.read_text().splitlines()) == 3
+    assert not (tmp_path / "spill.jsonl.replay").exists()
+
+
+def test_failed_flush_is_counted():
+    def boom(batch):
+        raise ConnectionError("DPY-4011: the database or network closed the connection")
+
+    queue = WriteBehindQueue(boom, batch_size=10, retries=2, retry_backoff=0)
+    queue.offer(make_record(1))
+    queue.flush()
+    assert queue.stats()["failed"] == 1 and queue.stats()["retried"] == 2
+
+
+def test_transient_flush_error_is_retried():
+    batches = []
+
+    def flaky(batch):
+        if not batches:
+            batches.append(None)
+            raise RuntimeError("DPY-4005: timed out waiting for the connection pool to return a connection")
+        batches.append(batch)
+
+    queue = WriteBehindQueue(flaky, batch_size=10, retry_backoff=0)
+    queue.offer(make_record(1))
+    queue.flush()
+    assert len(batches[1]) == 1
+    assert queue.stats()["flushed"] == 1 and queue.stats()["failed"] == 0 and queue.stats()["retried"] == 1
+
+
+def test_permanent_flush_error_is_not_retried_or_spilled(tmp_path):
+    calls = []
+
+    def bad_row(batch):
+        calls.append(batch)
+        raise RuntimeError("ORA-00001: unique constraint violated")
+
+    spill = tmp_path / "spill.jsonl"
+    queue = WriteBehindQueue(bad_row, batch_size=10, policy="spill", spill_path=str(spill), retry_backoff=0)
+    queue.offer(make_record(1))
+    queue.flush()
+    assert len(calls) == 1
+    assert queue.stats()["failed"] == 1 and queue.stats()["retried"] == 0
+    assert not spill.exists()
+
+
+def test_stop_does_not_retry_past_its_timeout():
+    def down(batch):
+        raise ConnectionError("db down")
+
+    queue = WriteBehindQueue(down, flush_interval=60, retries=5, retry_backoff=10)
+    queue.start()
+    queue.offer(make_record(1))
+    start = time.monotonic()
+    queue.stop(timeout=1)
+    assert time.monotonic() - start < 1
+    assert queue.stats()["failed"] == 1
+
+
+def test_rejected_rows_are_counted_and_the_rest_flushed():
+    queue = WriteBehindQueue(lambda batch: batch[:1], batch_size=10)
+    for i in range(3):
+        queue.offer(make_record(i))
+    queue.flush()
+    assert queue.stats()["flushed"] == 2 and queue.stats()["failed"] == 1
+
+
+class FakeCursor:
+    def __init__(self, columns):
+        self.columns = columns
+        self.calls = []
+        self.description = None
+        self.reject_second = False
+
+    def setinputsizes(self, **kwargs):
+        pass
+
+    def execute(self, sql, params=None):
+        if sql.startswith("SELECT * FROM weather_api_response"):
+            self.description = [(c.upper(), None) for c in self.columns]
+            return
+        self.calls.append((sql, params))
+
+    def executemany(self, sql, rows, batcherrors=False):
+        self.calls.append((sql, rows))
+
+    def getbatcherrors(self):
+        return [SimpleNamespace(offset=1, message="ORA-12899: value too large for column")] if self.reject_second else []
+
+    def close(self):
+        pass
+
+
+ALL_COLUMNS = ["id", "location", "api_type", "request_time", "json_data", "params_json", "response_time_ms", "status_code", "request_url"]
+
+
+class FakeConn:
+    def __init__(self, columns=ALL_COLUMNS):
+        self.cur = FakeCursor(columns)
+        self.committed = False
+
+    def cursor(self):
+        return self.cur
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_save_api_responses_uses_executemany(monkeypatch):
+    conn = FakeConn()
+    monkeypatch.setattr("app.db.get_connection", lambda: conn)
+    monkeypatch.setattr(db_service, "_insert_statement", None)
+    db_service.save_api_responses([make_record(1), make_record(2)])
+    assert len(conn.cur.calls) == 1
+    assert len(conn.cur.calls[0][1]) == 2
+    assert conn.committed
+
+
+def test_insert_statement_matches_legacy_schema(monkeypatch):
+    conn = FakeConn(columns=["id", "location", "api_type", "request_time", "json_data"])
+    monkeypatch.setattr("app.db.get_connection", lambda: conn)
+    monkeypatch.setattr(db_service, "_insert_statement", None)
+
+    db_service.save_api_response("Delhi", "current", {"a": 1}, params={"q": "Delhi"}, status_code=200)
+    db_service.save_api_response("Delhi", "current", {"a": 2})
+
+    sql, params = conn.cur.calls[0]
+    assert "params_json" not in sql
+    assert set(params) == {"loc", "api", "jsondata"}
+    # the table is introspected once, then the cached statement is reused
+    assert len(conn.cur.calls) == 2
+    assert db_service.get_insert_statement().columns == ["location", "api_type", "json_data"]
+
+
+def test_save_api_responses_returns_rejected_rows(monkeypatch):
+    conn = FakeConn()
+    conn.cur.reject_second = True
+    monkeypatch.setattr("app.db.get_connection", lambda: conn)
+    monkeypatch.setattr(db_service, "_insert_statement", None)
+    records = [make_record(1), make_record(2), make_record(3)]
+    assert db_service.save_api_responses(records) == [records[1]]
+    assert conn.committed
@@ -1,3 +1,4 @@
+import json
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
@@ -20,6 +21,10 @@ class FakeResp:
     def json(self):
         return self._payload
 
+    @property
+    def content(self):
+        return json.dumps(self.json()).encode()
+
 
 def make_fake_get(mapping):
     """
@@ -28,7 +33,7 @@ def make_fake_get(mapping):
         "forecast.json": {"forecast": {"fake": True}},
     }
     """
-    def fake_get(url, params=None, timeout=None):
+    async def fake_get(url, params=None, timeout=None):
         endpoint = url.split("/")[-1]
         return FakeResp(url, mapping.get(endpoint, {"ok": True}))
     return fake_get
@@ -256,3 +261,63 @@ def test_generic_api(monkeypatch):
     data = resp.json()
     assert data["api"] == "current"
     assert data["data"]["current"]["fake"] is True
+
+
+# -----------------------------
+# TEST — BATCH
+# -----------------------------
+def test_batch(monkeypatch):
+    disable_cache()
+    mapping = {
+        "current.json": {"current": {"fake": True}},
+        "forecast.json": {"forecast": {"fake": True}},
+    }
+
+    monkeypatch.setattr(
+        "app.services.weather_service.session.get",
+        make_fake_get(mapping)
+    )
+
+    resp = client.post("/weather/batch", json={"items": [
+        {"api": "current", "q": "Delhi"},
+        {"api": "forecast", "q": "Paris", "params": {"days": 2}},
+        {"api": "nope", "q": "Delhi"},
+    ]})
+    assert resp.status_code == 200
+    results = resp.json()["results"]
+    assert results[0]["status"] == "success"
+    assert results[0]["data"]["current"]["fake"] is True
+    assert results[1]["data"]["forecast"]["fake"] is True
+    assert results[2]["status"] == "error"
+    assert results[2]["status_code"] == 400
+
+
+def test_batch_rejects_empty():
+    resp = client.post("/weather/batch", json={"items": []})
+    assert resp.status_code == 400
+
+
+def test_batch_uses_bulk_api_for_current(monkeypatch):
+    disable_cache()
+    from app.config import settings
+    monkeypatch.setattr(settings, "WEATHER_BULK_ENABLED", True)
+
+    posted = []
+
+    async def fake_post(url, params=None, json=None, timeout=None):
+        posted.append(json)
+        bulk = [{"query": {"custom_id": loc["custom_id"], "q": loc["q"], "location": {"name": loc["q"]}, "current": {"fake": True}}}
+                for loc in json["locations"]]
+        return FakeResp(url, {"bulk": bulk})
+
+    monkeypatch.setattr("app.services.weather_service.session.post", fake_post)
+
+    resp = client.post("/weather/batch", json={"items": [
+        {"api": "current", "q": "Delhi"},
+        {"api": "current", "q": "Paris"},
+    ]})
+    assert resp.status_code == 200
+    results = resp.json()["results"]
+    assert len(posted) == 1
+    # the fake echoes the (canonicalized) query back as the location name
+    assert [r["data"]["location"]["name"] for r in results] == ["delhi", "paris"]
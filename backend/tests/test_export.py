@@ -0,0 +1,97 @@
+import csv
+import gzip
+import io
+import json
+from datetime import datetime
+
+from app.config import settings
+from app.services import db_service
+from app.services.export_service import ResponseExport
+
+ALL_COLUMNS = ["id", "location", "api_type", "request_time", "json_data", "params_json", "response_time_ms", "status_code", "request_url"]
+
+
+class FakeLob:
+    def __init__(self, text):
+        self.text = text
+        self.reads = 0
+
+    def read(self, offset, amount):
+        self.reads += 1
+        return self.text[offset - 1:offset - 1 + amount]
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.description = None
+        self.arraysize = 100
+        self.closed = False
+
+    def execute(self, sql, params=None):
+        if sql.startswith("SELECT * FROM weather_api_response WHERE 1 = 0"):
+            self.description = [(c.upper(), None) for c in ALL_COLUMNS]
+        self.sql = sql
+
+    def fetchmany(self):
+        batch, self.rows = self.rows[: self.arraysize], self.rows[self.arraysize:]
+        return batch
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConn:
+    def __init__(self, rows):
+        self.cur = FakeCursor(rows)
+        self.closed = False
+
+    def cursor(self):
+        return self.cur
+
+    def close(self):
+        self.closed = True
+
+
+def make_rows():
+    payload = json.dumps({"location": {"name": "Delhi"}, "note": 'say "hi"'})
+    return [
+        (1, "Delhi", "current", datetime(2025, 1, 1, 12), 120, 200, "https://api.test", FakeLob(payload), '{"q": "Delhi"}'),
+        (2, "Oslo", "forecast", datetime(2025, 1, 1, 13), 80, 200, "https://api.test", None, None),
+    ]
+
+
+def run_export(monkeypatch, rows, **kwargs):
+    conn = FakeConn(rows)
+    monkeypatch.setattr("app.services.export_service.get_connection", lambda: conn)
+    monkeypatch.setattr(db_service, "_insert_statement", None)
+    monkeypatch.setattr(settings, "EXPORT_LOB_CHUNK_SIZE", 8)
+    export = ResponseExport(**kwargs)
+    return b"".join(export), conn
+
+
+def test_ndjson_streams_lobs_in_chunks(monkeypatch):
+    rows = make_rows()
+    body, conn = run_export(monkeypatch, rows, fmt="ndjson")
+    lines = [json.loads(line) for line in body.decode().splitlines()]
+    assert lines[0]["json_data"]["note"] == 'say "hi"'
+    assert lines[0]["params_json"] == {"q": "Delhi"}
+    assert lines[0]["request_time"] == "2025-01-01T12:00:00"
+    assert lines[1]["json_data"] is None
+    assert rows[0][7].reads > 2
+    assert conn.closed and conn.cur.closed
+
+
+def test_csv_with_gzip(monkeypatch):
+    body, _ = run_export(monkeypatch, make_rows(), fmt="csv", compress=True)
+    table = list(csv.reader(io.StringIO(gzip.decompress(body).decode())))
+    assert table[0][-2:] == ["json_data", "params_json"]
+    assert json.loads(table[1][-2])["note"] == 'say "hi"'
+    assert table[2][-2:] == ["", ""]
+
+
+def test_export_without_json_skips_lobs(monkeypatch):
+    rows = [r[:7] for r in make_rows()]
+    body, conn = run_export(monkeypatch, rows, fmt="ndjson", include_json=False)
+    assert "json_data" not in conn.cur.sql
+    assert len(body.decode().splitlines()) == 2
@@ -1,3 +1,4 @@
+import json
 import os
 import sys
 from fastapi.testclient import TestClient
@@ -48,8 +49,12 @@ def test_current_weather_mock():
         def json(self):
             return {"current": {"mock": True}}
 
+        @property
+        def content(self):
+            return json.dumps(self.json()).encode()
+
     # Replace weather API network call
-    def fake_get(url, params=None, timeout=None):
+    async def fake_get(url, params=None, timeout=None):
         return FakeResp()
 
     import app.services.weather_service as ws
@@ -73,7 +78,11 @@ def test_forecast_mock():
         def json(self):
             return {"forecast": {"mock": True}}
 
-    def fake_get(url, params=None, timeout=None):
+        @property
+        def content(self):
+            return json.dumps(self.json()).encode()
+
+    async def fake_get(url, params=None, timeout=None):
         return FakeResp()
 
     import app.services.weather_service as ws
@@ -0,0 +1,61 @@
+import asyncio
+
+import httpx
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import health_service
+from app.services.health_service import HealthMonitor
+
+client = TestClient(app)
+
+
+def test_check_records_db_and_upstream(monkeypatch):
+    probes = []
+
+    def upstream(request):
+        probes.append(request.method)
+        return httpx.Response(401)
+
+    monkeypatch.setattr(health_service, "ping", lambda: None)
+    monitor = HealthMonitor(transport=httpx.MockTransport(upstream))
+    assert not monitor.ready()
+
+    snapshot = asyncio.run(monitor.check())
+    assert snapshot["db_connected"] is True
+    assert snapshot["upstream_reachable"] is True
+    assert snapshot["upstream_status"] == 401 and probes == ["HEAD"]
+    assert monitor.ready()
+    assert monitor.snapshot()["age_s"] is not None
+
+
+def test_check_reports_failures(monkeypatch):
+    def broken_probe():
+        raise ValueError("Oracle DB credentials are not configured")
+
+    attempts = []
+
+    def unreachable(request):
+        attempts.append(request.url)
+        raise httpx.ConnectError("connection refused")
+
+    monkeypatch.setattr(health_service, "ping", broken_probe)
+    monitor = HealthMonitor(transport=httpx.MockTransport(unreachable))
+
+    snapshot = asyncio.run(monitor.check())
+    assert snapshot["status"] == "ok"
+    assert snapshot["db_connected"] is False
+    assert "not configured" in snapshot["db_error"]
+    assert snapshot["upstream_reachable"] is False
+    assert len(attempts) == 1  # the probe is not retried
+    assert not monitor.ready()
+
+
+def test_live_and_ready_routes(monkeypatch):
+    monkeypatch.setattr(health_service, "health_monitor", HealthMonitor())
+    monkeypatch.setattr("app.main.health_monitor", health_service.health_monitor)
+
+    assert client.get("/health/live").json() == {"status": "alive"}
+    resp = client.get("/health/ready")
+    assert resp.status_code == 503
+    assert resp.json()["ready"] is False
@@ -0,0 +1,160 @@
+import asyncio
+
+import httpx
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import weather_service
+from app.utils.hedging import Hedger, LatencyWindow
+from app.utils.rate_limit import KeyPool
+
+client = TestClient(app)
+
+
+def _attempts(*plans):
+    """Attempt factory: the n-th call sleeps plans[n][0] seconds, then returns or raises plans[n][1]."""
+    started, cancelled = [], []
+
+    async def attempt():
+        n = len(started)
+        started.append(n)
+        delay, outcome = plans[n]
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(n)
+            raise
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return attempt, started, cancelled
+
+
+def test_latency_window_nearest_rank_percentile():
+    window = LatencyWindow(size=100)
+    for ms in range(1, 101):
+        window.add(float(ms))
+    assert window.percentile(95) == 95.0
+    assert window.percentile(50) == 50.0
+    assert window.percentile(100) == 100.0
+
+
+def test_no_hedge_until_enough_samples():
+    hedger = Hedger(min_samples=5, min_delay_ms=1, budget=1)
+    attempt, started, _ = _attempts((0.02, "a"))
+    assert asyncio.run(hedger.run("forecast", attempt)) == "a"
+    assert started == [0] and hedger.delay("forecast") is None
+
+
+def test_slow_call_is_hedged_and_the_loser_cancelled():
+    hedger = Hedger(min_samples=0, min_delay_ms=20, budget=1)
+    attempt, started, cancelled = _attempts((5.0, "slow"), (0.0, "fast"))
+
+    assert asyncio.run(hedger.run("forecast", attempt)) == "fast"
+    assert started == [0, 1] and cancelled == [0]
+    stats = hedger.stats()["apis"]["forecast"]
+    assert stats["sent"] == 1 and stats["won"] == 1
+    assert stats["samples"] == 1  # the cancelled first attempt is still timed
+
+
+def test_failed_attempt_waits_for_the_other_one():
+    hedger = Hedger(min_samples=0, min_delay_ms=10, budget=1)
+    attempt, _, _ = _attempts((0.05, RuntimeError("boom")), (0.1, "hedge"))
+    assert asyncio.run(hedger.run("current", attempt)) == "hedge"
+    assert hedger.stats()["apis"]["current"]["won"] == 1
+
+
+def test_budget_and_guard_limit_hedges():
+    hedger = Hedger(min_samples=0, min_delay_ms=10, budget=0.5)
+    attempt, started, _ = _attempts((0.05, "a"), (0.3, "b"), (0.0, "c"))
+    # half a token after one call: no hedge
+    assert asyncio.run(hedger.run("current", attempt)) == "a"
+    async def refuse():
+        return None
+
+    assert asyncio.run(hedger.run("current", attempt, admit=refuse)) == "b"
+    assert started == [0, 1]
+    stats = hedger.stats()
+    assert stats["apis"]["current"]["skipped"] == 2 and stats["budget_tokens"] == 1.0
+
+
+def test_call_weather_api_hedges_slow_upstream_calls(monkeypatch):
+    monkeypatch.setattr(weather_service.settings, "HEDGE_ENABLED", True)
+    monkeypatch.setattr(weather_service, "hedger", Hedger(min_samples=0, min_delay_ms=20, budget=1))
+    calls = []
+
+    async def fake_get(url, params=None, timeout=None):
+        calls.append(url)
+        if len(calls) == 1:
+            await asyncio.sleep(5)
+        return httpx.Response(200, request=httpx.Request("GET", url), json={"location": {"name": "Oslo"}})
+
+    monkeypatch.setattr(weather_service.session, "get", fake_get)
+
+    resp = client.get("/weather/forecast", params={"q": "Oslo"})
+    assert resp.status_code == 200
+    assert len(calls) == 2
+    assert weather_service.get_upstream_stats()["hedging"]["apis"]["forecast"]["won"] == 1
+
+
+def test_fast_error_answer_does_not_beat_a_slower_success(monkeypatch):
+    monkeypatch.setattr(weather_service.settings, "HEDGE_ENABLED", True)
+    monkeypatch.setattr(weather_service, "hedger", Hedger(min_samples=0, min_delay_ms=20, budget=1))
+    calls = []
+
+    async def fake_get(url, params=None, timeout=None):
+        calls.append(url)
+        if len(calls) == 1:
+            await asyncio.sleep(0.2)
+            return httpx.Response(200, request=httpx.Request("GET", url), json={"location": {"name": "Oslo"}})
+        return httpx.Response(500, request=httpx.Request("GET", url), json={"error": "boom"})
+
+    monkeypatch.setattr(weather_service.session, "get", fake_get)
+
+    resp = client.get("/weather/forecast", params={"q": "Oslo"})
+    assert resp.status_code == 200
+    assert len(calls) == 2
+    assert weather_service.get_upstream_stats()["hedging"]["apis"]["forecast"]["lost"] == 1
+
+
+def test_hedge_takes_a_concurrency_slot_and_a_key(monkeypatch):
+    monkeypatch.setattr(weather_service.settings, "HEDGE_ENABLED", True)
+    monkeypatch.setattr(weather_service.settings, "UPSTREAM_ADAPTIVE_LIMIT", True)
+    monkeypatch.setattr(weather_service, "hedger", Hedger(min_samples=0, min_delay_ms=20, budget=1))
+    monkeypatch.setattr(weather_service, "key_pool", KeyPool(["k1", "k2"]))
+    in_flight, sent = [], []
+
+    async def fake_get(url, params=None, timeout=None):
+        sent.append(params["key"])
+        in_flight.append(weather_service.limiter.in_flight)
+        if len(sent) == 1:
+            await asyncio.sleep(5)
+        return httpx.Response(200, request=httpx.Request("GET", url), json={"location": {"name": "Oslo"}})
+
+    monkeypatch.setattr(weather_service.session, "get", fake_get)
+
+    assert client.get("/weather/forecast", params={"q": "Oslo"}).status_code == 200
+    # the hedge holds a slot of its own and spends the other key; both slots are given back
+    assert in_flight == [1, 2] and sorted(sent) == ["k1", "k2"]
+    assert weather_service.limiter.in_flight == 0
+    assert sum(key["calls"] for key in weather_service.get_upstream_stats()["keys"]["keys"]) == 2
+
+
+def test_hedge_is_skipped_without_a_free_key(monkeypatch):
+    monkeypatch.setattr(weather_service.settings, "HEDGE_ENABLED", True)
+    monkeypatch.setattr(weather_service, "hedger", Hedger(min_samples=0, min_delay_ms=20, budget=1))
+    monkeypatch.setattr(weather_service, "key_pool", KeyPool(["k1"], rate=0.001, burst=1))
+    sent = []
+
+    async def fake_get(url, params=None, timeout=None):
+        sent.append(params["key"])
+        await asyncio.sleep(0.1)
+        return httpx.Response(200, request=httpx.Request("GET", url), json={"location": {"name": "Oslo"}})
+
+    monkeypatch.setattr(weather_service.session, "get", fake_get)
+
+    assert client.get("/weather/forecast", params={"q": "Oslo"}).status_code == 200
+    assert sent == ["k1"]
+    stats = weather_service.get_upstream_stats()["hedging"]
+    assert stats["apis"]["forecast"]["skipped"] == 1 and stats["budget_tokens"] == 1.0
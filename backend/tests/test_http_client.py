@@ -0,0 +1,50 @@
+import asyncio
+
+import httpx
+
+from app.utils.http_client import AsyncUpstreamSession
+
+
+def make_session(responses, retries=2):
+    """Return (session, calls) where the session replays `responses` in order."""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        item = responses[min(len(calls), len(responses)) - 1]
+        if isinstance(item, Exception):
+            raise item
+        return httpx.Response(item, json={"n": len(calls)})
+
+    session = AsyncUpstreamSession(retries=retries, backoff_factor=0)
+    session._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return session, calls
+
+
+def test_retries_retryable_status_then_succeeds():
+    session, calls = make_session([503, 200])
+    resp = asyncio.run(session.get("http://upstream.test/current.json"))
+    assert resp.status_code == 200
+    assert len(calls) == 2
+
+
+def test_returns_last_response_when_retries_exhausted():
+    session, calls = make_session([500, 500, 500, 200])
+    resp = asyncio.run(session.get("http://upstream.test/current.json"))
+    assert resp.status_code == 500
+    assert len(calls) == 3
+
+
+def test_non_retryable_status_is_returned_immediately():
+    session, calls = make_session([400, 200])
+    resp = asyncio.run(session.get("http://upstream.test/current.json"))
+    assert resp.status_code == 400
+    assert len(calls) == 1
+
+
+def test_transport_errors_are_retried():
+    err = httpx.ConnectError("boom")
+    session, calls = make_session([err, 200])
+    resp = asyncio.run(session.get("http://upstream.test/current.json"))
+    assert resp.status_code == 200
+    assert len(calls) == 2
@@ -0,0 +1,68 @@
+from app.jobs import location_backfill
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 0
+
+    def execute(self, sql, params=None):
+        self.conn.statements.append((sql, params))
+        if "weather_observation" in sql and self.conn.no_observations:
+            raise RuntimeError("ORA-00942: table or view does not exist")
+        self.rowcount = 2
+
+    def fetchall(self):
+        return [(loc,) for loc in self.conn.locations]
+
+    def close(self):
+        pass
+
+
+class FakeConn:
+    def __init__(self, locations, no_observations=False):
+        self.locations = locations
+        self.no_observations = no_observations
+        self.statements = []
+        self.commits = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_only_unnormalized_spellings_are_rewritten():
+    pairs = location_backfill.spellings_to_fix(["delhi", " Delhi ", "N/A", "28.61394,77.20902", "oslo,norway", ""])
+    assert pairs == [(" Delhi ", "delhi"), ("28.61394,77.20902", "28.61,77.21"), ("oslo,norway", "oslo, norway")]
+
+
+def test_backfill_commits_each_spelling(monkeypatch):
+    conn = FakeConn(["Delhi", "delhi", "OSLO"])
+    monkeypatch.setattr("app.db.get_connection", lambda: conn)
+    stats = location_backfill.backfill()
+    assert stats["spellings"] == 2 and stats["responses"] == 4 and stats["observations"] == 4
+    assert conn.commits == 2
+    assert (location_backfill.UPDATE_RESPONSES_SQL, {"old": "OSLO", "new": "oslo"}) in conn.statements
+
+
+def test_backfill_without_observation_table(monkeypatch):
+    conn = FakeConn(["Delhi", "OSLO"], no_observations=True)
+    monkeypatch.setattr("app.db.get_connection", lambda: conn)
+    stats = location_backfill.backfill()
+    assert stats["responses"] == 4 and stats["observations"] == 0
+    assert conn.commits == 2
+
+
+def test_dry_run_writes_nothing(monkeypatch):
+    conn = FakeConn(["Delhi"])
+    monkeypatch.setattr("app.db.get_connection", lambda: conn)
+    assert location_backfill.backfill(dry_run=True)["spellings"] == 1
+    assert len(conn.statements) == 1 and conn.commits == 0
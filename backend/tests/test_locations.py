@@ -0,0 +1,55 @@
+from app.services import aggregate_service, weather_service
+from app.services.db_service import build_record
+from app.services.query_service import build_filters
+from app.utils import locations
+from app.utils.locations import LocationAliases, normalize_location
+
+
+def test_normalize_folds_case_whitespace_and_coordinates():
+    assert normalize_location("  Delhi ") == normalize_location("DELHI") == "delhi"
+    assert normalize_location("New   York,US") == "new york, us"
+    assert normalize_location("28.6139,77.2090") == normalize_location(" 28.61 , 77.21") == "28.61,77.21"
+    assert normalize_location("-0.001,0.002") == "0.00,0.00"
+    assert normalize_location("28.6139,77.2090", precision=1) == "28.6,77.2"
+    assert normalize_location(None) is None
+
+
+def test_aliases_learned_from_search():
+    aliases = LocationAliases()
+    results = [
+        {"id": 1, "name": "Delhi", "region": "Delhi", "country": "India"},
+        {"id": 2, "name": "Delhi", "region": "Ontario", "country": "Canada"},
+        {"id": 3, "name": "New Delhi", "region": "Delhi", "country": "India"},
+    ]
+    assert aliases.learn_from_search("delhi", results) == 3
+    # ambiguous bare name: no alias
+    assert aliases.get("delhi") is None
+    assert aliases.get("delhi, ontario, canada") == "id:2"
+    assert aliases.get("new delhi") == "id:3"
+
+    aliases.learn_from_search("oslo", [{"id": 9, "name": "Oslo", "region": "Oslo", "country": "Norway"}])
+    assert aliases.get("oslo") == "id:9"
+
+
+def test_canonicalize_applies_aliases_except_for_search(monkeypatch):
+    monkeypatch.setattr(locations, "aliases", LocationAliases())
+    locations.aliases.add("oslo", "id:9")
+    assert locations.canonicalize("current", " OSLO") == "id:9"
+    assert locations.canonicalize("search", "Oslo") == "oslo"
+
+
+def test_cache_key_is_hashed_and_excludes_api_key():
+    key = weather_service.make_cache_key("current.json", {"q": "delhi", "key": "secret"})
+    assert "secret" not in key and "delhi" not in key
+    assert key == weather_service.make_cache_key("current.json", {"q": "delhi", "key": "other"})
+    assert key.startswith("weather:current.json:")
+    _, _, params, prepared_key = weather_service._prepare_call("current", weather_service._build_params("current", " Delhi", None))
+    assert params["q"] == "delhi"
+    assert prepared_key == weather_service.make_cache_key("current.json", {"q": "delhi"})
+
+
+def test_stored_locations_and_filters_use_the_same_spelling():
+    assert build_record(" New  York,US", "current", {})["loc"] == "new york, us"
+    assert build_record(None, "current", {})["loc"] == "N/A"
+    assert build_filters(location="NEW YORK, us")[1]["loc"] == "new york, us"
+    assert aggregate_service._filters("28.6139,77.2090", "current", None, None)[1]["loc"] == "28.61,77.21"
@@ -0,0 +1,85 @@
+import json
+import logging
+import queue
+
+import httpx
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import weather_service
+from app.utils.logger import JsonFormatter, LogSampler, _DroppingQueueHandler, parse_sample_rates, request_id_var
+
+client = TestClient(app)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _record(msg="Cache hit for %s", level=logging.INFO, **extra):
+    record = logging.LogRecord("weather_app", level, __file__, 1, msg, ("k",), None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_parse_sample_rates_skips_bad_entries():
+    assert parse_sample_rates("cache_hit=0.01, upstream_call=2,bad,x=y,=1") == {"cache_hit": 0.01, "upstream_call": 1.0}
+
+
+def test_sampler_keeps_a_fraction_of_tagged_info_records():
+    draws = iter([0.5, 0.005, 0.9])
+    sampler = LogSampler({"cache_hit": 0.01}, rng=lambda: next(draws))
+    kept = [sampler.filter(_record(event="cache_hit")) for _ in range(3)]
+    assert kept == [False, True, False] and sampler.sampled_out == 2
+    # warnings and untagged records are not sampled
+    assert sampler.filter(_record(level=logging.WARNING, event="cache_hit"))
+    assert sampler.filter(_record())
+
+
+def test_sampler_rate_limits_per_event_and_reports_suppressed():
+    clock = Clock()
+    sampler = LogSampler(per_second=2, clock=clock)
+    assert [sampler.filter(_record(event="upstream_error")) for _ in range(5)] == [True, True, False, False, False]
+    assert sampler.filter(_record(msg="other message"))
+    clock.now += 1
+    record = _record(event="upstream_error")
+    assert sampler.filter(record) and record.suppressed == 3
+    assert sampler.rate_limited == 3
+
+
+def test_json_formatter_includes_extra_fields():
+    record = _record(event="upstream_call", api="forecast", latency_ms=12, request_id="abc")
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "Cache hit for k"
+    assert {k: entry[k] for k in ("level", "event", "api", "latency_ms", "request_id")} == {
+        "level": "INFO", "event": "upstream_call", "api": "forecast", "latency_ms": 12, "request_id": "abc",
+    }
+
+
+def test_queue_handler_drops_instead_of_blocking():
+    handler = _DroppingQueueHandler(queue.Queue(maxsize=1))
+    handler.handle(_record())
+    handler.handle(_record())
+    assert handler.dropped == 1
+    assert handler.queue.get_nowait().getMessage() == "Cache hit for k"
+
+
+def test_request_id_is_echoed_and_attached_to_records(monkeypatch, caplog):
+    async def fake_get(url, params=None, timeout=None):
+        return httpx.Response(200, request=httpx.Request("GET", url, params=params), json={"location": {"name": "Oslo"}})
+
+    monkeypatch.setattr(weather_service.session, "get", fake_get)
+
+    with caplog.at_level(logging.INFO, logger="weather_app"):
+        resp = client.get("/weather/current", params={"location": "Oslo"}, headers={"X-Request-ID": "req-42"})
+    assert resp.headers["x-request-id"] == "req-42"
+    calls = [r for r in caplog.records if getattr(r, "event", None) == "upstream_call"]
+    assert calls and calls[0].request_id == "req-42" and calls[0].api == "current"
+    assert "key=" not in calls[0].url
+
+    generated = client.get("/weather/current", headers={"X-Request-ID": "bad id\n"}).headers["x-request-id"]
+    assert len(generated) == 32 and request_id_var.get() is None
@@ -0,0 +1,60 @@
+import threading
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.utils.metrics import Registry
+
+client = TestClient(app)
+
+
+def test_counter_sums_thread_shards():
+    registry = Registry()
+    counter = registry.counter("test_events_total", "Events.", ("kind",))
+
+    def work():
+        for _ in range(1000):
+            counter.inc("a")
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    counter.inc("b", value=2)
+
+    assert counter.value("a") == 4000
+    text = registry.render()
+    assert 'test_events_total{kind="a"} 4000' in text
+    assert 'test_events_total{kind="b"} 2' in text
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    hist = registry.histogram("test_latency_seconds", "Latency.", ("api",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        hist.observe(value, "current")
+
+    text = registry.render()
+    assert 'test_latency_seconds_bucket{api="current",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{api="current",le="1"} 3' in text
+    assert 'test_latency_seconds_bucket{api="current",le="+Inf"} 4' in text
+    assert 'test_latency_seconds_count{api="current"} 4' in text
+    assert 'test_latency_seconds_sum{api="current"} 4.05' in text
+
+
+def test_metrics_endpoint_records_routes(monkeypatch):
+    async def fake_get(url, params=None, timeout=None):
+        raise AssertionError("upstream should not be called")
+
+    monkeypatch.setattr("app.services.weather_service.session.get", fake_get)
+    client.get("/weather/does-not-exist")
+
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    body = resp.text
+    assert "# TYPE weather_http_request_duration_seconds histogram" in body
+    assert 'route="unmatched"' in body
+    assert "weather_http_requests_in_flight" in body
+    assert "# TYPE weather_cache_requests_total counter" in body
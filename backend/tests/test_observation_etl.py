@@ -0,0 +1,125 @@
+import json
+from datetime import datetime
+
+from app.jobs import observation_etl
+from app.jobs.observation_etl import OBSERVATION_COLUMNS, extract_observations, to_columns
+from app.services import db_service
+
+COLUMNS = ["id", "location", "api_type", "request_time", "json_data", "params_json", "response_time_ms", "status_code", "request_url"]
+
+CURRENT = {
+    "location": {"name": "Delhi", "lat": 28.6, "lon": 77.2},
+    "current": {"last_updated_epoch": 1704103200, "temp_c": 12.5, "humidity": 80, "wind_kph": 5.4, "pressure_mb": 1015.0, "condition": {"code": 1000}},
+}
+FORECAST = {
+    "location": {"name": "Delhi", "lat": 28.6, "lon": 77.2},
+    "current": {"last_updated_epoch": 1704103200, "temp_c": 12.5},
+    "forecast": {"forecastday": [{"hour": [{"time_epoch": 1704106800, "temp_c": 13.0}, {"time_epoch": 1704110400, "temp_c": 14.0}]}]},
+}
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.description = None
+        self.result = []
+
+    def execute(self, sql, params=None):
+        if sql.startswith("SELECT * FROM weather_api_response WHERE 1 = 0"):
+            self.description = [(c.upper(), None) for c in COLUMNS]
+        elif sql == observation_etl.SELECT_WATERMARK_SQL:
+            self.result = [(self.conn.watermark,)] if self.conn.watermark is not None else []
+        elif sql.startswith("SELECT id"):
+            self.conn.selects.append((sql, params))
+            self.result = [r for r in self.conn.responses if r[0] > params["last_id"]][: params["batch_rows"]]
+        elif sql.startswith("MERGE INTO etl_watermark"):
+            self.conn.pending_watermark = params["last_id"]
+
+    def executemany(self, sql, rows):
+        self.conn.pending.extend(rows)
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+class FakeConn:
+    def __init__(self, responses, watermark=None):
+        self.responses = responses
+        self.watermark = watermark
+        self.merged = []
+        self.pending = []
+        self.pending_watermark = None
+        self.selects = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.merged.extend(self.pending)
+        self.pending = []
+        self.watermark = self.pending_watermark
+
+    def rollback(self):
+        self.pending = []
+
+    def close(self):
+        pass
+
+
+def test_extract_current_and_forecast_hours():
+    rows = extract_observations(7, "delhi", FORECAST)
+    assert [(r[1], r[2]) for r in rows] == [
+        ("current", datetime(2024, 1, 1, 10)),
+        ("forecast", datetime(2024, 1, 1, 11)),
+        ("forecast", datetime(2024, 1, 1, 12)),
+    ]
+    current = dict(zip(OBSERVATION_COLUMNS, extract_observations(3, "delhi", CURRENT)[0]))
+    assert current["temp_c"] == 12.5 and current["condition_code"] == 1000 and current["lat"] == 28.6
+    assert extract_observations(1, "delhi", {"error": {"code": 1006}}) == []
+
+
+def test_newest_response_wins_within_batch():
+    binds = to_columns(extract_observations(3, "delhi", CURRENT) + extract_observations(7, "delhi", FORECAST))
+    assert len(binds) == 3
+    assert all(b["response_id"] == 7 for b in binds)
+
+
+def test_run_resumes_from_watermark(monkeypatch):
+    responses = [
+        (1, "delhi", json.dumps(CURRENT)),
+        (2, "delhi", "not json"),
+        (3, "delhi", json.dumps(FORECAST)),
+    ]
+    conn = FakeConn(responses)
+    monkeypatch.setattr("app.db.get_connection", lambda: conn)
+    monkeypatch.setattr(db_service, "_insert_statement", None)
+
+    stats = observation_etl.run_etl(batch_size=2, max_batches=1)
+    assert stats["responses"] == 2 and stats["skipped"] == 1
+    assert conn.watermark == 2
+
+    stats = observation_etl.run_etl(batch_size=2)
+    assert stats["start_id"] == 2 and stats["responses"] == 1
+    assert conn.watermark == 3
+    assert len(conn.merged) == 4
+
+    # nothing new: a re-run is a no-op
+    assert observation_etl.run_etl()["responses"] == 0
+
+
+def test_select_binds_api_types_and_uses_the_database_clock(monkeypatch):
+    conn = FakeConn([])
+    monkeypatch.setattr("app.db.get_connection", lambda: conn)
+    monkeypatch.setattr(db_service, "_insert_statement", None)
+    observation_etl.run_etl(settle_seconds=30)
+
+    sql, params = conn.selects[0]
+    assert "api_type IN (:api0, :api1)" in sql and "'current'" not in sql
+    assert "SYSTIMESTAMP" in sql
+    assert params["api0"] == "current" and params["api1"] == "forecast" and params["settle_s"] == 30
@@ -0,0 +1,84 @@
+import pytest
+
+from app.config import settings
+from app.services import db_service
+from app.services.payload_store import payload_hash
+
+COLUMNS = ["id", "location", "api_type", "request_time", "json_data", "params_json", "response_time_ms", "status_code", "request_url", "payload_hash"]
+
+
+class FakeCursor:
+    def __init__(self):
+        self.calls = []
+        self.description = None
+        self.rowcount = 0
+
+    def setinputsizes(self, **kwargs):
+        pass
+
+    def execute(self, sql, params=None):
+        if sql.startswith("SELECT * FROM weather_api_response"):
+            self.description = [(c.upper(), None) for c in COLUMNS]
+            return
+        self.calls.append((sql, [params]))
+
+    def executemany(self, sql, rows, batcherrors=False):
+        self.calls.append((sql, rows))
+
+    def getbatcherrors(self):
+        return []
+
+    def close(self):
+        pass
+
+
+class FakeConn:
+    def __init__(self):
+        self.cur = FakeCursor()
+
+    def cursor(self):
+        return self.cur
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def dedup(monkeypatch):
+    monkeypatch.setattr(settings, "DB_PAYLOAD_DEDUP", True)
+    monkeypatch.setattr(db_service, "_insert_statement", None)
+    conn = FakeConn()
+    monkeypatch.setattr("app.db.get_connection", lambda: conn)
+    return conn
+
+
+def test_identical_payloads_stored_once(dedup):
+    records = [db_service.build_record("delhi", "current", {"t": 1}) for _ in range(3)]
+    records.append(db_service.build_record("oslo", "current", {"t": 2}))
+    db_service.save_api_responses(records)
+
+    (merge_sql, merged), (insert_sql, inserted) = dedup.cur.calls
+    assert merge_sql.startswith("MERGE INTO weather_payload")
+    assert len(merged) == 2
+    assert "json_data" not in insert_sql and "payload_hash" in insert_sql
+    assert [row["phash"] for row in inserted][:3] == [payload_hash('{"t": 1}')] * 3
+
+    # stored payloads are merged again, in the same transaction as the row that points at them
+    dedup.cur.calls.clear()
+    db_service.save_api_response("delhi", "current", {"t": 1})
+    assert [sql.split()[0] for sql, _ in dedup.cur.calls] == ["MERGE", "INSERT"]
+
+
+def test_dedup_needs_payload_hash_column(monkeypatch):
+    monkeypatch.setattr(settings, "DB_PAYLOAD_DEDUP", True)
+    stmt = db_service.InsertStatement(["location", "api_type", "json_data"], dedup=False)
+    assert "json_data" in stmt.columns
+    stmt = db_service.InsertStatement(["location", "api_type", "json_data", "payload_hash"], dedup=True)
+    assert stmt.columns == ["location", "api_type", "payload_hash"]
+    assert "json_data" in stmt.present
@@ -0,0 +1,90 @@
+import asyncio
+
+from app.services import prewarm_service, weather_service
+from app.services.prewarm_service import PrewarmScheduler
+from app.utils import cache_policy
+from app.utils.cache import get_cache
+from app.utils.hotkeys import CountMinSketch, HotKeyTracker
+
+
+def test_count_min_sketch_never_undercounts():
+    sketch = CountMinSketch(width=64, depth=4, seed=1)
+    for i in range(200):
+        sketch.add(f"k{i % 20}")
+    assert all(sketch.estimate(f"k{i}") >= 10 for i in range(20))
+
+
+def test_tracker_keeps_hottest_keys_and_decays():
+    tracker = HotKeyTracker(k=3)
+    for key, hits in (("a", 10), ("b", 5), ("c", 1), ("d", 7)):
+        for _ in range(hits):
+            tracker.record(key, key.upper())
+    assert [key for key, _, _ in tracker.top()] == ["a", "d", "b"]
+    assert tracker.top(1)[0][2] == "A"
+
+    tracker.decay()
+    assert tracker.top(1)[0][1] == 5
+
+
+def test_tracker_evicts_the_coldest_key_after_others_heated_up():
+    tracker = HotKeyTracker(k=2)
+    tracker.record("a")
+    for _ in range(5):
+        tracker.record("b")
+    for _ in range(2):
+        tracker.record("c")
+    assert sorted(key for key, _, _ in tracker.top()) == ["b", "c"]
+
+    for _ in range(3):
+        tracker.record("d")
+    assert [(key, count) for key, count, _ in tracker.top()] == [("b", 5), ("d", 3)]
+
+
+def make_scheduler(tracker, budget=120):
+    return PrewarmScheduler(tracker, lead_time=10, budget_per_minute=budget, min_hits=2)
+
+
+def test_scheduler_refreshes_due_hot_keys(monkeypatch):
+    refreshed = []
+
+    async def fake_refresh(endpoint, url, params, timeout, cache_key):
+        refreshed.append(cache_key)
+
+    monkeypatch.setattr(weather_service, "refresh_entry", fake_refresh)
+    cache = get_cache()
+    asyncio.run(cache.set("hot-expiring", cache_policy.make_entry({"x": 1}, {}, 5), ttl=60))
+    asyncio.run(cache.set("hot-fresh", cache_policy.make_entry({"x": 1}, {}, 300), ttl=600))
+
+    tracker = HotKeyTracker(k=10)
+    for key in ("hot-expiring", "hot-fresh", "hot-missing", "hot-expiring", "hot-fresh", "hot-missing", "cold-missing"):
+        tracker.record(key, ("current.json", "http://upstream.test/current.json", {"q": key}))
+
+    assert asyncio.run(make_scheduler(tracker).run_once()) == 2
+    assert sorted(refreshed) == ["hot-expiring", "hot-missing"]
+
+
+def test_scheduler_respects_budget(monkeypatch):
+    async def fake_refresh(endpoint, url, params, timeout, cache_key):
+        return None
+
+    monkeypatch.setattr(weather_service, "refresh_entry", fake_refresh)
+    tracker = HotKeyTracker(k=10)
+    for i in range(5):
+        for _ in range(3):
+            tracker.record(f"missing-{i}", ("current.json", "http://upstream.test/current.json", {}))
+
+    scheduler = make_scheduler(tracker, budget=2)
+    assert asyncio.run(scheduler.run_once()) == 2
+    assert scheduler.over_budget == 1
+
+
+def test_record_access_only_when_enabled(monkeypatch):
+    tracker = HotKeyTracker(k=10)
+    monkeypatch.setattr(prewarm_service, "hot_keys", tracker)
+    monkeypatch.setattr(prewarm_service.settings, "PREWARM_ENABLED", False)
+    prewarm_service.record_access("current.json", "u", {}, "k1")
+    assert len(tracker) == 0
+    monkeypatch.setattr(prewarm_service.settings, "PREWARM_ENABLED", True)
+    prewarm_service.record_access("current.json", "u", {}, "k1")
+    prewarm_service.record_access("search.json", "u", {}, "k2")
+    assert [key for key, _, _ in tracker.top()] == ["k1"]
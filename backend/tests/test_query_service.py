@@ -0,0 +1,78 @@
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import db_service, query_service
+
+client = TestClient(app)
+
+ALL_COLUMNS = ["id", "location", "api_type", "request_time", "json_data", "params_json", "response_time_ms", "status_code", "request_url"]
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.description = None
+        self.executed = []
+
+    def execute(self, sql, params=None):
+        if sql.startswith("SELECT * FROM weather_api_response WHERE 1 = 0"):
+            self.description = [(c.upper(), None) for c in ALL_COLUMNS]
+            return
+        self.executed.append((sql, params))
+
+    def fetchall(self):
+        return self.rows[: self.executed[-1][1]["page_rows"]]
+
+    def close(self):
+        pass
+
+
+class FakeConn:
+    def __init__(self, rows):
+        self.cur = FakeCursor(rows)
+
+    def cursor(self):
+        return self.cur
+
+    def close(self):
+        pass
+
+
+def make_rows(n):
+    return [(100 - i, "Delhi", "current", datetime(2025, 1, 1, 12, 0, 59 - i), 120, 200, "https://api.test") for i in range(n)]
+
+
+def test_cursor_round_trip():
+    ts = datetime(2025, 1, 1, 12, 30)
+    assert query_service.decode_cursor(query_service.encode_cursor(ts, 42)) == (ts, 42)
+
+
+def test_build_query_uses_keyset_condition():
+    sql, binds = query_service.build_query(["id", "request_time"], location="Delhi", after=(datetime(2025, 1, 1), 7), limit=10)
+    assert "OFFSET" not in sql
+    assert "(request_time < :after_ts OR (request_time = :after_ts AND id < :after_id))" in sql
+    assert sql.endswith("ORDER BY request_time DESC, id DESC FETCH FIRST :page_rows ROWS ONLY")
+    # locations are stored normalized, so the filter is normalized too
+    assert binds == {"loc": "delhi", "after_ts": datetime(2025, 1, 1), "after_id": 7, "page_rows": 11}
+
+
+def test_query_pages_without_lobs(monkeypatch):
+    conn = FakeConn(make_rows(5))
+    monkeypatch.setattr("app.db.get_connection", lambda: conn)
+    monkeypatch.setattr(db_service, "_insert_statement", None)
+
+    page = query_service.query_responses(location="Delhi", limit=3)
+    sql, _ = conn.cur.executed[-1]
+    assert "json_data" not in sql and "params_json" not in sql
+    assert [item["id"] for item in page["items"]] == [100, 99, 98]
+    assert query_service.decode_cursor(page["next_cursor"]) == (datetime(2025, 1, 1, 12, 0, 57), 98)
+
+    last = query_service.query_responses(location="Delhi", limit=5)
+    assert last["next_cursor"] is None
+
+
+def test_responses_route_rejects_bad_cursor():
+    resp = client.get("/db/responses?cursor=not-a-cursor")
+    assert resp.status_code == 400
@@ -0,0 +1,145 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import weather_service
+from app.utils.rate_limit import KeyPool, RateLimited, key_id
+
+client = TestClient(app)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_pool_spreads_calls_and_defers_until_a_token_is_free():
+    clock = Clock()
+    pool = KeyPool(["a", "b"], rate=1, burst=1, max_wait=0, clock=clock)
+    assert {asyncio.run(pool.acquire()), asyncio.run(pool.acquire())} == {"a", "b"}
+    with pytest.raises(RateLimited) as exc:
+        asyncio.run(pool.acquire())
+    assert exc.value.retry_after == pytest.approx(1.0)
+    clock.now += 1
+    assert asyncio.run(pool.acquire()) in ("a", "b")
+    assert pool.rejected == 1
+
+
+def test_pool_prefers_most_remaining_quota_and_rests_throttled_keys():
+    pool = KeyPool(["a", "b", "c"], quota=10, max_wait=0, clock=Clock())
+    for _ in range(3):
+        asyncio.run(pool.acquire(cost=3))
+    assert [key["remaining"] for key in pool.stats()["keys"]] == [7, 7, 7]
+
+    asyncio.run(pool.penalize("a", retry_after=30))
+    picks = [asyncio.run(pool.acquire(cost=3)) for _ in range(4)]
+    assert "a" not in picks[:2] and sorted(picks[:2]) == ["b", "c"]
+    assert pool.stats()["keys"][0]["throttled"] == 1
+    with pytest.raises(RateLimited):  # b and c are used up, a is resting
+        asyncio.run(pool.acquire(cost=3))
+
+
+def test_pool_uses_redis_state_and_backs_off_when_it_fails():
+    class FakeRedis:
+        def __init__(self):
+            self.calls = []
+            self.fail = False
+
+        async def eval(self, script, numkeys, *args):
+            if self.fail:
+                raise ConnectionError("redis down")
+            self.calls.append(args[:numkeys])
+            # the first key's bucket is empty, the second has a token
+            return [0, 250, 5] if len(self.calls) == 1 else [1, 0, 8]
+
+    redis = FakeRedis()
+    clock = Clock()
+    pool = KeyPool(["a", "b"], rate=5, burst=5, quota=100, redis_client=redis, redis_backoff=2, clock=clock)
+    assert asyncio.run(pool.acquire()) == "b"
+    bucket, used, cooldown = redis.calls[0]
+    assert bucket.startswith(f"weather:ratelimit:{{{key_id('a')}}}:") and "a" not in bucket.split(":")
+    assert [key["used"] for key in pool.stats()["keys"]] == [5, 8]
+
+    redis.fail = True
+    assert asyncio.run(pool.acquire()) in ("a", "b")
+    assert pool.redis_errors == 1
+    # Redis is left alone until the backoff is over, then the backoff doubles on another failure
+    assert asyncio.run(pool.acquire()) in ("a", "b")
+    assert pool.redis_errors == 1 and not pool.stats()["shared"]
+    clock.now += 2
+    asyncio.run(pool.acquire())
+    assert pool.redis_errors == 2 and pool._redis_delay == 4
+
+
+def test_429_rests_the_key_and_retries_with_another(monkeypatch):
+    monkeypatch.setattr(weather_service, "key_pool", KeyPool(["k1", "k2"]))
+    sent = []
+
+    async def fake_get(url, params=None, timeout=None):
+        sent.append(params["key"])
+        if params["key"] == "k1":
+            return httpx.Response(429, request=httpx.Request("GET", url), headers={"Retry-After": "120"})
+        return httpx.Response(200, request=httpx.Request("GET", url), json={"location": {"name": "Oslo"}})
+
+    monkeypatch.setattr(weather_service.session, "get", fake_get)
+
+    assert client.get("/weather/current", params={"location": "Oslo"}).status_code == 200
+    assert client.get("/weather/current", params={"location": "Bergen"}).status_code == 200
+    assert sent == ["k1", "k2", "k2"]
+    stats = weather_service.get_upstream_stats()["keys"]["keys"]
+    assert stats[0]["throttled"] == 1 and stats[0]["cooling_s"] > 100
+
+
+def test_single_key_429_without_retry_after_is_retried_after_a_short_rest(monkeypatch):
+    monkeypatch.setattr(weather_service, "key_pool", KeyPool(["k1"], max_wait=0.2, cooldown=1.0))
+    statuses = [429, 200, 200]
+
+    async def fake_get(url, params=None, timeout=None):
+        return httpx.Response(statuses.pop(0), request=httpx.Request("GET", url), json={"location": {"name": "Oslo"}})
+
+    monkeypatch.setattr(weather_service.session, "get", fake_get)
+
+    # the only key rests no longer than max_wait, so the call waits for it instead of failing
+    assert client.get("/weather/current", params={"location": "Oslo"}).status_code == 200
+    assert client.get("/weather/current", params={"location": "Bergen"}).status_code == 200
+    assert statuses == []
+    key = weather_service.get_upstream_stats()["keys"]["keys"][0]
+    assert key["throttled"] == 1 and key["cooling_s"] == 0
+    assert weather_service.key_pool._states[0].strikes == 0
+
+
+def test_default_cooldown_doubles_with_repeated_429s():
+    clock = Clock()
+    pool = KeyPool(["a", "b"], cooldown=1.0, cooldown_max=4.0, max_wait=0, clock=clock)
+    rests = []
+    for _ in range(4):
+        asyncio.run(pool.penalize("a"))
+        rests.append(pool.stats()["keys"][0]["cooling_s"])
+    assert rests == [1.0, 2.0, 4.0, 4.0]
+    pool.succeeded("a")
+    asyncio.run(pool.penalize("a"))
+    assert pool.stats()["keys"][0]["cooling_s"] == 1.0
+
+
+def test_no_free_key_answers_503_without_calling_upstream(monkeypatch):
+    pool = KeyPool(["k1"], rate=1 / 45, burst=1, max_wait=0)
+    asyncio.run(pool.acquire())
+    monkeypatch.setattr(weather_service, "key_pool", pool)
+    calls = []
+
+    async def fake_get(url, params=None, timeout=None):
+        calls.append(url)
+        raise AssertionError("upstream must not be called")
+
+    monkeypatch.setattr(weather_service.session, "get", fake_get)
+
+    resp = client.get("/weather/current", params={"location": "Oslo"})
+    assert resp.status_code == 503
+    assert 40 <= int(resp.headers["Retry-After"]) <= 45
+    assert calls == []
@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+import httpx
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import weather_service
+from app.utils import cache_policy
+from app.utils.cache import get_cache
+from app.utils.resilience import CLOSED, HALF_OPEN, OPEN, AIMDLimiter, CircuitBreaker, CircuitBreakers
+
+client = TestClient(app)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_probes_and_closes():
+    clock = Clock()
+    breaker = CircuitBreaker("current", window=10, min_calls=4, error_rate=0.5, open_seconds=5, half_open_probes=2, clock=clock)
+    for ok in (True, False, True, False):
+        assert breaker.allow()
+        breaker.record(ok, 10)
+    assert breaker.state == OPEN and not breaker.allow()
+    assert breaker.retry_after() == 5
+
+    clock.now += 5
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()  # only two probes at a time
+    breaker.record(True, 10)
+    breaker.record(True, 10)
+    assert breaker.state == CLOSED
+
+
+def test_breaker_reopens_on_failed_probe_and_counts_slow_calls():
+    clock = Clock()
+    breaker = CircuitBreaker("forecast", min_calls=2, slow_call_ms=100, slow_rate=1.0, open_seconds=1, clock=clock)
+    breaker.record(True, 150)
+    breaker.record(True, 200)
+    assert breaker.state == OPEN
+    clock.now += 1
+    assert breaker.allow()
+    breaker.record(False, 5)
+    assert breaker.state == OPEN and breaker.opened == 2
+
+
+def test_aimd_limiter_grows_slowly_and_halves_once_per_cooldown():
+    clock = Clock()
+    limiter = AIMDLimiter(initial=2, min_limit=1, max_limit=10, latency_ms=100, backoff=0.5, cooldown=1, clock=clock)
+    assert limiter.try_acquire() and limiter.try_acquire()
+    assert not limiter.try_acquire() and limiter.rejected == 1
+    limiter.release(True, 10)
+    limiter.release(True, 10)
+    assert abs(limiter.limit - 2.9) < 1e-9  # +1/limit per success
+    for _ in range(3):
+        limiter.try_acquire()
+        limiter.release(False, 10)
+    assert limiter.decreases == 1 and limiter.limit < 1.5
+
+
+def _failing_get(status):
+    calls = []
+
+    async def fake_get(url, params=None, timeout=None):
+        calls.append(url)
+        return httpx.Response(status, request=httpx.Request("GET", url), json={"error": {"message": "boom"}})
+
+    return fake_get, calls
+
+
+def test_open_circuit_fails_fast_with_503(monkeypatch):
+    monkeypatch.setattr(weather_service, "breakers", CircuitBreakers(min_calls=3))
+    fake_get, calls = _failing_get(500)
+    monkeypatch.setattr(weather_service.session, "get", fake_get)
+
+    statuses = [client.get("/weather/current", params={"location": f"city{i}"}).status_code for i in range(5)]
+
+    assert statuses == [502, 502, 502, 503, 503]
+    assert len(calls) == 3
+    resp = client.get("/weather/current", params={"location": "city9"})
+    assert int(resp.headers["Retry-After"]) >= 1
+    assert weather_service.get_upstream_stats()["circuit_breaker"]["apis"]["current"]["state"] == OPEN
+
+
+def test_client_errors_do_not_open_the_circuit(monkeypatch):
+    monkeypatch.setattr(weather_service, "breakers", CircuitBreakers(min_calls=2))
+    fake_get, calls = _failing_get(400)
+    monkeypatch.setattr(weather_service.session, "get", fake_get)
+    for i in range(4):
+        assert client.get("/weather/current", params={"location": f"nowhere{i}"}).status_code == 502
+    assert len(calls) == 4
+
+
+def test_expired_entry_served_when_upstream_fails(monkeypatch):
+    monkeypatch.setattr(weather_service.settings, "WEATHER_API_KEY", "test")
+    fake_get, calls = _failing_get(503)
+    monkeypatch.setattr(weather_service.session, "get", fake_get)
+    key = weather_service.make_cache_key("current.json", {"q": "oslo"})
+    entry = cache_policy.make_entry({"location": {"name": "Oslo"}}, {"status_code": 200}, fresh_ttl=10)
+    entry["fresh_until"] = time.time() - weather_service.settings.CACHE_STALE_TTL - 60
+    asyncio.run(get_cache().set(key, entry, ttl=600))
+
+    resp = client.get("/weather/current", params={"location": "Oslo"})
+
+    assert resp.status_code == 200
+    assert resp.json()["data"] == {"location": {"name": "Oslo"}}
+    assert len(calls) == 1
@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.jobs import retention
+from app.services import archive_service, db_service
+
+COLUMNS = ["id", "location", "api_type", "request_time", "json_data", "params_json", "response_time_ms", "status_code", "request_url"]
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.description = None
+        self.arraysize = 100
+        self.rows = []
+        self.rowcount = 0
+
+    def execute(self, sql, params=None):
+        self.conn.statements.append(sql)
+        if sql.startswith("SELECT * FROM weather_api_response WHERE 1 = 0"):
+            self.description = [(c.upper(), None) for c in COLUMNS]
+        elif sql == retention.PARTITIONS_SQL:
+            self.rows = list(self.conn.partitions)
+        elif "DROP PARTITION" in sql and '"P_INITIAL"' in sql:
+            raise RuntimeError("ORA-14758: Last partition in the range section cannot be dropped")
+        elif sql.startswith("SELECT id"):
+            self.rows = list(self.conn.data)
+        elif sql == retention.PRUNE_PAYLOADS_SQL:
+            self.rowcount = 4
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchmany(self):
+        batch, self.rows = self.rows[: self.arraysize], self.rows[self.arraysize:]
+        return batch
+
+    def close(self):
+        pass
+
+
+class FakeConn:
+    def __init__(self, partitions, data=()):
+        self.partitions = partitions
+        self.data = data
+        self.statements = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def month(offset_days):
+    day = datetime.now() + timedelta(days=offset_days)
+    return f"TIMESTAMP' {day:%Y-%m-01} 00:00:00'"
+
+
+def test_parse_high_value():
+    assert retention.parse_high_value("TIMESTAMP' 2024-02-01 00:00:00'") == datetime(2024, 2, 1)
+    assert retention.parse_high_value("MAXVALUE") is None
+
+
+def test_expired_partitions_are_archived_then_dropped(monkeypatch):
+    conn = FakeConn([("P_INITIAL", "TIMESTAMP' 2024-01-01 00:00:00'"), ("SYS_P101", month(-200)), ("SYS_P102", month(40))])
+    monkeypatch.setattr("app.db.get_connection", lambda: conn)
+    monkeypatch.setattr(db_service, "_insert_statement", None)
+    archived = []
+
+    def fake_archive(conn, start, end):
+        archived.append((start, end))
+        return {"path": f"archive/{end:%Y%m}.parquet", "rows": 7, "bytes": 100}
+
+    monkeypatch.setattr(archive_service, "archive_range", fake_archive)
+    summary = retention.run_retention(days=90, archive=True)
+
+    assert [p["partition"] for p in summary["partitions"]] == ["P_INITIAL", "SYS_P101"]
+    assert [p["action"] for p in summary["partitions"]] == ["truncated", "dropped"]
+    assert archived[0] == (None, datetime(2024, 1, 1))
+    assert archived[1][0] == datetime(2024, 1, 1)
+    assert summary["archived_rows"] == 14
+    drops = [s for s in conn.statements if s.startswith("ALTER TABLE")]
+    assert drops[-1] == 'ALTER TABLE weather_api_response DROP PARTITION "SYS_P101" UPDATE GLOBAL INDEXES'
+    assert not any("SYS_P102" in s for s in conn.statements)
+
+
+def test_dry_run_changes_nothing(monkeypatch):
+    conn = FakeConn([("SYS_P101", month(-200)), ("SYS_P102", month(40))])
+    monkeypatch.setattr("app.db.get_connection", lambda: conn)
+    summary = retention.run_retention(days=90, dry_run=True)
+    assert [p["partition"] for p in summary["partitions"]] == ["SYS_P101"]
+    assert not any(s.startswith("ALTER TABLE") for s in conn.statements)
+
+
+def test_archive_range_writes_parquet_in_chunks(tmp_path, monkeypatch):
+    pq = pytest.importorskip("pyarrow.parquet")
+    monkeypatch.setattr(db_service, "_insert_statement", None)
+    monkeypatch.setattr(archive_service.settings, "ARCHIVE_CHUNK_ROWS", 2)
+    rows = [(i, "delhi", "current", datetime(2024, 1, 1, i), 100, 200, "https://api.test", '{"t": %d}' % i, None) for i in range(5)]
+    conn = FakeConn([], rows)
+    path = str(tmp_path / "jan.parquet")
+
+    result = archive_service.archive_range(conn, datetime(2024, 1, 1), datetime(2024, 2, 1), path)
+
+    assert result["rows"] == 5
+    parquet = pq.ParquetFile(path)
+    assert parquet.metadata.num_row_groups == 3
+    assert parquet.read().column("json_data").to_pylist()[4] == '{"t": 4}'
+
+
+def test_prune_payloads_locks_the_payload_table_first():
+    conn = FakeConn([])
+    assert retention.prune_payloads(conn, datetime.now()) == 4
+    assert conn.statements == [retention.LOCK_PAYLOADS_SQL, retention.PRUNE_PAYLOADS_SQL]
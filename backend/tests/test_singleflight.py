@@ -0,0 +1,133 @@
+import asyncio
+import json
+
+import pytest
+
+from app.services import weather_service
+from app.utils import cache_policy
+from app.utils.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"ok": True}
+
+    async def run():
+        return await asyncio.gather(*(flight.do("k", work) for _ in range(10)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(r == {"ok": True} for r in results)
+    assert flight.stats() == {"leader": 1, "coalesced": 9, "in_flight": 0}
+
+
+def test_waiters_receive_leader_error():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def run():
+        return await asyncio.gather(*(flight.do("k", work) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_call_weather_api_coalesces_identical_requests(monkeypatch):
+    from app.utils import cache as cache_module
+    cache_module._cache._client = None
+    monkeypatch.setattr(weather_service.settings, "WEATHER_API_KEY", "test")
+
+    calls = []
+
+    class FakeResp:
+        status_code = 200
+        url = "https://api.test/current.json?q=Paris"
+
+        def raise_for_status(self):
+            return None
+
+        def json(self):
+            return {"current": {"temp_c": 21}}
+
+        @property
+        def content(self):
+            return json.dumps(self.json()).encode()
+
+    async def fake_get(url, params=None, timeout=None):
+        calls.append(url)
+        await asyncio.sleep(0.01)
+        return FakeResp()
+
+    monkeypatch.setattr(weather_service.session, "get", fake_get)
+
+    async def run():
+        return await asyncio.gather(*(weather_service.fetch_api_by_name("current", "Paris") for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(data == {"current": {"temp_c": 21}} for data, _ in results)
+
+
+def test_leader_cancellation_does_not_cancel_waiters():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.02)
+        return 42
+
+    async def run():
+        leader = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await waiter
+
+    assert asyncio.run(run()) == 42
+
+
+def test_remote_waiter_ignores_a_stale_entry_until_the_leader_writes(monkeypatch):
+    monkeypatch.setattr(weather_service.settings, "COALESCE_DISTRIBUTED", True)
+    monkeypatch.setattr(weather_service.settings, "COALESCE_POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(weather_service.settings, "COALESCE_WAIT_TIMEOUT", 2)
+    stale = cache_policy.make_entry({"temp_c": 1}, {}, fresh_ttl=10)
+    stale["fresh_until"] -= 60
+
+    class OtherProcessHoldsLock:
+        """Redis as seen while another process is fetching `k`: a stale entry and a taken lock."""
+
+        enabled = True
+
+        def __init__(self):
+            self.store = {"k": stale}
+            self.reads = 0
+
+        async def get_shared(self, key):
+            self.reads += 1
+            if self.reads == 5:
+                # the leader publishes its result
+                self.store["k"] = cache_policy.make_entry({"temp_c": 2}, {"status_code": 200}, fresh_ttl=10)
+            return self.store.get(key)
+
+        async def exists(self, key):
+            return True
+
+        async def acquire_lock(self, name, ttl_ms):
+            return None
+
+    monkeypatch.setattr(weather_service, "get_cache", OtherProcessHoldsLock)
+    coalesced = weather_service._remote_stats["remote_coalesced"]
+
+    payload, meta = asyncio.run(weather_service._fetch_coalesced("current.json", "http://upstream.test", {}, 5, "k"))
+    assert payload.data == {"temp_c": 2} and meta == {"status_code": 200}
+    assert weather_service._remote_stats["remote_coalesced"] == coalesced + 1
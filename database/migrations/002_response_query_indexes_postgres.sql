@@ -0,0 +1,5 @@
+-- Migration: indexes for GET /db/responses (filter by location/api_type/time range,
+-- keyset pagination on request_time DESC, id DESC)
+CREATE INDEX IF NOT EXISTS ix_war_loc_api_time ON weather_api_response (location, api_type, request_time, id);
+-- queries filtered only by time range
+CREATE INDEX IF NOT EXISTS ix_war_time ON weather_api_response (request_time, id);
@@ -0,0 +1,22 @@
+-- Migration: content-addressed payload storage (DB_PAYLOAD_DEDUP=true)
+-- Identical json_data documents are stored once in weather_payload, keyed by their
+-- SHA-256; weather_api_response rows reference them through payload_hash and leave
+-- json_data NULL. Existing rows are converted by `python -m app.jobs.payload_backfill`.
+-- Run this on your Oracle DB as the schema owner (or adapt schema names)
+CREATE TABLE weather_user.weather_payload (
+  payload_hash VARCHAR2(64) PRIMARY KEY,
+  json_data CLOB,
+  byte_size NUMBER,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+ALTER TABLE weather_user.weather_api_response ADD (payload_hash VARCHAR2(64));
+CREATE INDEX weather_user.ix_war_payload_hash ON weather_user.weather_api_response (payload_hash);
+
+-- rows with json_data resolved from either storage mode (used by /db/responses and /db/export)
+CREATE OR REPLACE VIEW weather_user.weather_api_response_full AS
+SELECT r.id, r.location, r.api_type, r.request_time,
+       NVL(r.json_data, p.json_data) AS json_data,
+       r.params_json, r.response_time_ms, r.status_code, r.request_url, r.payload_hash
+FROM weather_user.weather_api_response r
+LEFT JOIN weather_user.weather_payload p ON p.payload_hash = r.payload_hash;
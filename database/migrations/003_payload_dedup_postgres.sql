@@ -0,0 +1,21 @@
+-- Migration: content-addressed payload storage (DB_PAYLOAD_DEDUP=true)
+-- Identical json_data documents are stored once in weather_payload, keyed by their
+-- SHA-256; weather_api_response rows reference them through payload_hash and leave
+-- json_data NULL. Existing rows are converted by `python -m app.jobs.payload_backfill`.
+CREATE TABLE IF NOT EXISTS weather_payload (
+  payload_hash CHAR(64) PRIMARY KEY,
+  json_data JSONB,
+  byte_size INTEGER,
+  created_at TIMESTAMPTZ DEFAULT now()
+);
+
+ALTER TABLE weather_api_response ADD COLUMN IF NOT EXISTS payload_hash CHAR(64);
+CREATE INDEX IF NOT EXISTS ix_war_payload_hash ON weather_api_response (payload_hash);
+
+-- rows with json_data resolved from either storage mode (used by /db/responses and /db/export)
+CREATE OR REPLACE VIEW weather_api_response_full AS
+SELECT r.id, r.location, r.api_type, r.request_time,
+       COALESCE(r.json_data, p.json_data) AS json_data,
+       r.params_json, r.response_time_ms, r.status_code, r.request_url, r.payload_hash
+FROM weather_api_response r
+LEFT JOIN weather_payload p ON p.payload_hash = r.payload_hash;
@@ -0,0 +1,14 @@
+-- Migration: monthly range partitions on request_time (interval partitioning, Oracle 12.2+)
+-- New months get their partition automatically. Old partitions are archived to Parquet and
+-- dropped by `python -m app.jobs.retention` (RETENTION_DAYS).
+-- Run this on your Oracle DB as the schema owner (or adapt schema names)
+ALTER TABLE weather_user.weather_api_response MODIFY
+  PARTITION BY RANGE (request_time) INTERVAL (NUMTOYMINTERVAL(1, 'MONTH'))
+  (PARTITION p_initial VALUES LESS THAN (TIMESTAMP '2024-01-01 00:00:00'))
+  ONLINE
+  UPDATE INDEXES (
+    weather_user.ix_war_loc_api_time LOCAL,
+    weather_user.ix_war_time LOCAL
+  );
+-- The primary key (id) index stays global; the retention job drops partitions with
+-- UPDATE GLOBAL INDEXES so it remains usable.
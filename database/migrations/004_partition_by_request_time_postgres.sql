@@ -0,0 +1,73 @@
+-- Migration: monthly range partitions on request_time (Postgres 11+)
+-- A table cannot be partitioned in place: the existing rows are copied into a new
+-- partitioned table. The primary key has to include the partition key.
+-- Future months are created ahead of time by weather_api_response_add_partitions (run
+-- daily, see the end of this file); old partitions are archived and dropped by detaching
+-- them (ALTER TABLE ... DETACH PARTITION; DROP TABLE).
+-- If migration 003 (payload dedup) is installed, re-run it afterwards: it is idempotent
+-- and recreates the payload_hash index and the weather_api_response_full view.
+BEGIN;
+
+DROP VIEW IF EXISTS weather_api_response_full;
+ALTER TABLE weather_api_response RENAME TO weather_api_response_old;
+ALTER INDEX IF EXISTS ix_war_loc_api_time RENAME TO ix_war_old_loc_api_time;
+ALTER INDEX IF EXISTS ix_war_time RENAME TO ix_war_old_time;
+ALTER INDEX IF EXISTS ix_war_payload_hash RENAME TO ix_war_old_payload_hash;
+
+CREATE TABLE weather_api_response (
+  LIKE weather_api_response_old INCLUDING DEFAULTS,
+  PRIMARY KEY (id, request_time)
+) PARTITION BY RANGE (request_time);
+
+CREATE INDEX ix_war_loc_api_time ON weather_api_response (location, api_type, request_time, id);
+CREATE INDEX ix_war_time ON weather_api_response (request_time, id);
+
+-- safety net for rows outside the created months; keep it empty
+CREATE TABLE weather_api_response_default PARTITION OF weather_api_response DEFAULT;
+
+-- Monthly partitions from the month of `since` (default: now) to `months_ahead` months
+-- ahead; existing ones are skipped. Rows that already landed in the default partition
+-- for a new month are moved into it. Returns the number of partitions created.
+CREATE OR REPLACE FUNCTION weather_api_response_add_partitions(months_ahead INTEGER DEFAULT 3, since TIMESTAMPTZ DEFAULT now())
+RETURNS INTEGER LANGUAGE plpgsql AS $$
+DECLARE
+  m DATE := date_trunc('month', COALESCE(since, now()));
+  part TEXT;
+  created INTEGER := 0;
+BEGIN
+  WHILE m <= date_trunc('month', now()) + make_interval(months => months_ahead) LOOP
+    part := 'weather_api_response_p' || to_char(m, 'YYYYMM');
+    IF to_regclass(part) IS NULL THEN
+      EXECUTE format('CREATE TABLE %I (LIKE weather_api_response INCLUDING DEFAULTS)', part);
+      EXECUTE format(
+        'WITH moved AS (DELETE FROM weather_api_response_default WHERE request_time >= %L AND request_time < %L RETURNING *) '
+        'INSERT INTO %I SELECT * FROM moved',
+        m, m + INTERVAL '1 month', part);
+      EXECUTE format(
+        'ALTER TABLE weather_api_response ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        part, m, m + INTERVAL '1 month');
+      created := created + 1;
+    END IF;
+    m := m + INTERVAL '1 month';
+  END LOOP;
+  RETURN created;
+END $$;
+
+-- one partition per month from the oldest row to three months ahead
+SELECT weather_api_response_add_partitions(3, (SELECT min(request_time) FROM weather_api_response_old));
+
+INSERT INTO weather_api_response SELECT * FROM weather_api_response_old;
+-- the id sequence stays owned by the old table's column; move it before dropping the old table
+ALTER SEQUENCE weather_api_response_id_seq OWNED BY weather_api_response.id;
+DROP TABLE weather_api_response_old;
+
+COMMIT;
+
+-- keep three months of partitions ahead: daily through pg_cron when it is installed,
+-- otherwise schedule `SELECT weather_api_response_add_partitions(3);` from cron
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron') THEN
+    PERFORM cron.schedule('weather-api-response-partitions', '0 3 * * *', 'SELECT weather_api_response_add_partitions(3)');
+  END IF;
+END $$;
@@ -0,0 +1,34 @@
+-- Migration: typed observation table filled by `python -m app.jobs.observation_etl`
+-- One row per (location, kind, observed_at): kind 'current' comes from the `current` block
+-- of current/forecast responses, kind 'forecast' from the hourly forecast entries. A
+-- later response for the same key replaces the values (newest response_id wins).
+-- observed_at is UTC (from last_updated_epoch / time_epoch).
+-- Run this on your Oracle DB as the schema owner (or adapt schema names)
+CREATE TABLE weather_user.weather_observation (
+  location VARCHAR2(200) NOT NULL,
+  kind VARCHAR2(10) NOT NULL,
+  observed_at TIMESTAMP NOT NULL,
+  response_id NUMBER NOT NULL,
+  lat NUMBER,
+  lon NUMBER,
+  temp_c NUMBER,
+  feelslike_c NUMBER,
+  humidity NUMBER,
+  wind_kph NUMBER,
+  wind_degree NUMBER,
+  gust_kph NUMBER,
+  pressure_mb NUMBER,
+  precip_mm NUMBER,
+  cloud NUMBER,
+  uv NUMBER,
+  condition_code NUMBER,
+  CONSTRAINT pk_weather_observation PRIMARY KEY (location, kind, observed_at)
+);
+CREATE INDEX weather_user.ix_wobs_time ON weather_user.weather_observation (observed_at);
+
+-- high-water marks of incremental jobs (last weather_api_response.id processed)
+CREATE TABLE weather_user.etl_watermark (
+  job_name VARCHAR2(100) PRIMARY KEY,
+  last_id NUMBER NOT NULL,
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
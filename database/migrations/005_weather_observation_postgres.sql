@@ -0,0 +1,32 @@
+-- Migration: typed observation table filled by `python -m app.jobs.observation_etl`
+-- One row per (location, kind, observed_at): kind 'current' comes from the `current` block
+-- of current/forecast responses, kind 'forecast' from the hourly forecast entries. A
+-- later response for the same key replaces the values (newest response_id wins).
+CREATE TABLE IF NOT EXISTS weather_observation (
+  location TEXT NOT NULL,
+  kind TEXT NOT NULL,
+  observed_at TIMESTAMPTZ NOT NULL,
+  response_id BIGINT NOT NULL,
+  lat DOUBLE PRECISION,
+  lon DOUBLE PRECISION,
+  temp_c REAL,
+  feelslike_c REAL,
+  humidity SMALLINT,
+  wind_kph REAL,
+  wind_degree SMALLINT,
+  gust_kph REAL,
+  pressure_mb REAL,
+  precip_mm REAL,
+  cloud SMALLINT,
+  uv REAL,
+  condition_code INTEGER,
+  PRIMARY KEY (location, kind, observed_at)
+);
+CREATE INDEX IF NOT EXISTS ix_wobs_time ON weather_observation (observed_at);
+
+-- high-water marks of incremental jobs (last weather_api_response.id processed)
+CREATE TABLE IF NOT EXISTS etl_watermark (
+  job_name TEXT PRIMARY KEY,
+  last_id BIGINT NOT NULL,
+  updated_at TIMESTAMPTZ DEFAULT now()
+);
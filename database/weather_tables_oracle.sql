@@ -9,6 +9,11 @@ CREATE TABLE weather_user.weather_api_response (
   response_time_ms NUMBER,
   status_code NUMBER,
   request_url VARCHAR2(400)
-);
-
+)
+-- monthly partitions on request_time, created on demand (see migrations/004_partition_by_request_time_oracle.sql)
+PARTITION BY RANGE (request_time) INTERVAL (NUMTOYMINTERVAL(1, 'MONTH'))
+(PARTITION p_initial VALUES LESS THAN (TIMESTAMP '2024-01-01 00:00:00'));
 
+-- indexes for GET /db/responses (also in migrations/002_response_query_indexes_oracle.sql)
+CREATE INDEX weather_user.ix_war_loc_api_time ON weather_user.weather_api_response (location, api_type, request_time, id) LOCAL;
+CREATE INDEX weather_user.ix_war_time ON weather_user.weather_api_response (request_time, id) LOCAL;
@@ -1,6 +1,6 @@
 ﻿-- Postgres JSONB table for future prod (Aurora/Postgres)
 CREATE TABLE weather_api_response (
-  id BIGSERIAL PRIMARY KEY,
+  id BIGSERIAL,
   location TEXT,
   api_type TEXT,
   request_time TIMESTAMPTZ DEFAULT now(),
@@ -8,7 +8,53 @@ CREATE TABLE weather_api_response (
   params_json JSONB,
   response_time_ms INTEGER,
   status_code INTEGER,
-  request_url TEXT
-);
+  request_url TEXT,
+  PRIMARY KEY (id, request_time)
+) PARTITION BY RANGE (request_time);
 
+-- monthly partitions (see migrations/004_partition_by_request_time_postgres.sql); the
+-- default partition only catches rows for months that have no partition yet
+CREATE TABLE weather_api_response_default PARTITION OF weather_api_response DEFAULT;
 
+-- Monthly partitions from the month of `since` (default: now) to `months_ahead` months
+-- ahead; existing ones are skipped. Rows that already landed in the default partition
+-- for a new month are moved into it. Returns the number of partitions created.
+CREATE OR REPLACE FUNCTION weather_api_response_add_partitions(months_ahead INTEGER DEFAULT 3, since TIMESTAMPTZ DEFAULT now())
+RETURNS INTEGER LANGUAGE plpgsql AS $$
+DECLARE
+  m DATE := date_trunc('month', COALESCE(since, now()));
+  part TEXT;
+  created INTEGER := 0;
+BEGIN
+  WHILE m <= date_trunc('month', now()) + make_interval(months => months_ahead) LOOP
+    part := 'weather_api_response_p' || to_char(m, 'YYYYMM');
+    IF to_regclass(part) IS NULL THEN
+      EXECUTE format('CREATE TABLE %I (LIKE weather_api_response INCLUDING DEFAULTS)', part);
+      EXECUTE format(
+        'WITH moved AS (DELETE FROM weather_api_response_default WHERE request_time >= %L AND request_time < %L RETURNING *) '
+        'INSERT INTO %I SELECT * FROM moved',
+        m, m + INTERVAL '1 month', part);
+      EXECUTE format(
+        'ALTER TABLE weather_api_response ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        part, m, m + INTERVAL '1 month');
+      created := created + 1;
+    END IF;
+    m := m + INTERVAL '1 month';
+  END LOOP;
+  RETURN created;
+END $$;
+
+SELECT weather_api_response_add_partitions(3);
+
+-- keep three months of partitions ahead: daily through pg_cron when it is installed,
+-- otherwise schedule `SELECT weather_api_response_add_partitions(3);` from cron
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron') THEN
+    PERFORM cron.schedule('weather-api-response-partitions', '0 3 * * *', 'SELECT weather_api_response_add_partitions(3)');
+  END IF;
+END $$;
+
+-- indexes for GET /db/responses (also in migrations/002_response_query_indexes_postgres.sql)
+CREATE INDEX ix_war_loc_api_time ON weather_api_response (location, api_type, request_time, id);
+CREATE INDEX ix_war_time ON weather_api_response (request_time, id);